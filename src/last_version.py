@@ -9,6 +9,7 @@
 
 from modules.elements import BallStore, HoleStore, Table
 from modules.trajectory_last_version import SelectTrajectories, TrajectoryStore
+from modules.visibility import VisibilityGraph
 
 Rxs, Rys = [30, 40, 150, 20], [40, 30, 70, 60]
 Yxs, Yys = [10, 40, 150], [80, 40, 10]
@@ -31,8 +32,9 @@ def main(
 
     hole_store = HoleStore()  # Create a new HoleStore
 
+    graph = VisibilityGraph(ball_store, hole_store)  # Lines of sight, updated when balls move
     trajectory_store = TrajectoryStore()
-    trajectory_store.add_trajectories(ball_store, hole_store)
+    trajectory_store.add_trajectories(ball_store, hole_store, graph=graph)
 
     # Create a new Table
     table = Table()
@@ -84,7 +86,7 @@ def main(
 
     table.update_all(hole_store, ball_store)  # Update the table
 
-    trajectory_store.update_trajectories(ball_store, hole_store)
+    trajectory_store.update_trajectories(ball_store, hole_store, graph=graph)
     trajectories.update_trajectories(trajectory_store, ball_store)
 
     table.draw_line(
@@ -0,0 +1,238 @@
+import argparse
+import csv
+import json
+import zipfile
+from itertools import groupby, islice
+from typing import Iterable, Iterator
+import numpy as np
+from modules.elements import BALL_COLORS, ArrayBallStore, HoleStore
+from modules.layout import Layout
+from modules.shots import ShotTable
+from modules.solver import ParallelSolver
+
+# Input files hold one layout per record, with the balls of each color given as (x, y) pairs:
+# - JSON lines: {"id": ..., "red": [[x, y], ...], "yellow": [...], "white": [[x, y]], "black": [[x, y]],
+#   "player": "red", "opponent": "yellow"}, the id and the colors of the players being optional
+# - JSON: an array of the records of the JSON lines format
+# - CSV: the columns layout, color, x and y (optionally player and opponent), the rows of a layout following each other
+# - NPZ: an array positions of shape (L, 2, N) and an array colors of shape (L, N) holding the index of the color
+#   in BALL_COLORS, or -1 for no ball. Optional arrays: ids (L,) and players (L,), the index of the player color.
+
+
+def get_layout(balls: dict[str, list], hole_store: HoleStore,
+               player: str = "red", opponent: str = "yellow") -> Layout:
+    """
+    Return the layout of the given balls, going through a BallStore as an interactive session would.
+    The balls and holes are numbered from 0 in the order of the layout (balls grouped by color in the order
+    of BALL_COLORS, in the order of the file for a color), so that the ids of the results do not depend on
+    the layouts read before.
+
+    :param balls: The (x, y) pairs of the balls of each color
+    :param hole_store: The holes of the table
+    :param player: The color of the player
+    :param opponent: The color of the opponent
+    """
+    ball_store = ArrayBallStore()
+    for color in BALL_COLORS:
+        points = np.asarray(balls.get(color, ()), dtype=float).reshape(-1, 2)
+        ball_store.add_balls(points[:, 0], points[:, 1], color)
+    ball_store.set_players(player, opponent)
+    layout = Layout.from_stores(ball_store, hole_store)
+    layout.ids = np.arange(len(layout), dtype=np.int64)
+    layout.hole_ids = np.arange(layout.n_holes, dtype=np.int64)
+    return layout
+
+
+def _read_record(record: dict, number: int, hole_store: HoleStore, player: str,
+                 opponent: str) -> tuple[str, Layout]:
+    """
+    Return the id (the given number if there is no id) and the layout of a JSON record.
+    """
+    return (str(record.get("id", number)),
+            get_layout(record, hole_store, record.get("player", player), record.get("opponent", opponent)))
+
+
+def read_json_lines(path: str, hole_store: HoleStore, player: str = "red",
+                    opponent: str = "yellow") -> Iterator[tuple[str, Layout]]:
+    """
+    Yield the id and the layout of each line of a JSON lines file (the line number if there is no id).
+    """
+    with open(path) as file:
+        for number, line in enumerate(file):
+            if not line.strip():
+                continue
+            yield _read_record(json.loads(line), number, hole_store, player, opponent)
+
+
+def read_json(path: str, hole_store: HoleStore, player: str = "red",
+              opponent: str = "yellow") -> Iterator[tuple[str, Layout]]:
+    """
+    Yield the id and the layout of each record of a JSON file holding an array of records
+    (the index in the array if there is no id). The array is read at once.
+    """
+    with open(path) as file:
+        records = json.load(file)
+    if not isinstance(records, list):
+        raise ValueError("A JSON layout file must hold an array of records: {}".format(path))
+    for number, record in enumerate(records):
+        yield _read_record(record, number, hole_store, player, opponent)
+
+
+def read_csv(path: str, hole_store: HoleStore, player: str = "red",
+             opponent: str = "yellow") -> Iterator[tuple[str, Layout]]:
+    """
+    Yield the id and the layout of each group of following rows of a CSV file with the same layout column.
+    """
+    with open(path, newline="") as file:
+        for key, rows in groupby(csv.DictReader(file), key=lambda row: row["layout"]):
+            rows = list(rows)
+            balls = {}
+            for row in rows:
+                balls.setdefault(row["color"], []).append((float(row["x"]), float(row["y"])))
+            yield key, get_layout(balls, hole_store, rows[0].get("player") or player,
+                                  rows[0].get("opponent") or opponent)
+
+
+def _read_npz_rows(archive: zipfile.ZipFile, name: str) -> Iterator[np.ndarray]:
+    """
+    Yield the rows (along the first axis) of an array of an NPZ archive, reading one row at a time.
+    """
+    with archive.open(name + ".npy") as file:
+        version = np.lib.format.read_magic(file)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+        if fortran_order:
+            raise ValueError("The arrays of the NPZ file must be stored in C order.")
+        size = int(np.prod(shape[1:], dtype=np.int64)) * dtype.itemsize
+        for _ in range(shape[0]):
+            yield np.frombuffer(file.read(size), dtype=dtype).reshape(shape[1:])
+
+
+def read_npz(path: str, hole_store: HoleStore, player: str = "red",
+             opponent: str = "yellow") -> Iterator[tuple[str, Layout]]:
+    """
+    Yield the id (the index if there is no ids array) and the layout of each row of an NPZ file.
+    The arrays are read one row at a time.
+    """
+    with zipfile.ZipFile(path) as archive:
+        names = {name[:-len(".npy")] for name in archive.namelist()}
+        rows = [_read_npz_rows(archive, "positions"), _read_npz_rows(archive, "colors")]
+        rows += [_read_npz_rows(archive, name) if name in names else None for name in ("ids", "players")]
+        index = 0
+        for positions, colors in zip(rows[0], rows[1]):
+            key = str(next(rows[2]).item()) if rows[2] is not None else str(index)
+            layout_player = player
+            if rows[3] is not None:
+                code = int(next(rows[3]))
+                if not 0 <= code < len(BALL_COLORS) or BALL_COLORS[code] in ("white", "black"):
+                    raise ValueError("Row {} of {}: the players code {} is not the color of a player.".format(
+                        index, path, code))
+                layout_player = BALL_COLORS[code]
+            layout_opponent = opponent if layout_player != opponent else player
+            balls = {color: positions[:, colors == code].T for code, color in enumerate(BALL_COLORS)}
+            yield key, get_layout(balls, hole_store, layout_player, layout_opponent)
+            index += 1
+
+
+READERS = {".jsonl": read_json_lines, ".ndjson": read_json_lines, ".json": read_json,
+           ".csv": read_csv, ".npz": read_npz}
+
+
+def read_layouts(path: str, hole_store: HoleStore = None, player: str = "red",
+                 opponent: str = "yellow") -> Iterator[tuple[str, Layout]]:
+    """
+    Yield the id and the layout of each record of the file, lazily, choosing the reader from the file extension.
+    """
+    hole_store = HoleStore() if hole_store is None else hole_store
+    extension = path[path.rfind("."):].lower()
+    if extension not in READERS:
+        raise ValueError("Unknown layout file extension: {}".format(extension))
+    return READERS[extension](path, hole_store, player, opponent)
+
+
+def get_chunks(items: Iterable, size: int) -> Iterator[list]:
+    """
+    Yield lists of at most the given number of following items.
+    """
+    items = iter(items)
+    while chunk := list(islice(items, size)):
+        yield chunk
+
+
+def solve_layouts(layouts: Iterable[tuple[str, Layout]], solver: ParallelSolver,
+                  chunk_size: int = 256, top: int = None) -> Iterator[tuple[str, ShotTable]]:
+    """
+    Yield the id and the ranked feasible shots of each layout, solving the layouts chunk by chunk.
+    The difficulties are the ones SelectTrajectory.get_difficulty gives the same shots in the interactive path.
+
+    :param layouts: The ids and layouts, as given by read_layouts
+    :param solver: The solver of the chunks
+    :param chunk_size: The number of layouts solved at once
+    :param top: The number of shots kept for each layout (default: all)
+    """
+    for chunk in get_chunks(layouts, chunk_size):
+        tables = solver.solve_all([layout for _, layout in chunk])
+        for (key, _), table in zip(chunk, tables):
+            yield key, table if top is None else table.take(np.arange(min(top, len(table))))
+
+
+def _to_json(value):
+    """
+    Return the value with NumPy arrays and scalars turned into JSON values (NaN as null).
+    """
+    if isinstance(value, np.ndarray):
+        return [_to_json(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def write_shots(results: Iterable[tuple[str, ShotTable]], path: str) -> int:
+    """
+    Write one JSON line per layout, {"id": ..., "shots": [...]}, with the shots from the easiest.
+    Return the number of layouts written.
+    """
+    count = 0
+    with open(path, "w") as file:
+        for key, table in results:
+            shots = [{name: _to_json(value) for name, value in table.get_row(i).items()} for i in range(len(table))]
+            file.write(json.dumps({"id": key, "shots": shots}) + "\n")
+            count += 1
+    return count
+
+
+def run_batch(input_path: str, output_path: str, chunk_size: int = 256, max_workers: int = 0,
+              top: int = None, player: str = "red", opponent: str = "yellow", **options) -> int:
+    """
+    Solve every layout of the input file and write their ranked shots to the output file, as a stream.
+    Return the number of layouts solved.
+
+    :param options: The options of solver.solve (banks, kicks, max_cushions, max_travel)
+    """
+    with ParallelSolver(max_workers, **options) as solver:
+        layouts = read_layouts(input_path, player=player, opponent=opponent)
+        return write_shots(solve_layouts(layouts, solver, chunk_size, top), output_path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Solve every layout of a file and write the ranked shots.")
+    parser.add_argument("input", help="The layouts (.jsonl, .csv or .npz)")
+    parser.add_argument("output", help="The JSON lines file of the shots")
+    parser.add_argument("--chunk-size", type=int, default=256, help="The number of layouts solved at once")
+    parser.add_argument("--workers", type=int, default=0, help="The number of processes (0: this process)")
+    parser.add_argument("--top", type=int, default=None, help="The number of shots kept for each layout")
+    parser.add_argument("--player", default="red", help="The color of the player")
+    parser.add_argument("--opponent", default="yellow", help="The color of the opponent")
+    parser.add_argument("--max-cushions", type=int, default=1, help="The maximum number of cushions of bank shots")
+    arguments = parser.parse_args()
+    count = run_batch(arguments.input, arguments.output, arguments.chunk_size, arguments.workers, arguments.top,
+                      arguments.player, arguments.opponent, max_cushions=arguments.max_cushions)
+    print("Solved {} layouts".format(count))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import hashlib
+from collections import OrderedDict
+from typing import Callable
+import numpy as np
+from modules.elements import Table
+from modules.layout import Layout
+from modules.shots import ShotTable
+from modules.solver import solve
+
+ID_COLUMNS = {"ball_id": "ball", "first_id": "ball", "hole_id": "hole"}  # The columns of ShotTable holding ids
+
+
+def _get_order(positions: np.ndarray, *keys: np.ndarray) -> np.ndarray:
+    """
+    Return the order of the points sorted by the given keys, then by x, then by y (stable).
+    """
+    return np.lexsort((positions[1], positions[0]) + keys[::-1])
+
+
+def _to_ranks(ids: np.ndarray, values: np.ndarray, order: np.ndarray) -> np.ndarray:
+    """
+    Return the rank in the canonical order of the element of each given id (-1 stays -1).
+    """
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(len(order))
+    sorter = np.argsort(ids)
+    indices = sorter[np.clip(np.searchsorted(ids, values, sorter=sorter), 0, max(len(ids) - 1, 0))]
+    return np.where(values >= 0, ranks[indices] if len(ids) else -1, -1)
+
+
+class LayoutKey:
+    """
+    The canonical key of a layout: its balls and holes quantized to a tolerance and sorted,
+    so that layouts closer than the tolerance (camera jitter) or listing their balls in another order
+    get the same key (two positions on both sides of a step boundary still differ).
+    The key also holds the colors, the side of the player and the table dimension.
+    The canonical orders of the balls and holes map the ids of the layout to their rank and back.
+    """
+
+    def __init__(self, layout: Layout, tolerance: float = 0.5) -> None:
+        """
+        :param layout: The layout
+        :param tolerance: The size of the quantization step of the positions, in centimeters
+        """
+        balls = np.round(layout.positions / tolerance).astype(np.int64)
+        holes = np.round(layout.hole_positions / tolerance).astype(np.int64)
+        self.ball_order = _get_order(balls, layout.colors, layout.players)
+        self.hole_order = _get_order(holes)
+        digest = hashlib.blake2b(digest_size=16)
+        for array in (balls[:, self.ball_order], layout.colors[self.ball_order], layout.players[self.ball_order],
+                      holes[:, self.hole_order], np.asarray(Table.TABLE_DIMENSION, dtype=float), np.array([tolerance])):
+            digest.update(np.ascontiguousarray(array).tobytes())
+            digest.update(b"|")
+        self.digest = digest.digest()
+
+    def to_ranks(self, layout: Layout, table: ShotTable) -> ShotTable:
+        """
+        Return the table with the ids of the layout replaced by their canonical ranks.
+        """
+        orders = {"ball": (layout.ids, self.ball_order), "hole": (layout.hole_ids, self.hole_order)}
+        columns = dict(table.columns)
+        for name, element in ID_COLUMNS.items():
+            if name in columns:
+                ids, order = orders[element]
+                columns[name] = _to_ranks(ids, columns[name], order)
+        return ShotTable(columns)
+
+    def from_ranks(self, layout: Layout, table: ShotTable) -> ShotTable:
+        """
+        Return the table with the canonical ranks replaced by the ids of the layout.
+        The other columns are shared with the given table, not copied.
+        """
+        ids = {"ball": np.append(layout.ids[self.ball_order], -1), "hole": np.append(layout.hole_ids[self.hole_order], -1)}
+        columns = dict(table.columns)
+        for name, element in ID_COLUMNS.items():
+            if name in columns:
+                columns[name] = ids[element][columns[name]]  # A rank of -1 picks the appended -1
+        return ShotTable(columns)
+
+    def __hash__(self) -> int:
+        return hash(self.digest)
+
+    def __eq__(self, other: "LayoutKey") -> bool:
+        return self.digest == other.digest
+
+    def __repr__(self) -> str:
+        return "LayoutKey({})".format(self.digest.hex())
+
+
+class SolveCache:
+    """
+    A cache of the ranked shots of solved layouts, keyed by LayoutKey, with a least recently used eviction.
+
+    The shots are stored with canonical ranks instead of ids, so that a hit on a layout with other ids
+    (a new BallStore, balls listed in another order) gets the ids of that layout back. The other columns
+    are the ones of the layout solved first: within the tolerance, the positions are the cached ones.
+    The cache holds at most max_entries layouts and, optionally, max_rows shots in total.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_rows: int = None, tolerance: float = 0.5,
+                 solver: Callable[[Layout], ShotTable] = None) -> None:
+        """
+        :param max_entries: The maximum number of layouts
+        :param max_rows: The maximum number of shots of all the layouts (default: no limit)
+        :param tolerance: The quantization step of the positions of the keys, in centimeters
+        :param solver: The function returning the ranked shots of a layout (default: solver.solve, ranked)
+        """
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.tolerance = tolerance
+        self.solver = solver if solver is not None else (lambda layout: solve(layout).get_ranked())
+        self.entries = OrderedDict()
+        self.rows = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_key(self, layout: Layout) -> LayoutKey:
+        """
+        Return the key of the layout.
+        """
+        return LayoutKey(layout, self.tolerance)
+
+    def get(self, layout: Layout, key: LayoutKey = None) -> ShotTable:
+        """
+        Return the cached shots of the layout with its ids, or None, counting a hit or a miss.
+        """
+        key = self.get_key(layout) if key is None else key
+        table = self.entries.get(key)
+        if table is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return key.from_ranks(layout, table)
+
+    def put(self, layout: Layout, table: ShotTable, key: LayoutKey = None) -> None:
+        """
+        Cache the shots of the layout, evicting the least recently used layouts if the cache is full.
+        """
+        key = self.get_key(layout) if key is None else key
+        if key in self.entries:
+            self.rows -= len(self.entries.pop(key))
+        self.entries[key] = key.to_ranks(layout, table)
+        self.rows += len(table)
+        while len(self.entries) > self.max_entries or (self.max_rows is not None and self.rows > self.max_rows
+                                                        and len(self.entries) > 1):
+            _, evicted = self.entries.popitem(last=False)
+            self.rows -= len(evicted)
+            self.evictions += 1
+
+    def solve(self, layout: Layout) -> ShotTable:
+        """
+        Return the ranked shots of the layout, from the cache or from the solver (and cached).
+        """
+        key = self.get_key(layout)
+        table = self.get(layout, key)
+        if table is None:
+            table = self.solver(layout)
+            self.put(layout, table, key)
+        return table
+
+    def get_stats(self) -> dict:
+        """
+        Return the counters of the cache: entries, rows, hits, misses, evictions and hit rate.
+        """
+        lookups = self.hits + self.misses
+        return {"entries": len(self.entries), "rows": self.rows, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": self.hits / lookups if lookups else 0.}
+
+    def clear(self) -> None:
+        """
+        Remove every layout, keeping the counters.
+        """
+        self.entries.clear()
+        self.rows = 0
+
+    def __contains__(self, layout: Layout) -> bool:
+        return self.get_key(layout) in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __repr__(self) -> str:
+        return "SolveCache({n}/{self.max_entries} layouts, {self.hits} hits, {self.misses} misses)".format(
+            self=self, n=len(self))
@@ -3,6 +3,9 @@ from matplotlib.patches import Circle, Rectangle
 import numpy as np
 from random import choice
 from modules.utils import Vector2D
+from modules.spatial import KDTree, SpatialGrid, get_id_mask, is_in_id_mask, match_positions
+
+BALL_COLORS = ("red", "yellow", "white", "black")  # The colors of the balls, in store order
 
 
 class Hole:
@@ -160,12 +163,12 @@ class HoleStore:
         Returns:
         - The ball at the given position, or None if no ball is found.
         """
-        for hole in self.holes:
-            distance = hole.distance_to(x, y)
-            if distance < Hole.radius:  # Assume the ball is at the given position if it is closer than its radius
-                return hole
-        # If no ball is found, return None
-        return None
+        positions = self.get_positions()
+        distances = np.hypot(positions[0] - x, positions[1] - y)
+        indices = np.flatnonzero(distances < Hole.radius)  # Assume the hole is at the given position if it is closer than its radius
+        if len(indices) == 0:
+            return None
+        return self.holes[int(indices[0])]
     
     def get_all(self):
         return self.holes
@@ -345,14 +348,72 @@ class Ball:
         """
         return "Ball {self.id} at ({self.x}, {self.y})".format(self=self)
 
+class BallView(Ball):
+    """
+    A ball whose position and player flag live in the arrays of an ArrayBallStore.
+    Reading or writing x, y or player goes straight to the store, so the store
+    arrays always reflect the balls. A removed ball keeps its last values.
+    """
+
+    def __init__(self, store: "ArrayBallStore", slot: int, x: float, y: float, tags: list = []) -> None:
+        """
+        Initialize a new ball stored in the given slot of the store.
+        """
+        self._store = store
+        self._slot = slot
+        super().__init__(x, y, tags)
+
+    @property
+    def x(self) -> float:
+        if self._store is None:
+            return self._x
+        return self._store._positions[0, self._slot]
+
+    @x.setter
+    def x(self, value: float) -> None:
+        if self._store is None:
+            self._x = value
+        else:
+            self._store._positions[0, self._slot] = value
+            self._store._moved(self)
+
+    @property
+    def y(self) -> float:
+        if self._store is None:
+            return self._y
+        return self._store._positions[1, self._slot]
+
+    @y.setter
+    def y(self, value: float) -> None:
+        if self._store is None:
+            self._y = value
+        else:
+            self._store._positions[1, self._slot] = value
+            self._store._moved(self)
+
+    @property
+    def player(self) -> bool:
+        if self._store is None:
+            return self._player
+        return bool(self._store._players[self._slot])
+
+    @player.setter
+    def player(self, value: bool) -> None:
+        if self._store is None:
+            self._player = value
+        else:
+            self._store._players[self._slot] = value
+
+    def detach(self) -> None:
+        """
+        Copy the ball's values out of the store arrays and stop using them.
+        """
+        self._x, self._y, self._player = self.x, self.y, self.player
+        self._store = None
+
 class BallStore:
     def __init__(self):
-        self.balls = {
-            "red": [],
-            "yellow": [],
-            "white": [],
-            "black": [],
-        }
+        self.balls = {color: [] for color in BALL_COLORS}
     
     def add_balls(self, xs: list, ys: list, color: str):
         """
@@ -424,18 +485,41 @@ class BallStore:
         Return the ball in the store that is nearest to the given coordinates.
         If no color is specified, return the nearest ball of any color.
         """
-        try:
-            all_balls = {}
-            for ball in self.get_all(color):
-                if ball in ball_not_to_use:
-                    continue
-                distance = ball.distance_to_position(x, y)
-                all_balls[distance] = ball
-            
-            return all_balls[min(all_balls.keys())]
-        except ValueError:
-            return None
+        balls = self.k_nearest(x, y, 1, exclude=self.get_id_mask(ball_not_to_use or []), color=color)
+        return balls[0] if balls else None
+
+    def k_nearest(self, x: float, y: float, k: int = 1, exclude: int = 0, color: str = None) -> list[Ball]:
+        """
+        Return the k balls nearest to the given coordinates, nearest first.
+        Ties are broken by store order.
+
+        :param exclude: A bitmask of the ids of the balls to skip (see get_id_mask)
+        :param color: The color of the balls to return. If not specified, return balls of any color.
+        """
+        balls = self.get_all(color)
+        if not balls or k <= 0:
+            return []
+        positions = self.get_positions(color)
+        distances = np.hypot(positions[0] - x, positions[1] - y)
+        if exclude:
+            distances[is_in_id_mask(self.get_ids(color), exclude)] = np.inf
+        order = np.argsort(distances, kind="stable")[:k]
+        return [balls[i] for i in order if np.isfinite(distances[i])]
+
+    @classmethod
+    def get_id_mask(cls, balls: list[Ball]) -> int:
+        """
+        Return the bitmask of the ids of the given balls, to exclude them from k_nearest.
+        """
+        return get_id_mask(ball.id for ball in balls)
     
+    def get_ids(self, color: str = None) -> np.ndarray:
+        """
+        Return the ids of the balls with the given color as a numpy array, in the order of get_all.
+        If no color is specified, return the ids of all balls.
+        """
+        return np.array([ball.id for ball in self.get_all(color)], dtype=np.int64)
+
     def get_colors(self):
         """
         Return a list of the colors of all balls in the store.
@@ -450,14 +534,20 @@ class BallStore:
         """
         Update the positions of all balls of the given color to the given coordinates.
         Note that the number of coordinates can be different to the number of balls.
+        Each ball keeps its ID and moves to the nearest new position (closest pairs first),
+        the balls left without a position are removed and new balls are added for the positions left.
         """
         if len(xs) != len(ys):
             raise ValueError("The number of x-coordinates must be equal to the number of y-coordinates.")
-        
-        for ball in self.balls[color]:
-            self.remove_ball(ball, color)
-        
-        self.add_balls(xs, ys, color)
+
+        balls = list(self.balls[color])
+        matched_balls, matched_positions = match_positions(self.get_positions(color), np.array((xs, ys), dtype=float))
+        for i, j in zip(matched_balls.tolist(), matched_positions.tolist()):
+            balls[i].update_position(xs[j], ys[j])
+        for i in sorted(set(range(len(balls))) - set(matched_balls.tolist())):
+            self.remove_ball(balls[i], color)
+        left = sorted(set(range(len(xs))) - set(matched_positions.tolist()))
+        self.add_balls([xs[j] for j in left], [ys[j] for j in left], color)
     
     def get_positions(self, color: str = None):
         """
@@ -531,6 +621,397 @@ class BallStore:
             if not ball.is_player:
                 return color
 
+class ArrayBallStore(BallStore):
+    """
+    A BallStore keeping every ball in contiguous NumPy arrays.
+
+    Positions are stored as a single (2, capacity) array, with the balls
+    grouped by color in the order of BALL_COLORS. Each color is therefore a
+    contiguous block, and positions, ids, colors and player flags of a color
+    are returned as read-only views on the arrays instead of fresh lists.
+    The views stay valid until the store is modified.
+    The balls themselves are BallView objects reading from the arrays.
+
+    With use_grid, the store also maintains a SpatialGrid of the balls so that
+    point, radius and nearest queries only look at the neighboring cells.
+    """
+
+    def __init__(self, capacity: int = 32, use_grid: bool = False) -> None:
+        """
+        Create an empty store able to hold the given number of balls before growing.
+        If use_grid is True, index the balls in a grid of cells of one ball diameter.
+        """
+        self.grid = SpatialGrid(2 * Ball.radius, Table.TABLE_DIMENSION) if use_grid else None
+        self._tree = None  # The KDTree of the positions, built on demand
+        capacity = max(capacity, 1)
+        self._positions = np.zeros((2, capacity))
+        self._colors = np.zeros(capacity, dtype=np.int8)
+        self._players = np.zeros(capacity, dtype=bool)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._views = []
+        self._offsets = np.zeros(len(BALL_COLORS) + 1, dtype=np.intp)  # Start of each color block
+
+    @property
+    def balls(self) -> dict[str, list[Ball]]:
+        """
+        Return the balls sorted by color, as in a BallStore.
+        """
+        return {color: self.get_all(color) for color in BALL_COLORS}
+
+    @classmethod
+    def color_code(cls, color: str) -> int:
+        """
+        Return the code of the given color in the color array.
+        """
+        try:
+            return BALL_COLORS.index(color)
+        except ValueError:
+            raise KeyError(color)
+
+    @classmethod
+    def _readonly(cls, array: np.ndarray) -> np.ndarray:
+        view = array.view()
+        view.flags.writeable = False
+        return view
+
+    def _bounds(self, color: str = None) -> tuple[int, int]:
+        """
+        Return the slots [start, end) of the balls of the given color, or of all balls.
+        """
+        if color is None:
+            return 0, len(self._views)
+        code = self.color_code(color)
+        return int(self._offsets[code]), int(self._offsets[code + 1])
+
+    def color_slice(self, color: str = None) -> slice:
+        """
+        Return the slice of the store arrays holding the balls of the given color.
+        """
+        return slice(*self._bounds(color))
+
+    def _reserve(self, size: int) -> None:
+        """
+        Grow the arrays so that they can hold at least the given number of balls.
+        """
+        capacity = len(self._ids)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        n = len(self._views)
+        positions = np.zeros((2, capacity))
+        positions[:, :n] = self._positions[:, :n]
+        self._positions = positions
+        for name in ("_colors", "_players", "_ids"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:n] = old[:n]
+            setattr(self, name, new)
+
+    def _insert(self, xs, ys, color: str) -> list[BallView]:
+        """
+        Insert balls at the end of the block of the given color and return them.
+        """
+        xs = np.asarray(xs, dtype=float).ravel()
+        ys = np.asarray(ys, dtype=float).ravel()
+        code = self.color_code(color)
+        k, n = len(xs), len(self._views)
+        self._reserve(n + k)
+        at = int(self._offsets[code + 1])
+
+        # Shift the following blocks to make room for the new balls
+        self._positions[:, at + k:n + k] = self._positions[:, at:n]
+        for array in (self._colors, self._players, self._ids):
+            array[at + k:n + k] = array[at:n]
+        self._colors[at:at + k] = code
+        self._offsets[code + 1:] += k
+
+        views = [BallView(self, at + i, xs[i], ys[i]) for i in range(k)]
+        self._views[at:at] = views
+        for slot in range(at, n + k):
+            self._views[slot]._slot = slot
+        self._tree = None
+        for view in views:
+            self._ids[view._slot] = view.id
+            if self.grid is not None:
+                self.grid.insert(view)
+        return views
+
+    def _delete(self, start: int, end: int) -> None:
+        """
+        Remove the balls stored in the slots [start, end).
+        """
+        n, k = len(self._views), end - start
+        self._tree = None
+        for view in self._views[start:end]:
+            if self.grid is not None:
+                self.grid.remove(view)
+            view.detach()
+        self._positions[:, start:n - k] = self._positions[:, end:n]
+        for array in (self._colors, self._players, self._ids):
+            array[start:n - k] = array[end:n]
+        code = int(np.searchsorted(self._offsets, start, side="right")) - 1
+        self._offsets[code + 1:] -= k
+        del self._views[start:end]
+        for slot in range(start, n - k):
+            self._views[slot]._slot = slot
+
+    def _moved(self, ball: BallView) -> None:
+        """
+        Update the indexes after the position of the given ball changed.
+        """
+        self._tree = None
+        if self.grid is not None and ball in self.grid:
+            self.grid.move(ball)
+
+    def _slot_of(self, ball: Ball, color: str = None) -> int:
+        """
+        Return the slot of the given ball, searching only the given color if specified.
+        """
+        start, end = self._bounds(color)
+        slots = np.flatnonzero(self._ids[start:end] == ball.id)
+        if len(slots) == 0:
+            raise ValueError("The ball is not in the store.")
+        return start + int(slots[0])
+
+    def add_balls(self, xs: list, ys: list, color: str):
+        """
+        Add balls with the given coordinates and color to the store.
+        """
+        self._insert(xs, ys, color)
+
+    def add_ball(self, x: int, y: int, color: str):
+        """
+        Add a ball with the given coordinates and color to the store.
+        """
+        self._insert([x], [y], color)
+
+    def remove_ball(self, ball: Ball, color: str):
+        """
+        Remove the given ball from the store.
+        """
+        slot = self._slot_of(ball, color)
+        self._delete(slot, slot + 1)
+
+    def remove_ball_by_id(self, id: int, color: str):
+        """
+        Remove the ball with the given ID from the store.
+        """
+        start, end = self._bounds(color)
+        slots = np.flatnonzero(self._ids[start:end] == id)
+        if len(slots) == 0:
+            raise ValueError("No ball with this ID in the store.")
+        self._delete(start + int(slots[0]), start + int(slots[0]) + 1)
+
+    def get_all(self, color: str = None) -> list[Ball]:
+        """
+        Return the list of balls with the given color in the store.
+        If no color is specified, return the list of all balls.
+        """
+        start, end = self._bounds(color)
+        return self._views[start:end]
+
+    def get_white_ball(self) -> Ball:
+        """
+        Return the white ball of the store.
+        """
+        start, end = self._bounds("white")
+        if start == end:
+            raise IndexError("There is no white ball in the store.")
+        return self._views[start]
+
+    def get_black_ball(self) -> Ball:
+        """
+        Return the black ball of the store.
+        """
+        start, end = self._bounds("black")
+        if start == end:
+            raise IndexError("There is no black ball in the store.")
+        return self._views[start]
+
+    def get_random_ball(self, color: str = None) -> Ball:
+        """
+        Return a random ball from the store.
+        If no color is specified, return a random ball of any color.
+        """
+        return choice(self.get_all(color))
+
+    def get_nearest_ball(self, x: int, y: int,
+                         ball_not_to_use: list[Ball] = None,
+                         color: str = None) -> Ball:
+        """
+        Return the ball in the store that is nearest to the given coordinates.
+        If no color is specified, return the nearest ball of any color.
+        On a tie, the first ball in store order is returned.
+        """
+        start, end = self._bounds(color)
+        if self.grid is not None:
+            excluded = {ball.id for ball in ball_not_to_use or []}
+            return self.grid.nearest(
+                x, y,
+                accept=lambda ball: start <= ball._slot < end and ball.id not in excluded,
+                order=lambda ball: ball._slot,
+            )
+        distances = np.hypot(self._positions[0, start:end] - x, self._positions[1, start:end] - y)
+        if ball_not_to_use:
+            distances[np.isin(self._ids[start:end], [ball.id for ball in ball_not_to_use])] = np.inf
+        if len(distances) == 0 or np.isinf(distances.min()):
+            return None
+        return self._views[start + int(np.argmin(distances))]
+
+    def k_nearest(self, x: float, y: float, k: int = 1, exclude: int = 0, color: str = None) -> list[Ball]:
+        """
+        Return the k balls nearest to the given coordinates, nearest first, using a KDTree
+        rebuilt only after the balls changed. Ties are broken by store order.
+
+        :param exclude: A bitmask of the ids of the balls to skip (see get_id_mask)
+        :param color: The color of the balls to return. If not specified, return balls of any color.
+        """
+        n = len(self._views)
+        if self._tree is None:
+            self._tree = KDTree(self._positions[:, :n])
+        start, end = self._bounds(color)
+        allowed = np.zeros(n, dtype=bool)
+        allowed[start:end] = True
+        if exclude:
+            allowed &= ~is_in_id_mask(self._ids[:n], exclude)
+        slots, _ = self._tree.query(x, y, k, allowed)
+        return [self._views[slot] for slot in slots]
+
+    def get_colors(self):
+        """
+        Return a list of the colors of all balls in the store.
+        """
+        return [BALL_COLORS[code] for code in self._colors[:len(self._views)]]
+
+    def get_color_codes(self) -> np.ndarray:
+        """
+        Return the color codes (indices in BALL_COLORS) of all balls as a read-only view.
+        """
+        return self._readonly(self._colors[:len(self._views)])
+
+    def get_ids(self, color: str = None) -> np.ndarray:
+        """
+        Return the ids of the balls of the given color as a read-only view.
+        If no color is specified, return the ids of all balls.
+        """
+        return self._readonly(self._ids[self.color_slice(color)])
+
+    def get_player_mask(self) -> np.ndarray:
+        """
+        Return a read-only view of the player flags of all balls.
+        """
+        return self._readonly(self._players[:len(self._views)])
+
+    def get_color_mask(self, color: str) -> np.ndarray:
+        """
+        Return a boolean mask of the balls of the given color, over all balls.
+        """
+        return self._colors[:len(self._views)] == self.color_code(color)
+
+    def count(self, color: str = None) -> int:
+        """
+        Return the number of balls of the given color, or of all balls.
+        """
+        start, end = self._bounds(color)
+        return end - start
+
+    def update_positions(self, xs: list, ys: list, color: str):
+        """
+        Update the positions of all balls of the given color to the given coordinates.
+        Note that the number of coordinates can be different to the number of balls.
+        Each ball keeps its ID and moves to the nearest new position (closest pairs first),
+        the balls left without a position are removed and new balls are added for the positions left.
+        """
+        if len(xs) != len(ys):
+            raise ValueError("The number of x-coordinates must be equal to the number of y-coordinates.")
+
+        xs = np.asarray(xs, dtype=float).ravel()
+        ys = np.asarray(ys, dtype=float).ravel()
+        balls = self.get_all(color)
+        matched_balls, matched_positions = match_positions(self.get_positions(color), np.stack((xs, ys)))
+        for i, j in zip(matched_balls.tolist(), matched_positions.tolist()):
+            if balls[i].x != xs[j] or balls[i].y != ys[j]:
+                balls[i].update_position(xs[j], ys[j])
+        for i in sorted(set(range(len(balls))) - set(matched_balls.tolist())):
+            self.remove_ball(balls[i], color)
+        left = sorted(set(range(len(xs))) - set(matched_positions.tolist()))
+        self.add_balls(xs[left], ys[left], color)
+
+    def get_positions(self, color: str = None):
+        """
+        Return the positions of the balls of the given color as a read-only (2, n) view
+        of the form [[x1, x2, ...], [y1, y2, ...]].
+        If no color is specified, return the positions of all balls.
+        """
+        return self._readonly(self._positions[:, self.color_slice(color)])
+
+    def find_ball(self, x: float, y: float, color: str = None) -> Ball:
+        """
+        Find the ball at the given position, if any.
+
+        Parameters:
+        - x: The x-coordinate of the position to search.
+        - y: The y-coordinate of the position to search.
+        - color: The color of the ball to search for. If not specified, search for any ball.
+
+        Returns:
+        - The ball at the given position, or None if no ball is found.
+        """
+        balls = self.get_balls_in_radius(x, y, Ball.radius, color)
+        return balls[0] if balls else None
+
+    def get_balls_in_radius(self, x: float, y: float, radius: float, color: str = None) -> list[Ball]:
+        """
+        Return the balls of the given color whose center is closer than the radius to the position,
+        in store order. If no color is specified, search for any ball.
+        """
+        start, end = self._bounds(color)
+        if self.grid is not None:
+            balls = [ball for ball in self.grid.query_radius(x, y, radius) if start <= ball._slot < end]
+            return sorted(balls, key=lambda ball: ball._slot)
+        distances = np.hypot(self._positions[0, start:end] - x, self._positions[1, start:end] - y)
+        return [self._views[start + int(slot)] for slot in np.flatnonzero(distances < radius)]
+
+    def set_players(self, player_color: str, opponent_color: str) -> None:
+        """Set the player property of all balls with the given player and opponent colors.
+
+        Args:
+            player_color: The color of the balls controlled by the player.
+            opponent_color: The color of the balls controlled by the opponent.
+        """
+        if player_color == opponent_color:
+            raise ValueError("The player color and opponent color must be different.")
+        if player_color not in BALL_COLORS or opponent_color not in BALL_COLORS:
+            raise ValueError("The player color and opponent color must be valid colors.")
+        if player_color == "white" or opponent_color == "white" or player_color == "black" or opponent_color == "black":
+            raise ValueError("The player color and opponent color must not be white or black.")
+
+        self._players[self.color_slice(player_color)] = True
+        self._players[self.color_slice(opponent_color)] = False
+
+    @property
+    def player_color(self) -> str:
+        '''
+        Return the player color.
+        '''
+        slots = np.flatnonzero(self._players[:len(self._views)])
+        if len(slots):
+            return BALL_COLORS[self._colors[slots[0]]]
+
+    @property
+    def opponent_color(self) -> str:
+        '''
+        Return the opponent color.
+        '''
+        slots = np.flatnonzero(~self._players[:len(self._views)])
+        if len(slots):
+            return BALL_COLORS[self._colors[slots[0]]]
+
+    def __len__(self) -> int:
+        return len(self._views)
+
+
 class Table:
     """
     A class representing a table.
@@ -569,18 +1050,14 @@ class Table:
         """
         Display the balls from the table's BallStore.
         """
-        # Get the positions of all balls in the BallStore
-        ball_positions = ball_store.get_positions()
-        xs = ball_positions[0]
-        ys = ball_positions[1]
-        
-        # Get the colors of all balls in the BallStore
+        # Get the balls and their colors from the BallStore
+        balls = ball_store.get_all()
         ball_colors = ball_store.get_colors()
         
         # Add a Circle patch for each ball to the plot
-        for x, y, color in zip(xs, ys, ball_colors):
-            self.draw_ball_id(ball_store.find_ball(x, y, color))
-            self.ax.add_patch(Circle((x, y), radius=Ball.radius/2, color=color))
+        for ball, color in zip(balls, ball_colors):
+            self.draw_ball_id(ball)
+            self.ax.add_patch(Circle((ball.x, ball.y), radius=Ball.radius/2, color=color))
     
     def draw_ball_id(self, ball: Ball):
         """
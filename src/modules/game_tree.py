@@ -0,0 +1,156 @@
+import numpy as np
+from modules.cache import LayoutKey
+from modules.layout import Layout
+from modules.probability import get_aims, get_speeds
+from modules.shots import ShotTable
+from modules.simulation import BatchSimulator
+from modules.solver import solve
+
+TURN_COST = 100.  # The cost of giving the table away, on the difficulty scale (the easiest shot is often 20 to 60)
+LOSS_COST = 1000.  # The cost of losing the game (the black ball falls too early)
+
+
+class GameTree:
+    """
+    Choose a shot two plies ahead: our shot, then the best shot of whoever plays next.
+
+    Each candidate shot is played a few times with a random error on a BatchSimulator (chance node).
+    The cost of an outcome, on the difficulty scale, is:
+    - after a success, the difficulty of our easiest next shot (capped at TURN_COST), or 0 if the game is won,
+    - after a miss, TURN_COST minus the difficulty of the easiest shot of the opponent (capped at TURN_COST),
+      the layout being seen from the other side with Layout.swap_players,
+    - TURN_COST if the white ball falls, LOSS_COST if the black ball falls without winning.
+    The cost of a shot is its difficulty plus the mean cost of its outcomes (expectimax), the best shot
+    having the smallest cost.
+
+    Since outcome costs are not negative, the difficulty of a shot is a lower bound of its cost: candidates
+    are searched from the easiest, and the search stops at the first one whose difficulty reaches the best
+    cost so far; the outcomes of a shot stop being evaluated once their partial sum reaches it (cutoffs).
+    The easiest shot of an outcome layout is kept in a transposition table keyed by LayoutKey, so that
+    outcomes equal within the tolerance (the balls did not move, the same ball fell) are solved once.
+    """
+
+    def __init__(self, width: int = 8, samples: int = 4, aim_error: float = 0.5, speed_error: float = 0.1,
+                 tolerance: float = 0.5, dt: float = 2e-3, seed: int = None, **options) -> None:
+        """
+        :param width: The number of easiest shots searched
+        :param samples: The number of outcomes sampled for each shot
+        :param aim_error: The standard deviation of the aim angle, in degrees
+        :param speed_error: The standard deviation of the speed, relative to the speed of the shot
+        :param tolerance: The quantization step of the positions of the keys of the transposition table
+        :param dt: The time step of the simulation
+        :param seed: The seed of the random generator
+        :param options: The options of solver.solve used for both plies (banks, kicks, max_cushions, max_travel)
+        """
+        self.width = width
+        self.samples = samples
+        self.aim_error = aim_error
+        self.speed_error = speed_error
+        self.tolerance = tolerance
+        self.dt = dt
+        self.random = np.random.default_rng(seed)
+        self.options = options
+        self.table = {}  # LayoutKey -> difficulty of the easiest shot of the player of the layout
+        self.hits = 0
+        self.misses = 0
+        self.cutoffs = 0
+
+    def get_value(self, layout: Layout) -> float:
+        """
+        Return the difficulty of the easiest shot of the player of the layout, capped at TURN_COST
+        (TURN_COST if there is none), from the transposition table if the layout is in it.
+        """
+        key = LayoutKey(layout, self.tolerance)
+        if key in self.table:
+            self.hits += 1
+        else:
+            self.misses += 1
+            ranked = solve(layout, **self.options).get_ranked()
+            self.table[key] = min(float(ranked["difficulty"][0]), TURN_COST) if len(ranked) else TURN_COST
+        return self.table[key]
+
+    def _simulate(self, layout: Layout, table: ShotTable) -> tuple[BatchSimulator, np.ndarray]:
+        """
+        Play every shot of the table self.samples times with a random error, all at once.
+        Return the simulator (one table per sample, the samples of a shot following each other)
+        and the index of the ball of each sample in the layout.
+        """
+        shots = np.repeat(np.arange(len(table)), self.samples)
+        aims, speeds = get_aims(table), get_speeds(table)
+        angles = aims[shots] + np.radians(self.aim_error) * self.random.standard_normal(len(shots))
+        norms = speeds[shots] * np.maximum(1. + self.speed_error * self.random.standard_normal(len(shots)), 0.)
+        simulator = BatchSimulator.from_layouts([layout] * len(shots))
+        simulator.strike(np.stack((norms * np.cos(angles), norms * np.sin(angles))))
+        simulator.run(self.dt)
+        index = {id: i for i, id in enumerate(layout.ids.tolist())}
+        return simulator, np.array([index[id] for id in table["ball_id"][shots].tolist()], dtype=np.intp)
+
+    def _get_outcome(self, layout: Layout, simulator: BatchSimulator, sample: int, row: dict, ball: int) -> float:
+        """
+        Return the cost of one outcome of the shot of the given row.
+        """
+        pocketed = simulator.pocketed[sample]
+        holes = {id: i for i, id in enumerate(layout.hole_ids.tolist())}
+        first = int(np.flatnonzero(layout.ids == row["first_id"])[0])
+        success = simulator.first_contact[sample] == first and pocketed[ball] == holes[int(row["hole_id"])]
+        blacks = layout.get_indices("black")
+        if pocketed[simulator.cue[sample]] >= 0:
+            return LOSS_COST if (pocketed[blacks] >= 0).any() else TURN_COST
+        if (pocketed[blacks] >= 0).any():
+            return 0. if success and ball in blacks and len(blacks) == 1 else LOSS_COST
+        left = pocketed < 0
+        outcome = Layout(simulator.positions[sample][:, left], layout.colors[left], layout.ids[left],
+                         layout.players[left], layout.hole_positions, layout.hole_ids)
+        if success:
+            return self.get_value(outcome)
+        return TURN_COST - self.get_value(outcome.swap_players())
+
+    def search(self, layout: Layout, candidates: ShotTable = None) -> ShotTable:
+        """
+        Return the searched shots of the layout with the columns value (the cost of the shot, NaN if it was cut off)
+        and outcomes (the number of outcomes evaluated), from the best. Shots cut off come last, from the easiest.
+
+        :param candidates: The shots to search (default: the width easiest shots of the layout)
+        """
+        if candidates is None:
+            candidates = solve(layout, **self.options).get_ranked()
+        table = candidates.take(np.argsort(candidates["difficulty"], kind="stable")[:self.width])
+        values = np.full(len(table), np.nan)
+        outcomes = np.zeros(len(table), dtype=np.int64)
+        if len(table):
+            simulator, balls = self._simulate(layout, table)
+            best = np.inf
+            for shot in range(len(table)):
+                difficulty = float(table["difficulty"][shot])
+                if difficulty >= best:
+                    self.cutoffs += len(table) - shot
+                    break
+                row, total = table.get_row(shot), 0.
+                for sample in range(shot * self.samples, (shot + 1) * self.samples):
+                    total += self._get_outcome(layout, simulator, sample, row, balls[sample])
+                    outcomes[shot] += 1
+                    if difficulty + total / self.samples >= best:
+                        self.cutoffs += 1
+                        break
+                else:
+                    values[shot] = best = difficulty + total / self.samples
+        columns = dict(table.columns)
+        columns["value"], columns["outcomes"] = values, outcomes
+        order = np.argsort(np.where(np.isnan(values), np.inf, values), kind="stable")
+        return ShotTable(columns).take(order)
+
+    def get_best(self, layout: Layout) -> dict:
+        """
+        Return the best shot of the layout as a row, or None if there is no feasible shot.
+        """
+        table = self.search(layout)
+        return table.get_row(0) if len(table) else None
+
+    def get_stats(self) -> dict:
+        """
+        Return the counters of the search: layouts in the transposition table, hits, misses and cutoffs.
+        """
+        return {"entries": len(self.table), "hits": self.hits, "misses": self.misses, "cutoffs": self.cutoffs}
+
+    def __repr__(self) -> str:
+        return "GameTree(width {self.width}, {self.samples} samples, {n} layouts)".format(self=self, n=len(self.table))
@@ -0,0 +1,449 @@
+from heapq import heappop, heappush
+import numpy as np
+from modules.elements import Ball, BallStore, Hole, Table
+
+# Positions follow the BallStore convention: arrays of shape (2, n) of the form [[x1, x2, ...], [y1, y2, ...]].
+
+RAILS = ("left", "right", "bottom", "top")
+
+
+def segment_distances(starts: np.ndarray, ends: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """
+    Return the (M, N) matrix of the distances between M segments and N points.
+
+    :param starts: The starting points of the segments, shape (2, M)
+    :param ends: The ending points of the segments, shape (2, M)
+    :param centers: The points, shape (2, N)
+    """
+    starts = np.asarray(starts, dtype=float).reshape(2, -1)
+    ends = np.asarray(ends, dtype=float).reshape(2, -1)
+    centers = np.asarray(centers, dtype=float).reshape(2, -1)
+
+    directions = ends - starts
+    lengths = (directions ** 2).sum(axis=0)
+    lengths[lengths == 0] = 1.  # A zero length segment is a point, t will be 0
+
+    # Parameter of the projection of every point on every segment, clamped to the segment
+    dx = centers[0][None, :] - starts[0][:, None]
+    dy = centers[1][None, :] - starts[1][:, None]
+    t = (dx * directions[0][:, None] + dy * directions[1][:, None]) / lengths[:, None]
+    np.clip(t, 0., 1., out=t)
+    return np.hypot(dx - t * directions[0][:, None], dy - t * directions[1][:, None])
+
+
+def blocked_matrix(starts: np.ndarray, ends: np.ndarray, centers: np.ndarray,
+                   ids: np.ndarray = None, ignore_ids: np.ndarray = None,
+                   clearance: float = None) -> np.ndarray:
+    """
+    Return the (M, N) matrix telling which of the N balls block which of the M segments.
+
+    A ball blocks a segment if a ball rolling along the segment would touch it,
+    i.e. if its center is closer than the clearance (two radii by default) to the segment.
+
+    :param starts: The starting points of the segments, shape (2, M)
+    :param ends: The ending points of the segments, shape (2, M)
+    :param centers: The positions of the balls, shape (2, N)
+    :param ids: The ids of the balls, shape (N,)
+    :param ignore_ids: The ids of the balls that cannot block each segment (usually its ends),
+                       shape (M,) or (M, k). Use -1 for no ball.
+    :param clearance: The minimal distance between a ball and a segment (default: 2 * Ball.radius)
+    """
+    if clearance is None:
+        clearance = 2 * Ball.radius
+    blocked = segment_distances(starts, ends, centers) < clearance
+    if ids is not None and ignore_ids is not None:
+        ids = np.asarray(ids).ravel()
+        ignore_ids = np.asarray(ignore_ids).reshape(blocked.shape[0], -1)
+        blocked &= ~(ids[None, :, None] == ignore_ids[:, None, :]).any(axis=2)
+    return blocked
+
+
+def endpoint_id(element) -> int:
+    """
+    Return the id to ignore for the given end of a segment: the ball id, or -1 for anything else.
+    """
+    return element.id if isinstance(element, Ball) else -1
+
+
+def get_cushions() -> np.ndarray:
+    """
+    Return the lines reached by the center of a ball touching each rail (in the order of RAILS),
+    as [x left, x right, y bottom, y top].
+    """
+    return np.array([Ball.radius, Table.TABLE_DIMENSION[0] - Ball.radius,
+                     Ball.radius, Table.TABLE_DIMENSION[1] - Ball.radius])
+
+
+def clamp_to_cushions(points: np.ndarray) -> np.ndarray:
+    """
+    Return the points moved inside the area reachable by the center of a ball.
+    """
+    cushions = get_cushions()
+    points = np.asarray(points, dtype=float).reshape(2, -1)
+    return np.stack((np.clip(points[0], cushions[0], cushions[1]), np.clip(points[1], cushions[2], cushions[3])))
+
+
+def mirror_points(points: np.ndarray) -> np.ndarray:
+    """
+    Return the images of the points across each cushion line, in the order of RAILS.
+    The result has the shape (4, 2, n).
+    """
+    cushions = get_cushions()
+    points = np.asarray(points, dtype=float).reshape(2, -1)
+    images = np.repeat(points[None], len(RAILS), axis=0)
+    for rail, cushion in enumerate(cushions):
+        axis = rail // 2
+        images[rail, axis] = 2 * cushion - points[axis]
+    return images
+
+
+def get_cushion_points(starts: np.ndarray, images: np.ndarray, rails: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return where the straight lines from the starts to the mirrored images cross the cushion lines
+    of the given rails, and whether this point is strictly between the start and the image.
+
+    :param starts: The starting points, shape (2, M)
+    :param images: The mirrored arrival points, shape (2, M)
+    :param rails: The index of the rail of each line in RAILS, shape (M,)
+    """
+    cushions = get_cushions()[rails]
+    axes = np.asarray(rails) // 2
+    columns = np.arange(len(axes))
+    directions = images - starts
+    along = directions[axes, columns]
+    s = (cushions - starts[axes, columns]) / np.where(along != 0, along, np.nan)
+    valid = (s > 0) & (s < 1)
+    s = np.where(valid, s, 0.)
+    return starts + s * directions, valid
+
+
+def get_lattice_cells(max_cushions: int) -> np.ndarray:
+    """
+    Return the cells (i, j) of the unfolded table reached after 1 to max_cushions cushions,
+    with |i| + |j| cushions for the cell (i, j). Cells are ordered by number of cushions,
+    the four cells of one cushion following RAILS.
+    """
+    cells = []
+    for cushions in range(1, max_cushions + 1):
+        for i in range(-cushions, cushions + 1):
+            rest = cushions - abs(i)
+            cells.extend({(i, -rest), (i, rest)})
+    cells.sort(key=lambda cell: (abs(cell[0]) + abs(cell[1]), abs(cell[1]), cell[0], cell[1]))
+    return np.array(cells, dtype=np.int64).reshape(-1, 2)
+
+
+def get_lattice_images(points: np.ndarray, cell: tuple[int, int]) -> np.ndarray:
+    """
+    Return the images of the points in the given cell of the table unfolded across its cushion lines.
+    A straight line to an image is a path bouncing on |i| + |j| cushions.
+    """
+    cushions = get_cushions()
+    points = np.asarray(points, dtype=float).reshape(2, -1)
+    images = np.empty_like(points)
+    for axis, index in enumerate(cell):
+        low, high = cushions[2 * axis], cushions[2 * axis + 1]
+        offset = points[axis] - low
+        images[axis] = low + index * (high - low) + (offset if index % 2 == 0 else high - low - offset)
+    return images
+
+
+def fold_points(points: np.ndarray) -> np.ndarray:
+    """
+    Return the points of the unfolded table folded back onto the table.
+    """
+    cushions = get_cushions()
+    points = np.asarray(points, dtype=float)
+    folded = np.empty_like(points)
+    for axis in range(2):
+        low, high = cushions[2 * axis], cushions[2 * axis + 1]
+        offset = points[axis] - low
+        cell = np.floor(offset / (high - low))
+        rest = offset - cell * (high - low)
+        folded[axis] = low + np.where(cell % 2 == 0, rest, high - low - rest)
+    return folded
+
+
+def unfold_path(starts: np.ndarray, images: np.ndarray, cell: tuple[int, int]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return the cushion points, on the table, of the straight lines from the starts to their images
+    in the given cell, and whether each line really crosses the cushions one at a time.
+
+    :param starts: The starting points, on the table, shape (2, M)
+    :param images: The arrival points in the cell (see get_lattice_images), shape (2, M)
+    :return: The cushion points in the order they are hit, shape (|i| + |j|, 2, M), and the validity, shape (M,)
+    """
+    cushions = get_cushions()
+    starts = np.asarray(starts, dtype=float).reshape(2, -1)
+    directions = np.asarray(images, dtype=float).reshape(2, -1) - starts
+    parameters = []
+    for axis, index in enumerate(cell):
+        low, high = cushions[2 * axis], cushions[2 * axis + 1]
+        crossed = np.arange(1, index + 1) if index > 0 else np.arange(0, index, -1)
+        lines = low + crossed * (high - low)
+        along = np.where(directions[axis] != 0, directions[axis], np.nan)
+        parameters.append((lines[:, None] - starts[axis][None, :]) / along[None, :])
+    parameters = np.sort(np.concatenate(parameters), axis=0)
+
+    valid = ((parameters > 0) & (parameters < 1)).all(axis=0)
+    if len(parameters) > 1:
+        valid &= (np.diff(parameters, axis=0) > 1e-9).all(axis=0)  # Two cushions at once is a corner
+    parameters = np.where(valid, parameters, 0.)
+    unfolded = starts[None] + parameters[:, None, :] * directions[None]
+    return fold_points(unfolded.transpose(1, 0, 2)).transpose(1, 0, 2), valid
+
+
+def _wrap_angles(angles: np.ndarray) -> np.ndarray:
+    """
+    Return the angles in radians brought back to [-pi, pi).
+    """
+    return (angles + np.pi) % (2 * np.pi) - np.pi
+
+
+def get_free_ranges(starts: np.ndarray, angles: np.ndarray, lengths: np.ndarray,
+                    obstacles: np.ndarray, obstacle_ids: np.ndarray = None,
+                    ignore_ids: np.ndarray = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return the range of directions, around the given ones, in which a ball leaving each start does not
+    touch an obstacle before traveling the given length. An obstacle at a distance d blocks the cone of
+    half angle asin(2 r / d) around its direction (its tangents), which is slightly conservative for an obstacle
+    beyond the end of the path.
+    The range is given as offsets in radians from each direction, low <= 0 <= high, and is empty (0, 0)
+    when the direction itself is blocked.
+
+    :param starts: The starting points, shape (2, M)
+    :param angles: The directions, in radians, shape (M,)
+    :param lengths: The traveled lengths, shape (M,)
+    :param obstacles: The positions of the balls, shape (2, N)
+    :param obstacle_ids: The ids of the balls, shape (N,)
+    :param ignore_ids: The ids of the balls that cannot block each path, shape (M,) or (M, k). Use -1 for no ball.
+    """
+    starts = np.asarray(starts, dtype=float).reshape(2, -1)
+    obstacles = np.asarray(obstacles, dtype=float).reshape(2, -1)
+    dx = obstacles[0][None, :] - starts[0][:, None]
+    dy = obstacles[1][None, :] - starts[1][:, None]
+    distances = np.hypot(dx, dy)
+    offsets = _wrap_angles(np.arctan2(dy, dx) - np.asarray(angles, dtype=float)[:, None])
+    with np.errstate(divide="ignore"):
+        halves = np.arcsin(np.minimum(2 * Ball.radius / distances, 1.))
+    relevant = (distances > 0) & (distances < np.asarray(lengths, dtype=float)[:, None] + 2 * Ball.radius)
+    if obstacle_ids is not None and ignore_ids is not None:
+        ids = np.asarray(obstacle_ids).ravel()
+        ignore_ids = np.asarray(ignore_ids).reshape(len(starts[0]), -1)
+        relevant &= ~(ids[None, :, None] == ignore_ids[:, None, :]).any(axis=2)
+
+    blocked = (relevant & (np.abs(offsets) < halves)).any(axis=1)
+    high = np.where(relevant & (offsets >= halves), offsets - halves, np.inf).min(axis=1, initial=np.inf)
+    low = np.where(relevant & (offsets <= -halves), offsets + halves, -np.inf).max(axis=1, initial=-np.inf)
+    return np.where(blocked, 0., low), np.where(blocked, 0., high)
+
+
+def get_angular_margins(cue: np.ndarray, balls: np.ndarray, holes: np.ndarray,
+                        obstacles: np.ndarray, obstacle_ids: np.ndarray,
+                        ball_ids: np.ndarray, cue_ids: np.ndarray = -1) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return the range of directions of the white ball that still send the last ball of each chain
+    (white ball -> balls[0] -> ... -> balls[-1] -> hole) within Hole.radius of the hole center
+    without any ball of a path touching an obstacle, as offsets in radians from the nominal direction
+    (toward the ghost ball of balls[0]), low <= 0 <= high.
+
+    The range is computed backward and in closed form: the directions of the last ball reaching the mouth
+    of the hole are cut by the cones of the obstacles, then every direction of a ball is mapped to
+    the direction of the ball hitting it through its ghost ball, and cut by the cones of its own path.
+    The mapping is monotonic as long as the cut angle stays under 90 degrees, so the range of every ball is
+    first cut to the directions it can be given. The range is empty (0, 0) for a blocked chain.
+
+    :param cue: The positions of the white ball, shape (2, M)
+    :param balls: The positions of the K balls of each chain, shape (K, 2, M)
+    :param holes: The positions of the holes, shape (2, M)
+    :param obstacles: The positions of all the balls on the table, shape (2, N)
+    :param obstacle_ids: The ids of these balls, shape (N,)
+    :param ball_ids: The ids of the balls of each chain, shape (K, M)
+    :param cue_ids: The id of the white ball (of each chain, shape (M,))
+    """
+    cue = np.asarray(cue, dtype=float).reshape(2, -1)
+    balls = np.asarray(balls, dtype=float).reshape(-1, 2, cue.shape[1])
+    ball_ids = np.asarray(ball_ids, dtype=np.int64).reshape(len(balls), -1)
+    cue_ids = np.broadcast_to(np.asarray(cue_ids, dtype=np.int64), (cue.shape[1],))
+    holes = np.asarray(holes, dtype=float).reshape(2, -1)
+
+    # The last ball must reach the mouth of the hole
+    vector = holes - balls[-1]
+    length = np.hypot(*vector)
+    angles = np.arctan2(vector[1], vector[0])
+    mouth = np.arcsin(np.minimum(Hole.radius / np.maximum(length, Hole.radius), 1.))
+    low, high = get_free_ranges(balls[-1], angles, length, obstacles, obstacle_ids, ball_ids[-1])
+    low, high = np.maximum(low, -mouth), np.minimum(high, mouth)
+
+    for index in range(len(balls) - 1, -1, -1):
+        starts, start_ids = (balls[index - 1], ball_ids[index - 1]) if index else (cue, cue_ids)
+        ghost = balls[index] - 2 * Ball.radius * np.stack((np.cos(angles), np.sin(angles)))
+        vector = ghost - starts
+        length = np.hypot(*vector)
+        start_angles = np.arctan2(vector[1], vector[0])
+
+        # Only the directions with a cut angle under 90 degrees can be given to this ball
+        vector = balls[index] - starts
+        reachable = np.arccos(np.minimum(2 * Ball.radius / np.maximum(np.hypot(*vector), 2 * Ball.radius), 1.))
+        center = _wrap_angles(np.arctan2(vector[1], vector[0]) - angles)
+        low, high = np.maximum(low, center - reachable), np.minimum(high, center + reachable)
+        empty = low > high
+
+        # The ends of the range of this ball, seen from the ball hitting it
+        ends = []
+        for offset in (low, high):
+            end_angles = angles + offset
+            end_vector = balls[index] - 2 * Ball.radius * np.stack((np.cos(end_angles), np.sin(end_angles))) - starts
+            ends.append(_wrap_angles(np.arctan2(end_vector[1], end_vector[0]) - start_angles))
+        low, high = np.where(empty, 1., np.minimum(*ends)), np.where(empty, -1., np.maximum(*ends))
+
+        free_low, free_high = get_free_ranges(starts, start_angles, length, obstacles, obstacle_ids,
+                                              np.stack((start_ids, ball_ids[index]), axis=1))
+        low, high = np.maximum(low, free_low), np.minimum(high, free_high)
+        angles = start_angles
+
+    empty = (low > 0) | (high < 0)
+    return np.where(empty, 0., low), np.where(empty, 0., high)
+
+
+class OcclusionSweep:
+    """
+    The directions blocked by the balls around one origin (the white ball or an object ball).
+
+    Every ball at a distance d from the origin becomes an angular wedge of half angle asin(clearance / d)
+    around its direction (every direction for a ball closer than the clearance), with a depth
+    sqrt(d^2 - clearance^2), the distance to the ball along the edges of the wedge. A ball rolling from
+    the origin inside the wedge touches it after traveling between d - clearance and d.
+    The wedges are sorted by angle and swept once with a heap (O(N log N)), cutting [-pi, pi) into
+    elementary intervals, each holding the smallest depth of the wedges over it (infinite for a free interval).
+    A target is then checked with a binary search: its path is surely clear if the depth of its direction
+    is at least its distance L plus the clearance, since then every ball over it has d - clearance >= L.
+    """
+
+    def __init__(self, origin: np.ndarray, obstacles: np.ndarray, ids: np.ndarray = None,
+                 origin_id: int = -1, clearance: float = None) -> None:
+        """
+        :param origin: The origin, [x, y]
+        :param obstacles: The positions of the balls, shape (2, N)
+        :param ids: The ids of the balls, shape (N,)
+        :param origin_id: The id of the ball at the origin, which does not block its own paths
+        :param clearance: The minimal distance between a ball and a path (default: 2 * Ball.radius)
+        """
+        self.origin = np.asarray(origin, dtype=float).reshape(2)
+        self.obstacles = np.asarray(obstacles, dtype=float).reshape(2, -1)
+        self.ids = None if ids is None else np.asarray(ids, dtype=np.int64).ravel()
+        self.origin_id = origin_id
+        self.clearance = 2 * Ball.radius if clearance is None else clearance
+
+        vectors = self.obstacles - self.origin[:, None]
+        distances = np.hypot(*vectors)
+        kept = distances > 0
+        if self.ids is not None:
+            kept &= self.ids != origin_id
+        self.obstacles = self.obstacles[:, kept]
+        self.ids = None if self.ids is None else self.ids[kept]
+        angles = np.arctan2(vectors[1], vectors[0])[kept]
+        distances = distances[kept]
+        halves = np.where(distances > self.clearance, np.arcsin(np.minimum(self.clearance / distances, 1.)), np.pi)
+        depths = np.sqrt(np.maximum(distances ** 2 - self.clearance ** 2, 0.))
+        self.bounds, self.depths, self.nearest = self._sweep(angles - halves, angles + halves, depths)
+        self.distances = np.append(distances, np.inf)[self.nearest]  # The distance to the nearest ball, inf if none
+
+    @classmethod
+    def from_store(cls, ball_store: BallStore, ball: Ball, clearance: float = None) -> "OcclusionSweep":
+        """
+        Create the sweep around the given ball of the store, blocked by the other balls of the store.
+        """
+        return cls([ball.x, ball.y], ball_store.get_positions(), ball_store.get_ids(), ball.id, clearance)
+
+    @classmethod
+    def _sweep(cls, starts: np.ndarray, ends: np.ndarray, depths: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return the bounds of the elementary intervals of [-pi, pi), their smallest depth and the index of the
+        wedge of that depth (the nearest ball of the wedges over the interval), -1 if there is none.
+        A wedge crossing -pi or pi is split in two.
+        """
+        balls = np.arange(len(starts))
+        low, high = starts < -np.pi, ends >= np.pi
+        starts = np.concatenate((starts, starts[low] + 2 * np.pi, np.full(high.sum(), -np.pi)))
+        ends = np.concatenate((ends, np.full(low.sum(), np.pi), ends[high] - 2 * np.pi))
+        depths = np.concatenate((depths, depths[low], depths[high]))
+        balls = np.concatenate((balls, balls[low], balls[high]))
+        starts, ends = np.maximum(starts, -np.pi), np.minimum(ends, np.pi)
+
+        bounds = np.unique(np.concatenate(([-np.pi, np.pi], starts, ends)))
+        order = np.argsort(starts, kind="stable")
+        interval_depths = np.full(len(bounds) - 1, np.inf)
+        interval_balls = np.full(len(bounds) - 1, -1, dtype=np.intp)
+        heap, next_wedge = [], 0
+        for index, left in enumerate(bounds[:-1].tolist()):
+            while next_wedge < len(order) and starts[order[next_wedge]] <= left:
+                wedge = order[next_wedge]
+                heappush(heap, (depths[wedge], balls[wedge], ends[wedge]))
+                next_wedge += 1
+            while heap and heap[0][2] <= left:  # Wedges ended before this interval
+                heappop(heap)
+            if heap:
+                interval_depths[index], interval_balls[index] = heap[0][:2]
+        return bounds, interval_depths, interval_balls
+
+    def _get_intervals(self, angles: np.ndarray) -> np.ndarray:
+        """
+        Return the index of the elementary interval of each direction (binary search).
+        """
+        angles = _wrap_angles(np.asarray(angles, dtype=float))
+        return np.clip(np.searchsorted(self.bounds, angles, side="right") - 1, 0, len(self.depths) - 1)
+
+    def get_depths(self, angles: np.ndarray) -> np.ndarray:
+        """
+        Return the depth of each direction: a ball can surely roll from the origin in that direction
+        up to the depth minus the clearance without touching a ball.
+        """
+        return self.depths[self._get_intervals(angles)]
+
+    def get_free_intervals(self) -> np.ndarray:
+        """
+        Return the intervals of directions in which a ball can roll from the origin without touching a ball,
+        shape (K, 2), in radians, sorted.
+        """
+        free = np.isinf(self.depths)
+        changes = np.diff(np.concatenate(([False], free, [False])).astype(np.int8))
+        return np.stack((self.bounds[np.flatnonzero(changes == 1)], self.bounds[np.flatnonzero(changes == -1)]), axis=1)
+
+    def is_clear(self, targets: np.ndarray, target_ids: np.ndarray = None) -> np.ndarray:
+        """
+        Return whether nothing blocks the path from the origin to each target, as blocked_matrix would tell.
+
+        A path is surely clear if the depth of its direction is at least its length plus the clearance, and surely
+        blocked if the nearest ball over it (not its target) is closer than its end. The other paths are checked
+        again with blocked_matrix.
+
+        :param targets: The targets, shape (2, M)
+        :param target_ids: The ids of the balls at the targets, which do not block their own paths, shape (M,)
+                           (only used if the sweep has the ids of the balls)
+        """
+        targets = np.asarray(targets, dtype=float).reshape(2, -1)
+        vectors = targets - self.origin[:, None]
+        intervals, lengths = self._get_intervals(np.arctan2(vectors[1], vectors[0])), np.hypot(*vectors)
+        clear = self.depths[intervals] >= lengths + self.clearance
+        # The nearest ball of the wedges over a direction blocks it for sure if it is closer than the target,
+        # unless it is the target
+        blocked = self.distances[intervals] < lengths
+        if target_ids is not None:
+            target_ids = np.broadcast_to(np.asarray(target_ids, dtype=np.int64), (targets.shape[1],))
+        if target_ids is not None and self.ids is not None:
+            blocked &= np.append(self.ids, -1)[self.nearest[intervals]] != target_ids
+        unsure = np.flatnonzero(~clear & ~blocked)
+        if len(unsure):
+            ignore_ids = np.full((len(unsure), 2), self.origin_id, dtype=np.int64)
+            if target_ids is not None:
+                ignore_ids[:, 1] = target_ids[unsure]
+            starts = np.repeat(self.origin[:, None], len(unsure), axis=1)
+            clear[unsure] = ~blocked_matrix(starts, targets[:, unsure], self.obstacles, self.ids, ignore_ids).any(axis=1)
+        return clear
+
+    def __len__(self) -> int:
+        return len(self.depths)
+
+    def __repr__(self) -> str:
+        return "OcclusionSweep(({x}, {y}), {n} intervals, {f} free)".format(
+            x=self.origin[0], y=self.origin[1], n=len(self), f=len(self.get_free_intervals()))
@@ -0,0 +1,135 @@
+import numpy as np
+from modules.elements import BALL_COLORS, ArrayBallStore, Ball, BallStore, Hole, HoleStore
+
+
+class Layout:
+    """
+    A compact snapshot of a layout made of NumPy arrays only, cheap to send to another process.
+
+    Balls are described by their positions (2, n), their color codes (index in BALL_COLORS),
+    their ids and their player flags, holes by their positions (2, h) and their ids.
+    Positions follow the BallStore convention [[x1, x2, ...], [y1, y2, ...]].
+    """
+
+    def __init__(self, positions: np.ndarray, colors: np.ndarray, ids: np.ndarray, players: np.ndarray,
+                 hole_positions: np.ndarray, hole_ids: np.ndarray) -> None:
+        """
+        Create a layout from its arrays.
+        """
+        self.positions = np.array(positions, dtype=float).reshape(2, -1)
+        self.colors = np.array(colors, dtype=np.int8).ravel()
+        self.ids = np.array(ids, dtype=np.int64).ravel()
+        self.players = np.array(players, dtype=bool).ravel()
+        self.hole_positions = np.array(hole_positions, dtype=float).reshape(2, -1)
+        self.hole_ids = np.array(hole_ids, dtype=np.int64).ravel()
+        if not len(self.colors) == len(self.ids) == len(self.players) == self.positions.shape[1]:
+            raise ValueError("All the ball arrays must have the same length.")
+        if len(self.hole_ids) != self.hole_positions.shape[1]:
+            raise ValueError("All the hole arrays must have the same length.")
+
+    @classmethod
+    def from_stores(cls, ball_store: BallStore, hole_store: HoleStore) -> "Layout":
+        """
+        Create the layout of the balls of the store and the holes of the hole store.
+        """
+        balls = ball_store.get_all()
+        holes = hole_store.get_all()
+        return cls(
+            Ball.get_positions(balls).reshape(2, -1),
+            [BALL_COLORS.index(color) for color in ball_store.get_colors()],
+            [ball.id for ball in balls],
+            [ball.is_player for ball in balls],
+            Hole.get_positions(holes).reshape(2, -1),
+            [hole.id for hole in holes],
+        )
+
+    def to_stores(self) -> tuple[ArrayBallStore, HoleStore]:
+        """
+        Return new stores holding the balls and holes of the layout.
+        Balls and holes get new ids, in the order of the layout (balls grouped by color).
+        """
+        ball_store = ArrayBallStore(capacity=len(self))
+        for code, color in enumerate(BALL_COLORS):
+            mask = self.colors == code
+            ball_store.add_balls(self.positions[0, mask], self.positions[1, mask], color)
+            for ball, player in zip(ball_store.get_all(color), self.players[mask]):
+                ball.player = bool(player)
+        hole_store = HoleStore()
+        hole_store.holes = [Hole(x, y) for x, y in self.hole_positions.T.tolist()]
+        return ball_store, hole_store
+
+    def get_indices(self, color: str) -> np.ndarray:
+        """
+        Return the indices of the balls of the given color.
+        """
+        return np.flatnonzero(self.colors == BALL_COLORS.index(color))
+
+    def get_white_index(self) -> int:
+        """
+        Return the index of the white ball.
+        """
+        white = self.get_indices("white")
+        if not len(white):
+            raise IndexError("There is no white ball in the layout.")
+        return int(white[0])
+
+    def get_targets(self) -> np.ndarray:
+        """
+        Return the indices of the balls the player has to send in a hole (see shots.get_targets).
+        """
+        targets = np.flatnonzero(self.players)
+        return targets if len(targets) else self.get_indices("black")
+
+    def _get_colored(self) -> np.ndarray:
+        """
+        Return whether each ball belongs to one of the players (neither white nor black).
+        """
+        return (self.colors != BALL_COLORS.index("white")) & (self.colors != BALL_COLORS.index("black"))
+
+    @property
+    def player_color(self) -> str:
+        """
+        Return the color of the player, as BallStore.player_color (None if the player has no ball left).
+        """
+        players = np.flatnonzero(self.players)
+        return BALL_COLORS[self.colors[players[0]]] if len(players) else None
+
+    @property
+    def opponent_color(self) -> str:
+        """
+        Return the color of the opponent, as BallStore.opponent_color (None if the opponent has no ball left).
+        """
+        opponents = np.flatnonzero(self._get_colored() & ~self.players)
+        return BALL_COLORS[self.colors[opponents[0]]] if len(opponents) else None
+
+    def swap_players(self) -> "Layout":
+        """
+        Return the layout seen by the opponent, as BallStore.set_players(opponent_color, player_color).
+        """
+        return Layout(self.positions, self.colors, self.ids, self._get_colored() & ~self.players,
+                      self.hole_positions, self.hole_ids)
+
+    def get_arguments(self, holes: np.ndarray = None) -> tuple:
+        """
+        Return the arguments of the shot kernels (get_direct_shots...) for the given holes.
+
+        :param holes: The indices of the holes (default: all)
+        """
+        holes = np.arange(self.n_holes) if holes is None else np.asarray(holes, dtype=np.intp)
+        white, targets = self.get_white_index(), self.get_targets()
+        return (
+            self.positions[:, white],
+            self.positions[:, targets], self.ids[targets],
+            self.hole_positions[:, holes], self.hole_ids[holes],
+            self.positions, self.ids, int(self.ids[white]),
+        )
+
+    @property
+    def n_holes(self) -> int:
+        return len(self.hole_ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __repr__(self) -> str:
+        return "Layout({n} balls, {self.n_holes} holes)".format(self=self, n=len(self))
@@ -0,0 +1,154 @@
+import time
+import numpy as np
+from modules.layout import Layout
+from modules.shots import ShotTable
+from modules.simulation import BatchSimulator, EventSimulator
+
+MAX_SPEED = 700.  # The speed of the hardest shot, in cm/s
+SPEED_MARGIN = 30.  # The distance the ball sent in the hole could still roll at the hole, in centimeters
+MIN_COS_CUT = 0.2  # The smallest cosine of the cut angle used to compute the speed of a shot
+
+
+def get_wilson_interval(successes: np.ndarray, trials: np.ndarray, z: float = 1.96) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return the lower and upper bounds of the Wilson score interval of the success probabilities.
+    Unlike the normal approximation it stays in [0, 1] and keeps a width for 0 or n successes.
+
+    :param successes: The numbers of successes
+    :param trials: The numbers of trials (an interval of 0 trials is [0, 1])
+    :param z: The quantile of the confidence level (1.96 for 95%)
+    """
+    successes, trials = np.asarray(successes, dtype=float), np.asarray(trials, dtype=float)
+    n = np.maximum(trials, 1.)
+    p = successes / n
+    denominator = 1. + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    half = z * np.sqrt(p * (1. - p) / n + z * z / (4 * n * n)) / denominator
+    empty = trials == 0
+    return np.where(empty, 0., np.maximum(center - half, 0.)), np.where(empty, 1., np.minimum(center + half, 1.))
+
+
+def get_aims(table: ShotTable) -> np.ndarray:
+    """
+    Return the angle (in radians) at which the white ball leaves for each shot:
+    toward the first cushion point for a kick shot, toward the ghost ball otherwise.
+    """
+    targets = np.stack((table["aim_x"], table["aim_y"]), axis=1)
+    kicks = (table["kind"] == ShotTable.KINDS.index("kick")) & (table["cushions"] > 0)
+    if kicks.any():
+        targets[kicks] = table["cushion_points"][kicks][:, 0]
+    return np.arctan2(targets[:, 1] - table["cue_y"], targets[:, 0] - table["cue_x"])
+
+
+def get_speeds(table: ShotTable, margin: float = SPEED_MARGIN) -> np.ndarray:
+    """
+    Return the speed (in cm/s) of the white ball for each shot, such that the ball sent in the hole
+    would still roll the given margin past the hole, from the rolling friction, the part of the speed
+    given at the hit and the speed lost on the cushions. Speeds are capped at MAX_SPEED.
+    """
+    deceleration = EventSimulator.FRICTION * EventSimulator.GRAVITY
+    losses = EventSimulator.CUSHION_RESTITUTION ** table["cushions"]
+    kicks = table["kind"] == ShotTable.KINDS.index("kick")
+    ball_speeds = np.sqrt(2 * deceleration * (table["object_distance"] + margin))
+    ball_speeds = np.where(kicks, ball_speeds, ball_speeds / losses)
+    transfer = (1. + EventSimulator.BALL_RESTITUTION) / 2 * np.maximum(np.cos(np.radians(table["cut_angle"])), MIN_COS_CUT)
+    hit_speeds = ball_speeds / transfer
+    hit_speeds = np.where(kicks, hit_speeds / losses, hit_speeds)
+    return np.minimum(np.sqrt(hit_speeds ** 2 + 2 * deceleration * table["cue_distance"]), MAX_SPEED)
+
+
+class SuccessEstimator:
+    """
+    Estimate the probability that shots of a layout succeed when the player misses the aim angle
+    and the speed by a random error, with a Monte Carlo simulation of every sample on a BatchSimulator.
+
+    A sample succeeds if the white ball first hits the expected ball, the ball falls in the expected hole,
+    the white ball stays on the table and no black ball falls (unless it is the ball of the shot).
+    Samples are drawn batch by batch, and a shot is not sampled anymore once the Wilson interval of its
+    probability is narrower than the given width.
+    """
+
+    def __init__(self, layout: Layout, aim_error: float = 0.5, speed_error: float = 0.1, batch: int = 128,
+                 max_samples: int = 2048, width: float = 0.1, z: float = 1.96, dt: float = 2e-3,
+                 seed: int = None) -> None:
+        """
+        :param layout: The layout of the shots
+        :param aim_error: The standard deviation of the aim angle, in degrees
+        :param speed_error: The standard deviation of the speed, relative to the speed of the shot
+        :param batch: The number of samples drawn for a shot at once
+        :param max_samples: The maximum number of samples of a shot
+        :param width: The interval width under which a shot is not sampled anymore
+        :param z: The quantile of the confidence level of the intervals
+        :param dt: The time step of the simulation
+        :param seed: The seed of the random generator
+        """
+        self.layout = layout
+        self.aim_error = aim_error
+        self.speed_error = speed_error
+        self.batch = batch
+        self.max_samples = max_samples
+        self.width = width
+        self.z = z
+        self.dt = dt
+        self.random = np.random.default_rng(seed)
+
+    def _simulate(self, table: ShotTable, shots: np.ndarray, aims: np.ndarray, speeds: np.ndarray) -> np.ndarray:
+        """
+        Return the number of successes of one batch of samples of each given shot.
+        """
+        samples = np.repeat(shots, self.batch)
+        angles = aims[samples] + np.radians(self.aim_error) * self.random.standard_normal(len(samples))
+        norms = speeds[samples] * np.maximum(1. + self.speed_error * self.random.standard_normal(len(samples)), 0.)
+        simulator = BatchSimulator.from_layouts([self.layout] * len(samples))
+        simulator.strike(np.stack((norms * np.cos(angles), norms * np.sin(angles))))
+        simulator.run(self.dt)
+
+        rows = np.arange(len(samples))
+        ball_index = {id: i for i, id in enumerate(self.layout.ids.tolist())}
+        hole_index = {id: i for i, id in enumerate(self.layout.hole_ids.tolist())}
+        balls = np.array([ball_index[id] for id in table["ball_id"][samples].tolist()], dtype=np.intp)
+        firsts = np.array([ball_index[id] for id in table["first_id"][samples].tolist()], dtype=np.intp)
+        holes = np.array([hole_index[id] for id in table["hole_id"][samples].tolist()], dtype=np.intp)
+        blacks = self.layout.get_indices("black")
+        success = (simulator.first_contact == firsts) & (simulator.pocketed[rows, balls] == holes)
+        success &= simulator.pocketed[rows, simulator.cue] < 0
+        if len(blacks):
+            black_pocketed = (simulator.pocketed[:, blacks] >= 0) & (blacks[None, :] != balls[:, None])
+            success &= ~black_pocketed.any(axis=1)
+        return success.reshape(len(shots), self.batch).sum(axis=1)
+
+    def estimate(self, table: ShotTable, time_budget: float = None) -> ShotTable:
+        """
+        Return the shots of the table with the columns probability, probability_low, probability_high
+        (the Wilson interval) and samples, sorted from the most probable (shots of equal probability keep their order).
+        The open shots are sampled together, one batch each, until their intervals are narrow enough,
+        they reach max_samples or the time budget (in seconds) runs out.
+        """
+        start = time.perf_counter()
+        aims, speeds = get_aims(table), get_speeds(table)
+        successes = np.zeros(len(table), dtype=np.int64)
+        trials = np.zeros(len(table), dtype=np.int64)
+        while True:
+            low, high = get_wilson_interval(successes, trials, self.z)
+            shots = np.flatnonzero((high - low > self.width) & (trials < self.max_samples))
+            if not len(shots) or (time_budget is not None and time.perf_counter() - start > time_budget):
+                break
+            successes[shots] += self._simulate(table, shots, aims, speeds)
+            trials[shots] += self.batch
+
+        columns = dict(table.columns)
+        columns["probability"] = successes / np.maximum(trials, 1)
+        columns["probability_low"], columns["probability_high"] = low, high
+        columns["samples"] = trials
+        return ShotTable(columns).take(np.argsort(-columns["probability"], kind="stable"))
+
+    def rerank(self, table: ShotTable, top: int = 5, time_budget: float = None) -> ShotTable:
+        """
+        Return the given number of easiest feasible shots of the table, sorted by their estimated probability.
+        """
+        ranked = table.get_ranked()
+        return self.estimate(ranked.take(np.arange(min(top, len(ranked)))), time_budget)
+
+    def __repr__(self) -> str:
+        return "SuccessEstimator({self.layout}, aim error {self.aim_error} deg, speed error {self.speed_error})".format(
+            self=self)
@@ -0,0 +1,113 @@
+import numpy as np
+from modules.layout import Layout
+from modules.shots import ShotTable, get_direct_shots
+
+MAX_BALLS = 9  # The largest number of balls to clear (the balls of the player and the black ball)
+
+
+class RunoutPlanner:
+    """
+    Plan the order in which the player clears their balls, then the black ball, with the smallest total difficulty.
+
+    Each step is the easiest feasible direct shot on a ball still to clear, from the position of the white ball,
+    with the balls still on the table in the way. After a shot the white ball is assumed to end at the position
+    of the ball it sent in the hole (a follow shot), so the state of the run-out is the set of balls left and
+    the last ball cleared. The plan is a dynamic program over the subsets of balls left:
+
+        cost(left, last) = min over the next ball b of shot(left, last, b) + cost(left - {b}, b)
+
+    memoized by (left, last), where plans stranding fewer balls always come first. The shots of one state are
+    computed by one vectorized get_direct_shots call, and memoized too. With k balls there are at most
+    k * 2^(k-1) states.
+    """
+
+    def __init__(self, layout: Layout, holes: np.ndarray = None) -> None:
+        """
+        :param layout: The layout
+        :param holes: The indices of the holes in the layout (default: all)
+        """
+        self.layout = layout
+        holes = np.arange(layout.n_holes) if holes is None else np.asarray(holes, dtype=np.intp)
+        self.hole_positions, self.hole_ids = layout.hole_positions[:, holes], layout.hole_ids[holes]
+        self.white = layout.get_white_index()
+        self.balls = np.flatnonzero(layout.players)  # The balls to clear, the black ball last
+        self.black = layout.get_indices("black")[:1]
+        self.balls = np.r_[self.balls, self.black]
+        if len(self.balls) > MAX_BALLS:
+            raise ValueError("A run-out of more than {} balls is too long to plan.".format(MAX_BALLS))
+        self.others = np.setdiff1d(np.arange(len(layout)), np.r_[self.balls, self.white])  # Never cleared
+        self.shots = {}  # (left, last) -> (difficulties of the balls, rows of their shots)
+        self.costs = {}  # (left, last) -> (balls stranded, difficulty, next ball)
+
+    def _get_targets(self, left: int) -> np.ndarray:
+        """
+        Return the indices (in self.balls) of the balls that can be played next: the balls of the player
+        still on the table, or the black ball once they are all cleared.
+        """
+        indices = np.flatnonzero([(left >> i) & 1 for i in range(len(self.balls))])
+        if len(self.black) and len(indices) > 1:
+            indices = indices[indices != len(self.balls) - 1]
+        return indices
+
+    def get_shots(self, left: int, last: int) -> tuple[np.ndarray, ShotTable]:
+        """
+        Return the difficulty of the easiest feasible direct shot on every ball left (inf if there is none)
+        and the table of these shots (one row per ball that can be played next), the white ball being
+        at the position of the last ball cleared (-1 for its own position).
+
+        :param left: The bit mask of the balls left (bit i for self.balls[i])
+        :param last: The index in self.balls of the last ball cleared, -1 before the first shot
+        """
+        key = (left, last)
+        if key not in self.shots:
+            layout = self.layout
+            cue = layout.positions[:, self.white if last < 0 else self.balls[last]]
+            targets = self._get_targets(left)
+            on_table = np.r_[self.balls[[i for i in range(len(self.balls)) if (left >> i) & 1]], self.others]
+            obstacles = np.c_[cue[:, None], layout.positions[:, on_table]]
+            obstacle_ids = np.r_[layout.ids[self.white], layout.ids[on_table]]
+            table = get_direct_shots(cue, layout.positions[:, self.balls[targets]], layout.ids[self.balls[targets]],
+                                     self.hole_positions, self.hole_ids, obstacles, obstacle_ids,
+                                     int(layout.ids[self.white]))
+            difficulties = np.where(table["feasible"], table["difficulty"], np.inf).reshape(len(targets), -1)
+            rows = len(self.hole_ids) * np.arange(len(targets)) + difficulties.argmin(axis=1)
+            costs = np.full(len(self.balls), np.inf)
+            costs[targets] = difficulties.min(axis=1)
+            self.shots[key] = costs, table.take(rows)
+        return self.shots[key]
+
+    def get_cost(self, left: int, last: int = -1) -> tuple[int, float, int]:
+        """
+        Return the best plan from the balls left: the number of balls it leaves on the table (0 for a full
+        run-out), its total difficulty and its next ball (-1 if it stops there). Plans clearing more balls
+        come first, then the easiest ones.
+        """
+        key = (left, last)
+        if key not in self.costs:
+            shots, _ = self.get_shots(left, last) if left else (np.empty(0), None)
+            best = (bin(left).count("1"), 0., -1)
+            for ball in np.flatnonzero(np.isfinite(shots)).tolist():
+                stranded, cost, _ = self.get_cost(left & ~(1 << ball), ball)
+                if (stranded, cost + shots[ball]) < best[:2]:
+                    best = (stranded, float(cost + shots[ball]), ball)
+            self.costs[key] = best
+        return self.costs[key]
+
+    def solve(self) -> tuple[list[int], float, ShotTable]:
+        """
+        Return the ids of the balls in the order of the easiest run-out, its total difficulty and its shots
+        (one row per ball). If no run-out clears every ball, the plan is the easiest of those clearing the most.
+        """
+        left, last = (1 << len(self.balls)) - 1, -1
+        _, total, ball = self.get_cost(left, last)
+        order, tables = [], []
+        while ball >= 0:
+            _, table = self.get_shots(left, last)
+            tables.append(table.take(np.flatnonzero(self._get_targets(left) == ball)))
+            order.append(int(self.layout.ids[self.balls[ball]]))
+            left, last = left & ~(1 << ball), ball
+            ball = self.get_cost(left, last)[2]
+        return order, total, ShotTable.concatenate(tables)
+
+    def __repr__(self) -> str:
+        return "RunoutPlanner({n} balls, {s} states)".format(n=len(self.balls), s=len(self.costs))
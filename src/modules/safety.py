@@ -0,0 +1,185 @@
+from collections import OrderedDict
+from typing import Callable
+import numpy as np
+from modules.cache import LayoutKey
+from modules.elements import Ball
+from modules.layout import Layout
+from modules.shots import ShotTable
+from modules.select_trajectory import get_difficulties
+from modules.simulation import BatchSimulator, EventSimulator
+from modules.solver import ParallelSolver
+
+CUT_ANGLES = (-60., -30., 0., 30., 60.)  # The cut angles of the candidate safety shots, in degrees
+ROLLS = (10., 30., 60.)  # The distances the white ball would still roll at the contact, in centimeters
+
+
+class OpponentEvaluator:
+    """
+    Return the difficulty of the easiest shot of the player of many layouts at once, with a cache.
+
+    The layouts of a batch are keyed by LayoutKey: the ones already cached or equal within the tolerance
+    to another layout of the batch are not solved again, the others are solved together by the solver
+    (ParallelSolver.solve_all by default, in this process). The cache drops the least recently used layouts.
+    """
+
+    def __init__(self, max_entries: int = 4096, tolerance: float = 0.5,
+                 solver: Callable[[list[Layout]], list[ShotTable]] = None) -> None:
+        """
+        :param max_entries: The maximum number of cached layouts
+        :param tolerance: The quantization step of the positions of the keys, in centimeters
+        :param solver: The function returning the ranked shots of each of the given layouts
+        """
+        self.max_entries = max_entries
+        self.tolerance = tolerance
+        self.solver = solver if solver is not None else ParallelSolver(max_workers=0).solve_all
+        self.entries = OrderedDict()  # LayoutKey -> difficulty of the easiest shot (inf if there is none)
+        self.hits = 0
+        self.misses = 0
+
+    def evaluate(self, layouts: list[Layout]) -> np.ndarray:
+        """
+        Return the difficulty of the easiest feasible shot of the player of each layout, inf if there is none.
+        """
+        keys = [LayoutKey(layout, self.tolerance) for layout in layouts]
+        values, missing = {}, {}  # The values of the batch, read before any eviction
+        for key, layout in zip(keys, layouts):
+            if key in values or key in missing:
+                self.hits += 1
+            elif key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                values[key] = self.entries[key]
+            else:
+                self.misses += 1
+                missing[key] = layout
+        for key, table in zip(missing, self.solver(list(missing.values()))):
+            values[key] = self.entries[key] = float(table["difficulty"][0]) if len(table) else np.inf
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return np.array([values[key] for key in keys])
+
+    def get_stats(self) -> dict:
+        """
+        Return the counters of the evaluator: entries, hits, misses and hit rate.
+        """
+        lookups = self.hits + self.misses
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __repr__(self) -> str:
+        return "OpponentEvaluator({n}/{self.max_entries} layouts, {self.hits} hits, {self.misses} misses)".format(
+            self=self, n=len(self))
+
+
+class SafetySearch:
+    """
+    Search the safety shot leaving the opponent the hardest easiest shot, for when no shot can be made.
+
+    The candidates are soft shots on every ball the player may hit first, at the cut angles CUT_ANGLES and
+    with the speeds at which the white ball would roll ROLLS further at the contact. They are all played at once
+    on a BatchSimulator, which gives the end positions of the balls. A candidate is legal if the white ball
+    first hits one of these balls, does not fall, and the black ball does not fall. The legal end layouts,
+    seen from the opponent (Layout.swap_players), are evaluated in one batch by an OpponentEvaluator.
+    """
+
+    def __init__(self, cut_angles: tuple = CUT_ANGLES, rolls: tuple = ROLLS,
+                 evaluator: OpponentEvaluator = None, dt: float = 2e-3) -> None:
+        """
+        :param cut_angles: The cut angles of the candidates, in degrees
+        :param rolls: The distances the white ball would still roll at the contact, in centimeters
+        :param evaluator: The evaluator of the end layouts (default: a new OpponentEvaluator)
+        :param dt: The time step of the simulation
+        """
+        self.cut_angles = np.asarray(cut_angles, dtype=float)
+        self.rolls = np.asarray(rolls, dtype=float)
+        self.evaluator = evaluator if evaluator is not None else OpponentEvaluator()
+        self.dt = dt
+
+    def get_candidates(self, layout: Layout) -> ShotTable:
+        """
+        Return the candidate safety shots of the layout, not played yet (NaN end positions).
+        Rows are ordered by ball, then by cut angle, then by roll.
+        """
+        white, targets = layout.get_white_index(), layout.get_targets()
+        cue = layout.positions[:, white]
+        grid = np.meshgrid(targets, self.cut_angles, self.rolls, indexing="ij")
+        balls, cuts, rolls = (array.ravel() for array in grid)
+        offsets = layout.positions[:, balls] - cue[:, None]
+        distances = np.hypot(*offsets)
+        # The white ball path passes at 2 r sin(cut) from the center of the ball: it hits it at the given cut angle
+        sines = np.clip(2 * Ball.radius * np.sin(np.radians(cuts)) / np.maximum(distances, 2 * Ball.radius), -1., 1.)
+        angles = np.arctan2(offsets[1], offsets[0]) + np.arcsin(sines)
+        cue_distances = distances * np.cos(np.arcsin(sines)) - 2 * Ball.radius * np.cos(np.radians(cuts))
+        aims = cue[:, None] + cue_distances * np.stack((np.cos(angles), np.sin(angles)))
+        deceleration = EventSimulator.FRICTION * EventSimulator.GRAVITY
+        nan = np.full(len(balls), np.nan)
+        return ShotTable.from_columns(
+            "safety",
+            ball_id=layout.ids[balls], hole_id=np.full(len(balls), -1, dtype=np.int64),
+            cue_x=np.full(len(balls), cue[0]), cue_y=np.full(len(balls), cue[1]),
+            ball_x=layout.positions[0, balls], ball_y=layout.positions[1, balls],
+            hole_x=nan, hole_y=nan.copy(),
+            aim_x=aims[0], aim_y=aims[1],
+            cut_angle=np.abs(cuts),
+            cue_distance=cue_distances, object_distance=nan.copy(),
+            bounces=np.ones(len(balls), dtype=np.int64),
+            blocked=np.zeros(len(balls), dtype=bool), feasible=np.zeros(len(balls), dtype=bool),
+            difficulty=get_difficulties(cue_distances, np.abs(cuts), 1),
+            angle=angles, speed=np.sqrt(2 * deceleration * (cue_distances + rolls)),
+            cue_end_x=nan.copy(), cue_end_y=nan.copy(), ball_end_x=nan.copy(), ball_end_y=nan.copy(),
+            opponent_difficulty=nan.copy(),
+        )
+
+    def play(self, layout: Layout, table: ShotTable) -> list[Layout]:
+        """
+        Play the candidate shots of the table at once, filling their end positions and their feasibility
+        (legality) in place. Return the end layout of each shot, with the balls that fell removed.
+        """
+        simulator = BatchSimulator.from_layouts([layout] * len(table))
+        simulator.strike(np.stack((table["speed"] * np.cos(table["angle"]), table["speed"] * np.sin(table["angle"]))))
+        simulator.run(self.dt)
+        rows = np.arange(len(table))
+        index = {id: i for i, id in enumerate(layout.ids.tolist())}
+        balls = np.array([index[id] for id in table["ball_id"].tolist()], dtype=np.intp)
+        blacks, targets = layout.get_indices("black"), layout.get_targets()
+        legal = np.isin(simulator.first_contact, targets) & (simulator.pocketed[rows, simulator.cue] < 0)
+        if len(blacks) and not np.isin(blacks, targets).any():
+            legal &= (simulator.pocketed[:, blacks] < 0).all(axis=1)
+        table["feasible"][:] = legal
+        table["blocked"][:] = simulator.first_contact != balls
+        table["cue_end_x"][:], table["cue_end_y"][:] = simulator.positions[rows, :, simulator.cue].T
+        table["ball_end_x"][:], table["ball_end_y"][:] = simulator.positions[rows, :, balls].T
+        layouts = []
+        for row in rows:
+            left = simulator.pocketed[row] < 0
+            layouts.append(Layout(simulator.positions[row][:, left], layout.colors[left], layout.ids[left],
+                                  layout.players[left], layout.hole_positions, layout.hole_ids))
+        return layouts
+
+    def search(self, layout: Layout) -> ShotTable:
+        """
+        Return the legal safety shots of the layout with the difficulty of the easiest shot they leave to the
+        opponent (opponent_difficulty, inf if none), from the one leaving the hardest (then from the easiest shot).
+        """
+        table = self.get_candidates(layout)
+        if not len(table):
+            return table
+        layouts = self.play(layout, table)
+        legal = np.flatnonzero(table["feasible"])
+        table["opponent_difficulty"][legal] = self.evaluator.evaluate([layouts[row].swap_players() for row in legal])
+        table = table.take(legal)
+        return table.take(np.lexsort((table["difficulty"], -table["opponent_difficulty"])))
+
+    def get_best(self, layout: Layout) -> dict:
+        """
+        Return the best safety shot of the layout as a row, or None if no candidate is legal.
+        """
+        table = self.search(layout)
+        return table.get_row(0) if len(table) else None
+
+    def __repr__(self) -> str:
+        return "SafetySearch({c} cut angles, {r} rolls, {self.evaluator})".format(
+            self=self, c=len(self.cut_angles), r=len(self.rolls))
@@ -1,6 +1,12 @@
+from heapq import heappop, heappush
+from itertools import count, islice
+from typing import Iterator
 from modules.trajectory import Trajectory
 from modules.elements import BallStore, HoleStore, Hole, Ball
 from modules.trajectory import TrajectoryStore
+from modules.visibility import VisibilityGraph
+from modules.geometry import endpoint_id, get_angular_margins
+import numpy as np
 
 DIFICULTIES = {
     'ONE CENTIMETER': 0.2,
@@ -10,9 +16,78 @@ DIFICULTIES = {
     'TOUCH BLACK BALL': 50,
 }  # TODO: Define the level
 
+
+def get_difficulties(distances: np.ndarray, angles: np.ndarray, bounces: np.ndarray,
+                     touch_black: np.ndarray = False, touch_opponent: np.ndarray = False) -> np.ndarray:
+    """Return the difficulties of many trajectories at once, from their columns
+
+    The terms are the ones of SelectTrajectory.get_difficulty, which every path scores on the same scale:
+    the trajectories of a TrajectoryStore there, the shots of a ShotTable in modules.shots.
+
+    :param distances: The total distances
+    :param angles: The total angles, in degrees
+    :param bounces: The numbers of bounce
+    :param touch_black: Whether the trajectories touch the black ball
+    :param touch_opponent: Whether the trajectories touch an opponent ball
+    """
+    difficulties = np.asarray(distances, dtype=float) * DIFICULTIES['ONE CENTIMETER']
+    difficulties = difficulties + np.asarray(angles, dtype=float) * DIFICULTIES['ONE DEGREE']
+    difficulties = difficulties + np.asarray(bounces, dtype=float) * DIFICULTIES['BOUNCE']
+    difficulties = difficulties + np.where(touch_black, DIFICULTIES['TOUCH BLACK BALL'], 0.)
+    difficulties = difficulties + np.where(touch_opponent, DIFICULTIES['TOUCH OPPONENT BALL'], 0.)
+    return difficulties
+
+
+def get_top_k(difficulties: np.ndarray, k: int = None, hardest: bool = False) -> np.ndarray:
+    """Return the indices of the k easiest (or hardest) difficulties, from the easiest (or the hardest)
+
+    Only the k best are sorted (partial sort), ties keep the order of the indices.
+
+    :param difficulties: The difficulties
+    :param k: The number of indices (default: all)
+    :param hardest: Return the hardest instead of the easiest
+    """
+    keys = np.asarray(difficulties, dtype=float).ravel()
+    keys = -keys if hardest else keys
+    k = len(keys) if k is None else min(max(k, 0), len(keys))
+    if k == 0:
+        return np.zeros(0, dtype=np.intp)
+    candidates = np.arange(len(keys))
+    if k < len(keys):
+        threshold = keys[np.argpartition(keys, k - 1)[k - 1]]
+        candidates = np.flatnonzero(keys <= threshold)  # Keep all the ties of the k-th value
+    return candidates[np.lexsort((candidates, keys[candidates]))][:k]
+
+
+
+def _get_extension_costs(direction: np.ndarray, units: np.ndarray, distances: np.ndarray, is_black: np.ndarray,
+                         is_player: np.ndarray, touch_black: bool, touch_opponent: bool) -> tuple[np.ndarray, np.ndarray]:
+    """Return the angles and the costs of extending a chain with each ball hitting its head
+
+    A cost holds the terms of get_difficulty for the new trajectory: its distance, its angle with the
+    following trajectory, a bounce, and the first touch of the black ball or of an opponent ball.
+
+    :param direction: The unit vector from the head of the chain to the following element
+    :param units: The unit vectors from each ball to the head, shape (2, n)
+    :param distances: The distances from each ball to the head
+    :param is_black: Whether each ball is the black ball
+    :param is_player: Whether each ball is a player ball
+    :param touch_black: Whether the chain already touches the black ball
+    :param touch_opponent: Whether the chain already touches an opponent ball
+
+    :return: tuple[np.ndarray, np.ndarray]: The angles, in radians, and the costs
+    """
+    angles = np.arccos(np.clip(direction @ units, -1., 1.))
+    costs = (distances * DIFICULTIES['ONE CENTIMETER'] + np.degrees(angles) * DIFICULTIES['ONE DEGREE']
+             + DIFICULTIES['BOUNCE'])
+    costs = costs + np.where(is_black & ~touch_black, DIFICULTIES['TOUCH BLACK BALL'], 0.)
+    costs = costs + np.where(~is_player & ~touch_opponent, DIFICULTIES['TOUCH OPPONENT BALL'], 0.)
+    return angles, costs
+
 class SelectTrajectory:
     """A class to select the best trajectory"""
     MAX_BOUNCE = 4  # The maximum number of bounce
+    MAX_ANGLE = 90  # The maximum angle between two following trajectories, in degrees
 
     def __init__(self):
         self.trajectories = {}  # The trajectories soted by number of bounce (countain a list of TrajectoryStore)
@@ -26,36 +101,65 @@ class SelectTrajectory:
         self.trajectories[number_of_bounce].append(trajectory_store)
 
     def get_easiest(self, ball_store: BallStore) -> tuple[list[TrajectoryStore], float]:
-        """Return the easiest trajectory"""
-        difficulty = min(self.get_trajectories_by_difficulty(ball_store).keys())
-        self._easiest = self.get_trajectories_by_difficulty(ball_store, difficulty)
+        """Return the easiest trajectories (all the ones with the lowest difficulty) and their difficulty"""
+        trajectories, difficulties = self.get_scores(ball_store)
+        difficulty = float(difficulties.min())
+        self._easiest = [trajectories[i] for i in np.flatnonzero(difficulties == difficulty)]
         return self._easiest, difficulty
     
     def get_hardest(self, ball_store: BallStore) -> tuple[list[TrajectoryStore], float]:
-        """Return the hardest trajectory"""
-        difficulty = max(self.get_trajectories_by_difficulty(ball_store).keys())
-        self._hardest = self.get_trajectories_by_difficulty(ball_store, difficulty)
+        """Return the hardest trajectories (all the ones with the highest difficulty) and their difficulty"""
+        trajectories, difficulties = self.get_scores(ball_store)
+        difficulty = float(difficulties.max())
+        self._hardest = [trajectories[i] for i in np.flatnonzero(difficulties == difficulty)]
         return self._hardest, difficulty
+
+    def get_ranked(self, ball_store: BallStore, k: int = None,
+                   hardest: bool = False) -> tuple[list[TrajectoryStore], np.ndarray]:
+        """Return the k easiest (or hardest) trajectories and their difficulties, from the easiest (or the hardest)
+
+        :param ball_store: The ball store
+        :param k: The number of trajectories (default: all)
+        :param hardest: Rank from the hardest instead of the easiest
+        """
+        trajectories, difficulties = self.get_scores(ball_store)
+        indices = get_top_k(difficulties, k, hardest)
+        return [trajectories[i] for i in indices], difficulties[indices]
     
     def get_trajectories(self, number_of_bounce: int = None) -> list[TrajectoryStore]:
         """Return the trajectories"""
         if number_of_bounce is None:
             trajectories = []
-            for number_of_bounce in self.trajectories.items():
-                trajectories.extend(self.trajectories[number_of_bounce])
+            for trajectory_stores in self.trajectories.values():
+                trajectories.extend(trajectory_stores)
             return trajectories
         else:
             return self.trajectories[number_of_bounce]
+
+    def get_scores(self, ball_store: BallStore) -> tuple[list[TrajectoryStore], np.ndarray]:
+        """Return all the trajectories and their difficulties, computed at once"""
+        trajectories = self.get_trajectories()
+        return trajectories, get_difficulties(**SelectTrajectory.get_columns(trajectories, ball_store))
     
-    def get_trajectories_by_difficulty(self, ball_store: BallStore, which_difficulty: str = None) -> dict[list[TrajectoryStore]]|list[TrajectoryStore]:
+    def get_by_margin(self, ball_store: BallStore, min_margin: float = 0.,
+                      k: int = None) -> tuple[list[TrajectoryStore], np.ndarray]:
+        """Return the k trajectories with the widest angular margins above min_margin and their margins, from the widest
+
+        :param ball_store: The ball store
+        :param min_margin: The smallest margin kept, in degrees
+        :param k: The number of trajectories (default: all)
+        """
+        trajectories = self.get_trajectories()
+        margins = SelectTrajectory.get_margins(trajectories, ball_store)
+        kept = np.flatnonzero(margins >= min_margin)
+        indices = kept[get_top_k(margins[kept], k, hardest=True)]
+        return [trajectories[i] for i in indices], margins[indices]
+
+    def get_trajectories_by_difficulty(self, ball_store: BallStore, which_difficulty: float = None) -> dict[list[TrajectoryStore]]|list[TrajectoryStore]:
         """Return the trajectories by difficulty"""
         trajectories = {}
-        for _, trajectory_stores in zip(self.trajectories.keys(), self.trajectories.values()):
-            for trajectory_store in trajectory_stores:
-                difficulty = int(round(SelectTrajectory.get_difficulty(trajectory_store, ball_store)))
-                if difficulty not in trajectories:
-                    trajectories[difficulty] = []
-                trajectories[difficulty].append(trajectory_store)
+        for trajectory_store, difficulty in zip(*self.get_scores(ball_store)):
+            trajectories.setdefault(float(difficulty), []).append(trajectory_store)
 
         if which_difficulty is not None:
             return trajectories[which_difficulty]
@@ -71,20 +175,40 @@ class SelectTrajectory:
         :param hole_id: The hole id (default: 0)
         :param number_of_bounce: The number of bounce (default: 4)
         """
+        white_ball = ball_store.get_white_ball()
+        graph = VisibilityGraph(ball_store, hole_store)  # line of sight between all balls and holes
         for i in range(1, number_of_bounce):  # number of bounce
             ball_not_use = []  # list of ball that is not use in this bounce
             while True:  # loop until find a trajectory
                 trajectory, _ = SelectTrajectory.select_trajectory(  # select trajectory
-                    ball_store, hole, number_of_bounce=i, ball_already_use=ball_not_use)
-                if trajectory and trajectory.is_possible(ball_store)[0]:  # if trajectory is possible
+                    ball_store, hole, number_of_bounce=i, ball_already_use=list(ball_not_use))
+                if trajectory is None:  # if trajectory is not found
+                    break
+                possible, impossible_trajectories = trajectory.is_possible(ball_store, graph)
+                if possible:  # if trajectory is possible
                     self.add_trajectory(trajectory, i)  # add trajectory to list
                     break
-                elif trajectory:  # if trajectory is not possible
+                # if trajectory is not possible, do not use its blocked balls and try again
+                new_balls = [ball for impossible_trajectory in impossible_trajectories
+                             for ball in impossible_trajectory.get_balls()
+                             if ball != white_ball and ball not in ball_not_use]
+                if not new_balls:
                     break
-                else:  # if trajectory is not found
-                    for inpossible_trajectory in trajectory.is_possible(ball_store)[1]:  # add ball that is not use in this bounce
-                        ball_not_use.append(inpossible_trajectory.get_arrival())
-                        ball_not_use.append(inpossible_trajectory.get_departure())
+                ball_not_use.extend(new_balls)
+
+    def select_combinations(self, ball_store: BallStore, hole_store: HoleStore,
+                            hole: Hole, max_bounce: int = None) -> None:
+        """Select the easiest combination of balls sending a player ball in the hole.
+
+        :param ball_store: The ball store
+        :param hole_store: The hole store
+        :param hole: The hole
+        :param max_bounce: The maximum number of bounce (default: MAX_BOUNCE)
+        """
+        graph = VisibilityGraph(ball_store, hole_store)
+        trajectory, _ = SelectTrajectory.search_combinations(ball_store, hole, max_bounce, graph=graph)
+        if trajectory is not None:
+            self.add_trajectory(trajectory, trajectory.get_number_of_bounces())
 
     @classmethod
     def select_trajectory(cls,
@@ -133,16 +257,286 @@ class SelectTrajectory:
         trajectory_store.insert_trajectory(0, Trajectory(departure, last_ball, tags))
         return trajectory_store, ball_already_use
     
+    @classmethod
+    def search_combinations(cls,
+                            ball_store: BallStore, hole: Hole,
+                            max_bounce: int = None,
+                            tags: list = [],
+                            graph: VisibilityGraph = None,
+                           ) -> tuple[TrajectoryStore, float]:
+        """Search the easiest chain white ball -> ball -> ... -> ball -> hole (branch and bound)
+
+        Chains are built backward from the hole: first the player ball going in the hole,
+        then the balls hitting it, until a player ball that the white ball can hit.
+        Every trajectory must be clear in the visibility graph and the angle between two following trajectories
+        must be lower than MAX_ANGLE. A branch is dropped as soon as its partial difficulty
+        (computed as in get_difficulty) reaches the difficulty of the best complete chain.
+
+        :param ball_store: The ball store
+        :param hole: The hole
+        :param max_bounce: The maximum number of bounce (default: MAX_BOUNCE)
+        :param tags: The tags of the trajectories
+        :param graph: The visibility graph of the layout, with the hole (built if not given)
+
+        :return: tuple[TrajectoryStore, float]: The easiest chain and its difficulty, or (None, inf)
+        """
+        max_bounce = cls.MAX_BOUNCE if max_bounce is None else max_bounce
+        white_ball = ball_store.get_white_ball()
+        balls = [ball for ball in ball_store.get_all() if ball != white_ball]
+        n = len(balls)
+        if n == 0 or max_bounce < 1:
+            return None, np.inf
+
+        # Nodes of the balls, then of the hole (index n), then of the white ball (index n + 1)
+        graph = VisibilityGraph(ball_store, [hole]) if graph is None else graph
+        nodes = np.r_[graph.get_indices(balls), graph.get_index(hole), graph.get_index(white_ball)]
+        distances = graph.distances[np.ix_(nodes, nodes)]
+        units = graph.directions[:, nodes][:, :, nodes]  # units[:, i, j] goes from i to j
+
+        # clear[i, j]: nothing blocks the trajectory from i (ball or white ball) to j (ball or hole)
+        clear = graph.clear[np.ix_(nodes, nodes)][:, :n + 1]
+        clear[n] = False
+
+        is_player = np.array([ball.is_player for ball in balls])
+        is_black = np.array([ball == ball_store.get_black_ball() for ball in balls]) if ball_store.get_all("black") else np.zeros(n, dtype=bool)
+        max_angle = np.radians(cls.MAX_ANGLE)
+        best = {'difficulty': np.inf, 'chain': None}
+
+        def expand(chain: list, difficulty: float, touch_black: bool, touch_opponent: bool) -> None:
+            head, following = chain[-1], chain[-2] if len(chain) > 1 else n
+            direction = units[:, head, following]
+
+            # Complete the chain with the white ball
+            if is_player[head] and clear[n + 1, head]:
+                angle = np.arccos(np.clip(units[:, n + 1, head] @ direction, -1., 1.))
+                if angle < max_angle:
+                    total = (difficulty + distances[n + 1, head] * DIFICULTIES['ONE CENTIMETER']
+                             + np.degrees(angle) * DIFICULTIES['ONE DEGREE'])
+                    if total < best['difficulty']:
+                        best['difficulty'], best['chain'] = total, list(chain)
+
+            if len(chain) >= max_bounce:
+                return
+            # Extend the chain with a ball hitting the head, cheapest first
+            angles, costs = _get_extension_costs(direction, units[:, :n, head], distances[:n, head], is_black, is_player,
+                                                 touch_black, touch_opponent)
+            candidates = clear[:n, head] & (angles < max_angle)
+            candidates[chain] = False
+            for ball in np.flatnonzero(candidates)[np.argsort(costs[candidates], kind="stable")]:
+                if difficulty + costs[ball] >= best['difficulty']:
+                    break  # The following candidates are even more expensive
+                expand(chain + [int(ball)], difficulty + costs[ball],
+                       touch_black or bool(is_black[ball]), touch_opponent or not is_player[ball])
+
+        # The ball going in the hole must be a player ball
+        first_costs = distances[:n, n] * DIFICULTIES['ONE CENTIMETER'] + DIFICULTIES['BOUNCE']
+        candidates = np.flatnonzero(is_player & clear[:n, n])
+        for ball in candidates[np.argsort(first_costs[candidates], kind="stable")]:
+            if first_costs[ball] >= best['difficulty']:
+                break
+            expand([int(ball)], first_costs[ball], False, False)
+
+        if best['chain'] is None:
+            return None, np.inf
+        trajectory_store = TrajectoryStore()
+        chain = best['chain']
+        trajectory_store.add_trajectory_by_instance(Trajectory(white_ball, balls[chain[-1]], tags))
+        for i in range(len(chain) - 1, 0, -1):
+            trajectory_store.add_trajectory_by_instance(Trajectory(balls[chain[i]], balls[chain[i - 1]], tags))
+        trajectory_store.add_trajectory_by_instance(Trajectory(balls[chain[0]], hole, tags))
+        return trajectory_store, best['difficulty']
+
+    @classmethod
+    def iter_candidates(cls,
+                        ball_store: BallStore, holes: list[Hole],
+                        max_bounce: int = None,
+                        tags: list = [],
+                        graph: VisibilityGraph = None,
+                        stats: dict = None,
+                       ) -> Iterator[tuple[TrajectoryStore, float]]:
+        """Yield the chains white ball -> ball -> ... -> ball -> hole from the easiest (best-first search)
+
+        Chains are built backward from the holes with the costs of search_combinations. The frontier is a heap
+        of partial chains ordered by their cost plus a lower bound of the cost left: the straight-line distance
+        from the white ball to the head of the chain (no path to the head is shorter). A complete chain is pushed
+        with its difficulty and yielded when it is popped, so chains come in non-decreasing difficulty and only
+        the partial chains cheaper than the last one yielded are expanded. The memory is the one of the frontier.
+
+        :param ball_store: The ball store
+        :param holes: The holes
+        :param max_bounce: The maximum number of bounce (default: MAX_BOUNCE)
+        :param tags: The tags of the trajectories
+        :param graph: The visibility graph of the layout, with the holes (built if not given)
+        :param stats: A dict receiving the numbers of chains expanded and pushed and the largest frontier size
+
+        :return: Iterator[tuple[TrajectoryStore, float]]: The chains and their difficulties
+        """
+        max_bounce = cls.MAX_BOUNCE if max_bounce is None else max_bounce
+        stats = {} if stats is None else stats
+        stats.update(expanded=0, pushed=0, frontier=0)
+        white_ball = ball_store.get_white_ball()
+        balls = [ball for ball in ball_store.get_all() if ball != white_ball]
+        n = len(balls)
+        if n == 0 or max_bounce < 1 or not holes:
+            return
+
+        # Nodes of the balls, then of the holes (indices n to n + h - 1), then of the white ball
+        graph = VisibilityGraph(ball_store, holes) if graph is None else graph
+        nodes = np.r_[graph.get_indices(balls), graph.get_indices(holes), graph.get_index(white_ball)]
+        white = len(nodes) - 1
+        distances = graph.distances[np.ix_(nodes, nodes)]
+        units = graph.directions[:, nodes][:, :, nodes]
+        clear = graph.clear[np.ix_(nodes, nodes)]
+        clear[n:white] = False  # Nothing leaves a hole
+
+        is_player = np.array([ball.is_player for ball in balls])
+        is_black = np.array([ball == ball_store.get_black_ball() for ball in balls]) if ball_store.get_all("black") else np.zeros(n, dtype=bool)
+        max_angle = np.radians(cls.MAX_ANGLE)
+        bounds = distances[white, :n] * DIFICULTIES['ONE CENTIMETER']  # The lower bound of the cost left at each head
+
+        # Entries: (priority, order, chain from the hole, cost, touch black, touch opponent, complete)
+        frontier, order = [], count()
+
+        def push(priority: float, chain: tuple, cost: float, touch_black: bool, touch_opponent: bool,
+                 complete: bool) -> None:
+            heappush(frontier, (priority, next(order), chain, cost, touch_black, touch_opponent, complete))
+            stats['pushed'] += 1
+            stats['frontier'] = max(stats['frontier'], len(frontier))
+
+        for hole in range(n, white):
+            for ball in np.flatnonzero(is_player & clear[:n, hole]):
+                cost = distances[ball, hole] * DIFICULTIES['ONE CENTIMETER'] + DIFICULTIES['BOUNCE']
+                push(cost + bounds[ball], (hole, int(ball)), cost, False, False, False)
+
+        while frontier:
+            _, _, chain, cost, touch_black, touch_opponent, complete = heappop(frontier)
+            if complete:
+                trajectory_store = TrajectoryStore()
+                trajectory_store.add_trajectory_by_instance(Trajectory(white_ball, balls[chain[-1]], tags))
+                for i in range(len(chain) - 1, 1, -1):
+                    trajectory_store.add_trajectory_by_instance(Trajectory(balls[chain[i]], balls[chain[i - 1]], tags))
+                trajectory_store.add_trajectory_by_instance(Trajectory(balls[chain[1]], holes[chain[0] - n], tags))
+                yield trajectory_store, cost
+                continue
+
+            stats['expanded'] += 1
+            head, following = chain[-1], chain[-2]
+            direction = units[:, head, following]
+
+            # Complete the chain with the white ball
+            if is_player[head] and clear[white, head]:
+                angle = np.arccos(np.clip(units[:, white, head] @ direction, -1., 1.))
+                if angle < max_angle:
+                    total = (cost + distances[white, head] * DIFICULTIES['ONE CENTIMETER']
+                             + np.degrees(angle) * DIFICULTIES['ONE DEGREE'])
+                    push(total, chain, total, touch_black, touch_opponent, True)
+
+            if len(chain) - 1 >= max_bounce:
+                continue
+            # Extend the chain with every ball hitting the head
+            angles, costs = _get_extension_costs(direction, units[:, :n, head], distances[:n, head], is_black, is_player,
+                                                 touch_black, touch_opponent)
+            candidates = clear[:n, head] & (angles < max_angle)
+            candidates[list(chain[1:])] = False
+            for ball in np.flatnonzero(candidates):
+                push(cost + costs[ball] + bounds[ball], chain + (int(ball),), cost + costs[ball],
+                     touch_black or bool(is_black[ball]), touch_opponent or not is_player[ball], False)
+
+    def select_best_first(self, ball_store: BallStore, hole_store: HoleStore, k: int = 1,
+                          max_bounce: int = None) -> list[tuple[TrajectoryStore, float]]:
+        """Select the k easiest chains into any hole, found best-first (see iter_candidates).
+
+        :param ball_store: The ball store
+        :param hole_store: The hole store
+        :param k: The number of chains
+        :param max_bounce: The maximum number of bounce (default: MAX_BOUNCE)
+
+        :return: list[tuple[TrajectoryStore, float]]: The chains and their difficulties, from the easiest
+        """
+        candidates = list(islice(SelectTrajectory.iter_candidates(ball_store, hole_store.get_all(), max_bounce), k))
+        for trajectory_store, _ in candidates:
+            self.add_trajectory(trajectory_store, trajectory_store.get_number_of_bounces())
+        return candidates
+
+    @classmethod
+    def get_columns(cls, trajectory_stores: list[TrajectoryStore], ball_store: BallStore) -> dict[str, np.ndarray]:
+        """Return the columns of get_difficulties for the trajectory stores, one value per store
+
+        :param trajectory_stores: The trajectory stores
+        :param ball_store: The ball store
+
+        :return: dict[str, np.ndarray]: The distances, angles, bounces, touch_black and touch_opponent columns
+        """
+        trajectories = [trajectory for store in trajectory_stores for trajectory in store.get_all()]
+        sizes = np.array([len(store) for store in trajectory_stores], dtype=np.intp)
+        owners = np.repeat(np.arange(len(trajectory_stores)), sizes)
+        starts = np.array([[t.departure.x for t in trajectories], [t.departure.y for t in trajectories]], dtype=float)
+        ends = np.array([[t.arrival.x for t in trajectories], [t.arrival.y for t in trajectories]], dtype=float)
+        vectors = (ends - starts).reshape(2, -1)
+        lengths = np.hypot(*vectors)
+
+        # Angles between the following trajectories of a same store
+        following = owners[:-1] == owners[1:]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cosines = (vectors[:, :-1] * vectors[:, 1:]).sum(axis=0) / (lengths[:-1] * lengths[1:])
+        angles = np.degrees(np.arccos(np.clip(cosines, -1., 1.)))[following]
+
+        # Role masks of the balls of each trajectory, from the ids of its ends (-1 for a hole)
+        ends_ids = np.array([[endpoint_id(t.departure) for t in trajectories],
+                             [endpoint_id(t.arrival) for t in trajectories]], dtype=np.int64).reshape(2, -1)
+        black_ids = [ball.id for ball in ball_store.get_all("black")][:1]
+        player_ids = [ball.id for ball in ball_store.get_all() if ball.is_player]
+        white_ids = [ball.id for ball in ball_store.get_all("white")]
+        touch_black = np.isin(ends_ids, black_ids).any(axis=0)
+        touch_opponent = ((ends_ids >= 0) & ~np.isin(ends_ids, player_ids + white_ids)).any(axis=0)
+
+        count = len(trajectory_stores)
+        return {
+            'distances': np.bincount(owners, lengths, minlength=count),
+            'angles': np.bincount(owners[:-1][following], angles, minlength=count),
+            'bounces': sizes - 1,
+            'touch_black': np.bincount(owners, touch_black, minlength=count) > 0,
+            'touch_opponent': np.bincount(owners, touch_opponent, minlength=count) > 0,
+        }
+
+    @classmethod
+    def get_margins(cls, trajectory_stores: list[TrajectoryStore], ball_store: BallStore) -> np.ndarray:
+        """Return the angular margin of each trajectory store, in degrees (see geometry.get_angular_margins)
+
+        The margin is the error of the white ball direction, whichever side it is made, that still sends
+        the last ball in the hole without touching another ball. Stores of the same length are computed at once.
+
+        :param trajectory_stores: The trajectory stores, from the white ball to a hole
+        :param ball_store: The ball store
+
+        :return: np.ndarray: The margins, 0 for a blocked trajectory
+        """
+        balls = ball_store.get_all()
+        obstacles = Ball.get_positions(balls).reshape(2, -1)
+        obstacle_ids = np.array([ball.id for ball in balls], dtype=np.int64)
+        margins = np.zeros(len(trajectory_stores))
+        sizes = np.array([len(store) for store in trajectory_stores], dtype=np.intp)
+        for size in np.unique(sizes):
+            indices = np.flatnonzero(sizes == size)
+            chains = [[t.departure for t in trajectory_stores[i].get_all()] + [trajectory_stores[i].get_all()[-1].arrival]
+                      for i in indices]
+            points = np.array([[[element.x, element.y] for element in chain] for chain in chains], dtype=float)
+            ids = np.array([[endpoint_id(element) for element in chain] for chain in chains], dtype=np.int64)
+            low, high = get_angular_margins(points[:, 0].T, points[:, 1:-1].transpose(1, 2, 0), points[:, -1].T,
+                                            obstacles, obstacle_ids, ids[:, 1:-1].T, ids[:, 0])
+            margins[indices] = np.degrees(np.minimum(-low, high))
+        return margins
+
     @classmethod
     def get_difficulty(cls, trajectory: TrajectoryStore, ball_store: BallStore) -> float:
         """Return the difficulty of the trajectory"""
         difficulty = 0
         difficulty += trajectory.get_total_distance() * DIFICULTIES['ONE CENTIMETER']
-        difficulty += trajectory.get_total_angle() * DIFICULTIES['ONE DEGREE']
+        difficulty += np.degrees(trajectory.get_total_angle()) * DIFICULTIES['ONE DEGREE']
         difficulty += trajectory.get_number_of_bounces() * DIFICULTIES['BOUNCE']
         if trajectory.touch_black_ball(ball_store):
             difficulty += DIFICULTIES['TOUCH BLACK BALL']
-        if trajectory.touch_an_opponent_ball():
+        if trajectory.touch_an_opponent_ball(ball_store):
             difficulty += DIFICULTIES['TOUCH OPPONENT BALL']
         return difficulty
 
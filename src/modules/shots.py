@@ -0,0 +1,583 @@
+import numpy as np
+from modules.elements import Ball, BallStore, Hole, HoleStore, Table
+from modules.geometry import (
+    RAILS, OcclusionSweep, blocked_matrix, clamp_to_cushions, get_angular_margins, get_cushion_points, get_lattice_cells,
+    get_lattice_images, mirror_points, unfold_path,
+)
+from modules.select_trajectory import get_difficulties
+from modules.trajectory import Trajectory, TrajectoryStore
+from modules.visibility import VisibilityGraph
+
+MAX_CUT_ANGLE = 90.  # The maximum cut angle of a shot, in degrees
+
+
+class ShotTable:
+    """
+    A table of candidate shots, stored column by column as NumPy arrays with one row per shot.
+
+    Columns:
+    - kind: The index of the kind of shot in KINDS
+    - ball_id: The id of the ball sent in the hole
+    - first_id: The id of the first ball hit by the white ball
+    - hole_id: The id of the hole
+    - cue_x, cue_y: The position of the white ball
+    - ball_x, ball_y: The position of the ball sent in the hole
+    - hole_x, hole_y: The position of the hole
+    - aim_x, aim_y: The position of the white ball when it hits the first ball (ghost ball)
+    - cut_angle: The angle between the white ball path and the ball path at the contact, in degrees
+      (the sum of the angles of both hits for a combination shot)
+    - cue_distance: The distance traveled by the white ball
+    - object_distance: The distance traveled by the ball(s) up to the hole
+    - bounces: The number of balls hit, as in TrajectoryStore.get_number_of_bounces
+    - cushions: The number of cushions hit
+    - cushion_points: The points where the cushions are hit, shape (n, max cushions, 2), NaN if unused
+    - margin: The error of the white ball direction, in degrees, that still pockets the ball without touching
+      another ball, whichever side it is made (see geometry.get_angular_margins), NaN if not computed
+    - blocked: Whether a ball is in the way
+    - feasible: Whether the shot can be played
+    - difficulty: The difficulty of the shot, scored as SelectTrajectory.get_difficulty scores the same chain of
+      balls: from the path between the centers from the white ball to the hole, and the angles in degrees
+      between its legs at the balls hit (see _get_path_difficulties)
+    A safety shot (see safety.SafetySearch) sends no ball in a hole: its hole_id is -1, its hole position NaN,
+    and it has the columns of its end positions and of the easiest shot it leaves to the opponent.
+    """
+    KINDS = ("direct", "bank", "kick", "combination", "safety")
+
+    def __init__(self, columns: dict[str, np.ndarray]) -> None:
+        """
+        Create a table from its columns, which must all have the same length.
+        """
+        if len({len(column) for column in columns.values()}) > 1:
+            raise ValueError("All the columns must have the same length.")
+        self.columns = columns
+
+    @classmethod
+    def from_columns(cls, kind: str, **columns) -> "ShotTable":
+        """
+        Create a table of shots of the given kind, filling the missing columns with their default.
+        """
+        size = len(columns["ball_id"])
+        columns.setdefault("first_id", columns["ball_id"])
+        columns.setdefault("cushions", np.zeros(size, dtype=np.int64))
+        columns.setdefault("cushion_points", np.full((size, 0, 2), np.nan))
+        columns.setdefault("margin", np.full(size, np.nan))
+        columns["kind"] = np.full(size, cls.KINDS.index(kind), dtype=np.int8)
+        return cls(columns)
+
+    @classmethod
+    def concatenate(cls, tables: list["ShotTable"]) -> "ShotTable":
+        """
+        Return a table with the rows of all the given tables.
+        Columns with more than one dimension are padded to the widest table.
+        """
+        tables = [table for table in tables if table.columns]
+        if not tables:
+            return cls({})
+        columns = {}
+        for name in tables[0].columns:
+            parts = [table[name] for table in tables]
+            if parts[0].ndim > 1:
+                width = max(part.shape[1] for part in parts)
+                parts = [cls._pad(part, width) for part in parts]
+            columns[name] = np.concatenate(parts)
+        return cls(columns)
+
+    @classmethod
+    def _pad(cls, column: np.ndarray, width: int) -> np.ndarray:
+        """
+        Pad the second dimension of the column to the given width with NaN (or -1 for integers).
+        """
+        if column.shape[1] == width:
+            return column
+        fill = -1 if np.issubdtype(column.dtype, np.integer) else np.nan
+        padded = np.full((column.shape[0], width) + column.shape[2:], fill, dtype=column.dtype)
+        padded[:, :column.shape[1]] = column
+        return padded
+
+    def take(self, indices: np.ndarray) -> "ShotTable":
+        """
+        Return a table with the rows at the given indices, in the given order.
+        """
+        return ShotTable({name: column[indices] for name, column in self.columns.items()})
+
+    def get_feasible(self) -> "ShotTable":
+        """
+        Return the feasible shots.
+        """
+        return self.take(np.flatnonzero(self["feasible"]))
+
+    def get_ranked(self) -> "ShotTable":
+        """
+        Return the feasible shots from the easiest to the hardest.
+        Shots of equal difficulty keep their order.
+        """
+        feasible = np.flatnonzero(self["feasible"])
+        return self.take(feasible[np.argsort(self["difficulty"][feasible], kind="stable")])
+
+    def get_best(self) -> dict:
+        """
+        Return the easiest feasible shot as a row, or None if no shot is feasible.
+        """
+        ranked = self.get_ranked()
+        return ranked.get_row(0) if len(ranked) else None
+
+    def get_row(self, index: int) -> dict:
+        """
+        Return the shot at the given index as a dict of its columns, with the kind as a string.
+        """
+        row = {name: column[index] for name, column in self.columns.items()}
+        row["kind"] = ShotTable.KINDS[row["kind"]]
+        return row
+
+    def get_kind(self, kind: str) -> "ShotTable":
+        """
+        Return the shots of the given kind.
+        """
+        return self.take(np.flatnonzero(self["kind"] == ShotTable.KINDS.index(kind)))
+
+    def get_paths(self, index: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return the paths of the white ball and of the ball sent in the hole for the shot at the given index,
+        as arrays of points of the form [[x1, x2, ...], [y1, y2, ...]].
+        """
+        cushion_points = self["cushion_points"][index]
+        cushion_points = cushion_points[~np.isnan(cushion_points).any(axis=1)].T
+        cue = np.array([[self["cue_x"][index]], [self["cue_y"][index]]])
+        aim = np.array([[self["aim_x"][index]], [self["aim_y"][index]]])
+        ball = np.array([[self["ball_x"][index]], [self["ball_y"][index]]])
+        hole = np.array([[self["hole_x"][index]], [self["hole_y"][index]]])
+        if ShotTable.KINDS[self["kind"][index]] == "kick":
+            return np.hstack((cue, cushion_points, aim)), np.hstack((ball, hole))
+        if ShotTable.KINDS[self["kind"][index]] == "safety":
+            cue_end = np.array([[self["cue_end_x"][index]], [self["cue_end_y"][index]]])
+            ball_end = np.array([[self["ball_end_x"][index]], [self["ball_end_y"][index]]])
+            return np.hstack((cue, aim, cue_end)), np.hstack((ball, ball_end))
+        return np.hstack((cue, aim)), np.hstack((ball, cushion_points, hole))
+
+    def get_trajectory_store(self, index: int, ball_store: BallStore, hole_store: HoleStore) -> TrajectoryStore:
+        """
+        Return the balls and hole of the shot at the given index as a TrajectoryStore,
+        from the white ball to the hole (cushions are not part of it).
+        """
+        balls = ball_store.get_all()
+        white_ball = ball_store.get_white_ball()
+        ball = Ball.get_by_id(int(self["ball_id"][index]), balls)
+        first = Ball.get_by_id(int(self["first_id"][index]), balls)
+        trajectory_store = TrajectoryStore()
+        trajectory_store.add_trajectory_by_instance(Trajectory(white_ball, first, []))
+        if first != ball:
+            trajectory_store.add_trajectory_by_instance(Trajectory(first, ball, []))
+        trajectory_store.add_trajectory_by_instance(Trajectory(ball, hole_store.get_hole(int(self["hole_id"][index])), []))
+        return trajectory_store
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.get_row(index)
+
+    def __repr__(self) -> str:
+        return "ShotTable({n} shots, {feasible} feasible)".format(
+            n=len(self), feasible=int(self["feasible"].sum()) if self.columns else 0)
+
+
+def _get_pairs(objects: np.ndarray, object_ids: np.ndarray,
+               holes: np.ndarray, hole_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Return the positions and ids of every (ball, hole) pair, ordered by ball, then by hole.
+    """
+    objects = np.asarray(objects, dtype=float).reshape(2, -1)
+    holes = np.asarray(holes, dtype=float).reshape(2, -1)
+    n_objects, n_holes = objects.shape[1], holes.shape[1]
+    ball_positions = objects[:, :, None].repeat(n_holes, axis=2).reshape(2, -1)
+    hole_positions = holes[:, None, :].repeat(n_objects, axis=1).reshape(2, -1)
+    ball_ids = np.asarray(object_ids, dtype=np.int64).repeat(n_holes)
+    pair_hole_ids = np.tile(np.asarray(hole_ids, dtype=np.int64), n_objects)
+    return ball_positions, hole_positions, ball_ids, pair_hole_ids
+
+
+def _get_ghosts(balls: np.ndarray, arrivals: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Return the unit vectors from the balls to their arrivals, the distances, and the position of the
+    white ball when it hits the balls to send them there (ghost balls).
+    """
+    vectors = arrivals - balls
+    distances = np.hypot(*vectors)
+    units = vectors / np.where(distances > 0, distances, 1.)
+    return units, distances, balls - 2 * Ball.radius * units
+
+
+def _get_cut_angles(incoming: np.ndarray, units: np.ndarray) -> np.ndarray:
+    """
+    Return the angles in degrees between the incoming white ball paths and the outgoing ball directions.
+    """
+    lengths = np.hypot(*incoming)
+    cosines = (incoming * units).sum(axis=0) / np.where(lengths > 0, lengths, 1.)
+    return np.degrees(np.arccos(np.clip(cosines, -1., 1.)))
+
+
+def _get_path_difficulties(points: list[np.ndarray], contacts: list[int], bounces: np.ndarray) -> np.ndarray:
+    """
+    Return the difficulties of paths through the given points, as SelectTrajectory.get_difficulty (see get_difficulties).
+
+    :param points: The points of the paths in order, from the white ball to the hole, each of shape (2, n)
+    :param contacts: The indices in points of the balls hit, where the angle between the legs is counted
+    :param bounces: The numbers of bounces (balls hit and cushions)
+    """
+    legs = [end - start for start, end in zip(points[:-1], points[1:])]
+    lengths = [np.hypot(*leg) for leg in legs]
+    angles = 0.
+    for contact in contacts:
+        cosines = (legs[contact - 1] * legs[contact]).sum(axis=0) / np.maximum(lengths[contact - 1] * lengths[contact], 1e-12)
+        angles = angles + np.degrees(np.arccos(np.clip(cosines, -1., 1.)))
+    return get_difficulties(sum(lengths), angles, bounces)
+
+
+def _is_blocked(starts: np.ndarray, ends: np.ndarray, obstacles: np.ndarray, obstacle_ids: np.ndarray,
+                *ignore_ids: np.ndarray) -> np.ndarray:
+    """
+    Return whether a ball blocks each segment, ignoring the given ids for each segment.
+    """
+    size = np.shape(starts)[1]
+    ignore_ids = np.stack([np.broadcast_to(ids, (size,)) for ids in ignore_ids], axis=1)
+    return blocked_matrix(starts, ends, obstacles, obstacle_ids, ignore_ids).any(axis=1)
+
+
+def _is_blocked_from_cue(cues: np.ndarray, ends: np.ndarray, obstacles: np.ndarray, obstacle_ids: np.ndarray,
+                         cue_id: int, end_ids: np.ndarray = -1, cue_sweep: OcclusionSweep = None) -> np.ndarray:
+    """
+    Return whether a ball blocks the white ball on its way to each end, ignoring the ball at the end,
+    from the occlusion sweep around the white ball if it is given.
+    """
+    if cue_sweep is None:
+        return _is_blocked(cues, ends, obstacles, obstacle_ids, cue_id, end_ids)
+    return ~cue_sweep.is_clear(ends, end_ids)
+
+
+def _is_away_from_holes(points: np.ndarray, holes: np.ndarray) -> np.ndarray:
+    """
+    Return whether each point is out of every hole, so that a ball hitting the cushion there is not pocketed.
+    """
+    holes = np.asarray(holes, dtype=float).reshape(2, -1)
+    distances = np.hypot(points[0][:, None] - holes[0][None, :], points[1][:, None] - holes[1][None, :])
+    return (distances >= Hole.radius).all(axis=1)
+
+
+def get_direct_shots(cue: np.ndarray, objects: np.ndarray, object_ids: np.ndarray,
+                     holes: np.ndarray, hole_ids: np.ndarray,
+                     obstacles: np.ndarray, obstacle_ids: np.ndarray, cue_id: int = -1,
+                     object_clear: np.ndarray = None, cue_sweep: OcclusionSweep = None) -> ShotTable:
+    """
+    Return every direct shot from the white ball to every object ball to every hole, computed in one pass.
+    Rows are ordered by object ball, then by hole.
+
+    :param cue: The position of the white ball, [x, y]
+    :param objects: The positions of the balls to send in a hole, shape (2, T)
+    :param object_ids: The ids of these balls, shape (T,)
+    :param holes: The positions of the holes, shape (2, H)
+    :param hole_ids: The ids of the holes, shape (H,)
+    :param obstacles: The positions of all the balls on the table, shape (2, N)
+    :param obstacle_ids: The ids of these balls, shape (N,)
+    :param cue_id: The id of the white ball, so that it does not block its own path
+    :param object_clear: Whether nothing blocks each ball from each hole, shape (T, H),
+                         for instance from a VisibilityGraph (computed if not given)
+    :param cue_sweep: The occlusion sweep around the white ball, shared by the paths of the white ball
+                      of every kind of shot (see get_shots)
+    """
+    cue = np.asarray(cue, dtype=float).reshape(2, 1)
+    ball_positions, hole_positions, ball_ids, shot_hole_ids = _get_pairs(objects, object_ids, holes, hole_ids)
+    cues = cue.repeat(len(ball_ids), axis=1)
+
+    # The ball goes straight to the hole, the white ball must hit it from the opposite side (ghost ball)
+    units, object_distances, aims = _get_ghosts(ball_positions, hole_positions)
+    cue_distances = np.hypot(*(aims - cues))
+    cut_angles = _get_cut_angles(aims - cues, units)
+
+    if object_clear is None:
+        object_blocked = _is_blocked(ball_positions, hole_positions, obstacles, obstacle_ids, ball_ids)
+    else:
+        object_blocked = ~np.asarray(object_clear, dtype=bool).ravel()
+    blocked = object_blocked | _is_blocked_from_cue(cues, aims, obstacles, obstacle_ids, cue_id, ball_ids, cue_sweep)
+    feasible = ~blocked & (cut_angles < MAX_CUT_ANGLE) & (object_distances > 0) & (cue_distances > 0)
+    low, high = get_angular_margins(cues, ball_positions[None], hole_positions, obstacles, obstacle_ids,
+                                    ball_ids[None], cue_id)
+
+    return ShotTable.from_columns(
+        "direct",
+        ball_id=ball_ids, hole_id=shot_hole_ids,
+        cue_x=cues[0], cue_y=cues[1],
+        ball_x=ball_positions[0], ball_y=ball_positions[1],
+        hole_x=hole_positions[0], hole_y=hole_positions[1],
+        aim_x=aims[0], aim_y=aims[1],
+        cut_angle=cut_angles,
+        cue_distance=cue_distances, object_distance=object_distances,
+        bounces=np.ones(len(ball_ids), dtype=np.int64),
+        margin=np.degrees(np.minimum(-low, high)),
+        blocked=blocked, feasible=feasible,
+        difficulty=_get_path_difficulties([cues, ball_positions, hole_positions], [1], 1),
+    )
+
+
+def get_bank_shots(cue: np.ndarray, objects: np.ndarray, object_ids: np.ndarray,
+                   holes: np.ndarray, hole_ids: np.ndarray,
+                   obstacles: np.ndarray, obstacle_ids: np.ndarray, cue_id: int = -1,
+                   max_cushions: int = 1, max_travel: float = None, cue_sweep: OcclusionSweep = None,
+                   min_cushions: int = 1, pockets: np.ndarray = None) -> ShotTable:
+    """
+    Return every bank shot, where the ball hits min_cushions to max_cushions cushions before going in the hole.
+
+    The table is unfolded across its cushion lines (see get_lattice_cells), so that a path through
+    k cushions is a straight line from the ball to an image of the hole. Images farther than
+    max_travel from the ball (default: the length plus the width of the table) are skipped before
+    anything else is computed. Rows are ordered by lattice cell, then by ball, then by hole.
+    The other parameters are the ones of get_direct_shots.
+
+    :param pockets: The positions of every hole of the table, which the cushion points must stay out of,
+                    shape (2, P) (default: holes)
+    """
+    if max_travel is None:
+        max_travel = sum(Table.TABLE_DIMENSION)
+    cue = np.asarray(cue, dtype=float).reshape(2, 1)
+    ball_positions, hole_positions, ball_ids, shot_hole_ids = _get_pairs(objects, object_ids, holes, hole_ids)
+    # The center of the ball can only reach the hole from inside the cushions
+    targets = clamp_to_cushions(hole_positions)
+
+    tables = []
+    for cell in get_lattice_cells(max_cushions):
+        if np.abs(cell).sum() < min_cushions:
+            continue
+        images = get_lattice_images(targets, cell)
+        close = np.flatnonzero(np.hypot(*(images - ball_positions)) <= max_travel)
+        if len(close) == 0:
+            continue
+        balls, cell_images, cell_targets = ball_positions[:, close], images[:, close], targets[:, close]
+        cell_ball_ids, cushions = ball_ids[close], int(np.abs(cell).sum())
+        cues = cue.repeat(len(close), axis=1)
+
+        cushion_points, valid = unfold_path(balls, cell_images, cell)
+        for point in cushion_points:
+            valid &= _is_away_from_holes(point, holes if pockets is None else pockets)
+        units, object_distances, aims = _get_ghosts(balls, cell_images)
+        cue_distances = np.hypot(*(aims - cues))
+        cut_angles = _get_cut_angles(aims - cues, units)
+
+        # Every leg of the ball, from the ball to the cushions to the hole
+        legs = np.concatenate((balls[None], cushion_points, cell_targets[None]))
+        starts = legs[:-1].transpose(1, 0, 2).reshape(2, -1)
+        ends = legs[1:].transpose(1, 0, 2).reshape(2, -1)
+        blocked = _is_blocked(starts, ends, obstacles, obstacle_ids, np.tile(cell_ball_ids, cushions + 1))
+        blocked = blocked.reshape(cushions + 1, -1).any(axis=0)
+        blocked |= _is_blocked_from_cue(cues, aims, obstacles, obstacle_ids, cue_id, cell_ball_ids, cue_sweep)
+        feasible = valid & ~blocked & (cut_angles < MAX_CUT_ANGLE) & (cue_distances > 0)
+
+        tables.append(ShotTable.from_columns(
+            "bank",
+            ball_id=cell_ball_ids, hole_id=shot_hole_ids[close],
+            cue_x=cues[0], cue_y=cues[1],
+            ball_x=balls[0], ball_y=balls[1],
+            hole_x=hole_positions[0, close], hole_y=hole_positions[1, close],
+            aim_x=aims[0], aim_y=aims[1],
+            cut_angle=cut_angles,
+            cue_distance=cue_distances, object_distance=object_distances,
+            bounces=np.ones(len(close), dtype=np.int64),
+            cushions=np.full(len(close), cushions, dtype=np.int64),
+            cushion_points=cushion_points.transpose(2, 0, 1),
+            blocked=blocked, feasible=feasible,
+            difficulty=_get_path_difficulties([cues, balls, *cushion_points, hole_positions[:, close]], [1],
+                                              1 + cushions),
+        ))
+    return ShotTable.concatenate(tables)
+
+
+def get_kick_shots(cue: np.ndarray, objects: np.ndarray, object_ids: np.ndarray,
+                   holes: np.ndarray, hole_ids: np.ndarray,
+                   obstacles: np.ndarray, obstacle_ids: np.ndarray, cue_id: int = -1,
+                   object_clear: np.ndarray = None, cue_sweep: OcclusionSweep = None,
+                   pockets: np.ndarray = None) -> ShotTable:
+    """
+    Return every kick shot, where the white ball hits one cushion before the ball, which goes straight
+    in the hole. The white ball is aimed at the image of the ghost ball across the cushion.
+    Rows are ordered by rail (see RAILS), then by ball, then by hole.
+    The parameters are the ones of get_direct_shots, and pockets the one of get_bank_shots.
+    """
+    cue = np.asarray(cue, dtype=float).reshape(2, 1)
+    ball_positions, hole_positions, ball_ids, shot_hole_ids = _get_pairs(objects, object_ids, holes, hole_ids)
+    units, object_distances, ghosts = _get_ghosts(ball_positions, hole_positions)
+    if object_clear is None:
+        object_blocked = _is_blocked(ball_positions, hole_positions, obstacles, obstacle_ids, ball_ids)
+    else:
+        object_blocked = ~np.asarray(object_clear, dtype=bool).ravel()
+
+    n_rails = len(RAILS)
+    rails = np.arange(n_rails).repeat(len(ball_ids))
+    images = mirror_points(ghosts).transpose(1, 0, 2).reshape(2, -1)
+    balls, hole_positions, aims, units = (np.tile(array, n_rails) for array in (ball_positions, hole_positions, ghosts, units))
+    ball_ids, shot_hole_ids, object_distances = (np.tile(array, n_rails) for array in (ball_ids, shot_hole_ids, object_distances))
+    cues = cue.repeat(len(ball_ids), axis=1)
+
+    cushion_points, valid = get_cushion_points(cues, images, rails)
+    valid &= _is_away_from_holes(cushion_points, holes if pockets is None else pockets)
+    cue_distances = np.hypot(*(images - cues))
+    cut_angles = _get_cut_angles(aims - cushion_points, units)
+
+    blocked = (np.tile(object_blocked, n_rails)
+               | _is_blocked_from_cue(cues, cushion_points, obstacles, obstacle_ids, cue_id, cue_sweep=cue_sweep)
+               | _is_blocked(cushion_points, aims, obstacles, obstacle_ids, cue_id, ball_ids))
+    feasible = valid & ~blocked & (cut_angles < MAX_CUT_ANGLE) & (object_distances > 0)
+
+    return ShotTable.from_columns(
+        "kick",
+        ball_id=ball_ids, hole_id=shot_hole_ids,
+        cue_x=cues[0], cue_y=cues[1],
+        ball_x=balls[0], ball_y=balls[1],
+        hole_x=hole_positions[0], hole_y=hole_positions[1],
+        aim_x=aims[0], aim_y=aims[1],
+        cut_angle=cut_angles,
+        cue_distance=cue_distances, object_distance=object_distances,
+        bounces=np.ones(len(ball_ids), dtype=np.int64),
+        cushions=np.ones(len(ball_ids), dtype=np.int64),
+        cushion_points=cushion_points.T[:, None, :],
+        blocked=blocked, feasible=feasible,
+        difficulty=_get_path_difficulties([cues, cushion_points, balls, hole_positions], [2], 2),
+    )
+
+
+def get_combination_shots(cue: np.ndarray, objects: np.ndarray, object_ids: np.ndarray,
+                          holes: np.ndarray, hole_ids: np.ndarray,
+                          obstacles: np.ndarray, obstacle_ids: np.ndarray, cue_id: int = -1,
+                          cue_sweep: OcclusionSweep = None) -> ShotTable:
+    """
+    Return every combination shot, where the white ball hits an object ball (first_id) which sends another
+    object ball (ball_id) straight in the hole. The cut angle is the sum of the cut angles of both hits.
+    Rows are ordered by first ball, then by ball, then by hole.
+    The parameters are the ones of get_direct_shots.
+    """
+    cue = np.asarray(cue, dtype=float).reshape(2, 1)
+    objects = np.asarray(objects, dtype=float).reshape(2, -1)
+    object_ids = np.asarray(object_ids, dtype=np.int64).ravel()
+    ball_positions, hole_positions, ball_ids, shot_hole_ids = _get_pairs(objects, object_ids, holes, hole_ids)
+
+    # Every first ball with every (ball, hole) pair of another ball
+    firsts, pairs = np.nonzero(object_ids[:, None] != ball_ids[None, :])
+    first_positions, first_ids = objects[:, firsts], object_ids[firsts]
+    ball_positions, hole_positions = ball_positions[:, pairs], hole_positions[:, pairs]
+    ball_ids, shot_hole_ids = ball_ids[pairs], shot_hole_ids[pairs]
+    cues = cue.repeat(len(ball_ids), axis=1)
+
+    # The first ball goes to the ghost ball of the ball, the white ball to the ghost ball of the first ball
+    units, object_distances, ghosts = _get_ghosts(ball_positions, hole_positions)
+    first_units, first_distances, aims = _get_ghosts(first_positions, ghosts)
+    cue_distances = np.hypot(*(aims - cues))
+    first_cuts = _get_cut_angles(aims - cues, first_units)
+    cuts = _get_cut_angles(ghosts - first_positions, units)
+
+    blocked = (_is_blocked(ball_positions, hole_positions, obstacles, obstacle_ids, ball_ids)
+               | _is_blocked(first_positions, ghosts, obstacles, obstacle_ids, first_ids, ball_ids)
+               | _is_blocked_from_cue(cues, aims, obstacles, obstacle_ids, cue_id, first_ids, cue_sweep))
+    feasible = (~blocked & (first_cuts < MAX_CUT_ANGLE) & (cuts < MAX_CUT_ANGLE)
+                & (object_distances > 0) & (first_distances > 0) & (cue_distances > 0))
+    low, high = get_angular_margins(cues, np.stack((first_positions, ball_positions)), hole_positions,
+                                    obstacles, obstacle_ids, np.stack((first_ids, ball_ids)), cue_id)
+
+    return ShotTable.from_columns(
+        "combination",
+        ball_id=ball_ids, first_id=first_ids, hole_id=shot_hole_ids,
+        cue_x=cues[0], cue_y=cues[1],
+        ball_x=ball_positions[0], ball_y=ball_positions[1],
+        hole_x=hole_positions[0], hole_y=hole_positions[1],
+        aim_x=aims[0], aim_y=aims[1],
+        cut_angle=first_cuts + cuts,
+        cue_distance=cue_distances, object_distance=first_distances + object_distances,
+        bounces=np.full(len(ball_ids), 2, dtype=np.int64),
+        margin=np.degrees(np.minimum(-low, high)),
+        blocked=blocked, feasible=feasible,
+        difficulty=_get_path_difficulties([cues, first_positions, ball_positions, hole_positions], [1, 2], 2),
+    )
+
+
+def get_targets(ball_store: BallStore) -> list[Ball]:
+    """
+    Return the balls the player has to send in a hole: the balls of the player color,
+    or the black ball once they are all gone.
+    """
+    targets = ball_store.get_all(ball_store.player_color) if ball_store.player_color else []
+    return targets or ball_store.get_all("black")
+
+
+def _get_arguments(ball_store: BallStore, hole_store: HoleStore,
+                   targets: list[Ball] = None, holes: list[Hole] = None) -> tuple:
+    """
+    Return the arguments of the shot kernels (get_direct_shots...) for the given stores.
+    """
+    white_ball = ball_store.get_white_ball()
+    targets = get_targets(ball_store) if targets is None else targets
+    holes = hole_store.get_all() if holes is None else holes
+    return (
+        white_ball.get_position(),
+        Ball.get_positions(targets), [ball.id for ball in targets],
+        Hole.get_positions(holes), [hole.id for hole in holes],
+        ball_store.get_positions(), ball_store.get_ids(), white_ball.id,
+    )
+
+
+def enumerate_direct_shots(ball_store: BallStore, hole_store: HoleStore,
+                           targets: list[Ball] = None, holes: list[Hole] = None,
+                           graph: VisibilityGraph = None) -> ShotTable:
+    """
+    Return every direct shot of the white ball on the targets (default: get_targets) into the holes
+    (default: all holes). Use get_ranked on the result to get the feasible shots from the easiest.
+    If the visibility graph of the layout is given, the ways from the balls to the holes are read from it.
+    """
+    targets = get_targets(ball_store) if targets is None else targets
+    holes = hole_store.get_all() if holes is None else holes
+    object_clear = graph.get_clear(targets, holes) if graph is not None else None
+    return get_direct_shots(*_get_arguments(ball_store, hole_store, targets, holes), object_clear=object_clear)
+
+
+def get_shots(cue: np.ndarray, objects: np.ndarray, object_ids: np.ndarray,
+              holes: np.ndarray, hole_ids: np.ndarray,
+              obstacles: np.ndarray, obstacle_ids: np.ndarray, cue_id: int = -1,
+              banks: bool = True, kicks: bool = True,
+              max_cushions: int = 1, max_travel: float = None,
+              object_clear: np.ndarray = None, pockets: np.ndarray = None) -> ShotTable:
+    """
+    Return every direct shot, and optionally every bank shot (up to max_cushions cushions)
+    and one cushion kick shot. The other parameters are the ones of get_direct_shots, and pockets the one
+    of get_bank_shots, so that the shots into some of the holes are the ones found with all the holes.
+    The paths of the white ball of every kind of shot are checked with one occlusion sweep around it.
+    """
+    arguments = (cue, objects, object_ids, holes, hole_ids, obstacles, obstacle_ids, cue_id)
+    cue_sweep = OcclusionSweep(cue, obstacles, obstacle_ids, cue_id)
+    tables = [get_direct_shots(*arguments, object_clear=object_clear, cue_sweep=cue_sweep)]
+    if banks:
+        tables.append(get_bank_shots(*arguments, max_cushions=max_cushions, max_travel=max_travel, cue_sweep=cue_sweep,
+                                     pockets=pockets))
+    if kicks:
+        tables.append(get_kick_shots(*arguments, object_clear=object_clear, cue_sweep=cue_sweep, pockets=pockets))
+    return ShotTable.concatenate(tables)
+
+
+def enumerate_shots(ball_store: BallStore, hole_store: HoleStore,
+                    targets: list[Ball] = None, holes: list[Hole] = None,
+                    banks: bool = True, kicks: bool = True,
+                    max_cushions: int = 1, max_travel: float = None,
+                    graph: VisibilityGraph = None) -> ShotTable:
+    """
+    Return every direct shot, and optionally every bank shot (up to max_cushions cushions)
+    and one cushion kick shot, of the white ball on the targets (default: get_targets)
+    into the holes (default: all holes).
+    If the visibility graph of the layout is given, the ways from the balls to the holes are read from it.
+    """
+    targets = get_targets(ball_store) if targets is None else targets
+    holes = hole_store.get_all() if holes is None else holes
+    object_clear = graph.get_clear(targets, holes) if graph is not None else None
+    return get_shots(*_get_arguments(ball_store, hole_store, targets, holes),
+                     banks=banks, kicks=kicks, max_cushions=max_cushions, max_travel=max_travel,
+                     object_clear=object_clear, pockets=Hole.get_positions(hole_store.get_all()).reshape(2, -1))
@@ -0,0 +1,593 @@
+from heapq import heappop, heappush
+from math import hypot, inf, sqrt
+import numpy as np
+from modules.elements import Ball, BallStore, Hole, HoleStore
+from modules.geometry import get_cushions
+
+# Positions are in centimeters and times in seconds, on the table of Table.TABLE_DIMENSION.
+
+EVENT_KINDS = ("stop", "cushion", "pocket", "ball")
+_EPSILON = 1e-9  # Events closer than this to the current time are the event just handled
+
+
+class Event:
+    """
+    An event of a simulation: a ball stops, hits a cushion, falls in a pocket or hits another ball.
+    """
+
+    def __init__(self, time: float, kind: str, ball: int, other: int = -1) -> None:
+        """
+        :param time: The time of the event
+        :param kind: The kind of event, in EVENT_KINDS
+        :param ball: The index of the ball
+        :param other: The index of the rail (in RAILS), of the hole or of the other ball, -1 for a stop
+        """
+        self.time = time
+        self.kind = kind
+        self.ball = ball
+        self.other = other
+
+    def __eq__(self, other: "Event") -> bool:
+        return (self.time, self.kind, self.ball, self.other) == (other.time, other.kind, other.ball, other.other)
+
+    def __repr__(self) -> str:
+        return "Event({self.time:.4f}, {self.kind}, {self.ball}, {self.other})".format(self=self)
+
+
+def _smallest_root(a: float, b: float, c: float, low: float, high: float) -> float:
+    """
+    Return the smallest root of a x^2 + b x + c in (low, high], or inf if there is none.
+    """
+    if a == 0:
+        if b == 0:
+            return inf
+        roots = (-c / b,)
+    else:
+        delta = b * b - 4 * a * c
+        if delta < 0:
+            return inf
+        q = -0.5 * (b + (sqrt(delta) if b >= 0 else -sqrt(delta)))  # Avoid the cancellation of b and sqrt(delta)
+        roots = (q / a, c / q) if q != 0 else (0.,)
+    roots = [root for root in roots if low < root <= high]
+    return min(roots) if roots else inf
+
+
+class EventSimulator:
+    """
+    An event-driven simulator of the balls on the table.
+
+    A moving ball rolls in a straight line and slows down at the constant rate FRICTION * GRAVITY until it stops.
+    Between two events every trajectory is therefore known exactly, and the time of the next stop,
+    ball-cushion hit (the center reaching a cushion line, see get_cushions), ball-pocket fall
+    (the center closer than the pocket radius to a hole) and ball-ball hit (a quartic in time)
+    is computed analytically. The simulation jumps from event to event, keeping the next events
+    of every ball in a heap: handling an event only predicts the events of the balls it changed.
+    """
+    FRICTION = 0.01  # The rolling friction coefficient
+    GRAVITY = 981.  # In cm/s^2
+    BALL_RESTITUTION = 0.95  # The part of the normal speed kept after a ball-ball hit
+    CUSHION_RESTITUTION = 0.75  # The part of the normal speed kept after a cushion hit
+    POCKET_RADIUS = Hole.radius  # A ball whose center is closer than this to a hole falls in it
+
+    def __init__(self, positions: np.ndarray, holes: np.ndarray, ids: np.ndarray = None,
+                 velocities: np.ndarray = None) -> None:
+        """
+        Create a simulation of the balls at the given positions, of the form [[x1, x2, ...], [y1, y2, ...]].
+
+        :param holes: The positions of the holes, of the same form
+        :param ids: The ids of the balls (default: their indices)
+        :param velocities: The initial velocities of the balls, of the same form (default: all at rest)
+        """
+        self.positions = np.array(positions, dtype=float).reshape(2, -1)  # At the time of the last change of the ball
+        n = self.positions.shape[1]
+        self.velocities = (np.zeros((2, n)) if velocities is None
+                           else np.array(velocities, dtype=float).reshape(2, -1))
+        self.holes = np.array(holes, dtype=float).reshape(2, -1)
+        self.ids = np.arange(n) if ids is None else np.asarray(ids, dtype=np.int64)
+        self.times = np.zeros(n)  # The time of the last change of each ball
+        self.pocketed = np.full(n, -1, dtype=np.intp)  # The hole of each pocketed ball, -1 if on the table
+        self.deceleration = self.FRICTION * self.GRAVITY
+        self.cushions = get_cushions()
+        self.time = 0.
+        self.events = []
+        self._versions = np.zeros(n, dtype=np.int64)  # Events predicted before a change of the ball are stale
+        self._heap = []
+        self._counter = 0  # Keeps the order of the heap stable for events at the same time
+        self._started = False
+
+    @classmethod
+    def from_stores(cls, ball_store: BallStore, hole_store: HoleStore) -> "EventSimulator":
+        """
+        Create a simulation of the balls of the store at rest, with the holes of the hole store.
+        """
+        return cls(ball_store.get_positions(), hole_store.get_positions(), ball_store.get_ids())
+
+    def get_index(self, id: int) -> int:
+        """
+        Return the index of the ball with the given id.
+        """
+        indices = np.flatnonzero(self.ids == id)
+        if len(indices) == 0:
+            raise KeyError(id)
+        return int(indices[0])
+
+    def set_velocity(self, index: int, vx: float, vy: float) -> None:
+        """
+        Give the ball at the given index a velocity at the current time.
+        """
+        self._rebase(index, self.time)
+        self.velocities[:, index] = vx, vy
+        self._changed(index)
+
+    def _motion(self, index: int, time: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return the position and the velocity of the ball at the given time (not before its last change).
+        """
+        position, velocity = self.positions[:, index], self.velocities[:, index]
+        speed = hypot(*velocity)
+        if speed == 0 or self.pocketed[index] >= 0:
+            return position.copy(), np.zeros(2)
+        dt = min(time - self.times[index], speed / self.deceleration if self.deceleration > 0 else inf)
+        unit = velocity / speed
+        along = speed * dt - 0.5 * self.deceleration * dt * dt
+        return position + unit * along, unit * (speed - self.deceleration * dt)
+
+    def _rebase(self, index: int, time: float) -> None:
+        """
+        Move the reference of the ball to the given time.
+        """
+        self.positions[:, index], self.velocities[:, index] = self._motion(index, time)
+        self.times[index] = time
+
+    def get_positions(self, time: float = None) -> np.ndarray:
+        """
+        Return the positions of the balls at the given time (default: the current time).
+        Pocketed balls stay where they fell.
+        """
+        time = self.time if time is None else time
+        return np.stack([self._motion(index, time)[0] for index in range(len(self))], axis=1).reshape(2, -1)
+
+    def get_velocities(self) -> np.ndarray:
+        """
+        Return the velocities of the balls at the current time.
+        """
+        return np.stack([self._motion(index, self.time)[1] for index in range(len(self))], axis=1).reshape(2, -1)
+
+    def _push(self, time: float, kind: str, index: int, other: int = -1) -> None:
+        heappush(self._heap, (time, self._counter, kind, index, other,
+                              self._versions[index], self._versions[other] if kind == "ball" else 0))
+        self._counter += 1
+
+    def _changed(self, *indices: int) -> None:
+        """
+        Forget the events predicted for the balls and predict their next events.
+        """
+        self._versions[list(indices)] += 1
+        if not self._started:
+            return
+        for count, index in enumerate(indices):
+            if self.pocketed[index] < 0:
+                self._predict(index, indices[:count])
+
+    def _predict(self, index: int, skip: tuple = ()) -> None:
+        """
+        Predict the next stop, cushion, pocket and ball events of the ball.
+        """
+        position, velocity = self.positions[:, index], self.velocities[:, index]
+        speed = hypot(*velocity)
+        if speed > 0:
+            start = self.times[index]
+            a = self.deceleration
+            duration = speed / a if a > 0 else inf
+            distance = speed * speed / (2 * a) if a > 0 else inf
+            unit = velocity / speed
+            if duration < inf:
+                self._push(start + duration, "stop", index)
+
+            # Pockets, solved in the distance rolled along the line
+            best, hole = inf, -1
+            for h in range(self.holes.shape[1]):
+                offset = position - self.holes[:, h]
+                c = offset @ offset - self.POCKET_RADIUS ** 2
+                along = 0. if c < 0 else _smallest_root(1., 2 * unit @ offset, c, -_EPSILON, distance)
+                if along < inf:
+                    dt = (along / speed if a == 0 else
+                          (speed - sqrt(max(speed * speed - 2 * a * along, 0.))) / a)
+                    if dt < best:
+                        best, hole = dt, h
+            if hole >= 0:
+                self._push(start + best, "pocket", index, hole)
+
+            # Cushions, the position along an axis being x0 + v t - a u t^2 / 2
+            best, rail = inf, -1
+            for line, cushion in enumerate(self.cushions):
+                axis = line // 2
+                toward = velocity[axis] < 0 if line % 2 == 0 else velocity[axis] > 0
+                if toward:
+                    dt = _smallest_root(-0.5 * a * unit[axis], velocity[axis], position[axis] - cushion,
+                                        _EPSILON, duration)
+                    if dt < best:
+                        best, rail = dt, line
+            if rail >= 0:
+                # There is no cushion in the mouth of a pocket: a ball going to fall there goes through
+                point = position + unit * (speed * best - 0.5 * a * best * best)
+                mouth = np.hypot(*(self.holes - point[:, None])) < self.POCKET_RADIUS + Ball.radius
+                if hole < 0 or not mouth.any():
+                    self._push(start + best, "cushion", index, rail)
+
+        for other in range(len(self)):
+            if other != index and other not in skip and self.pocketed[other] < 0:
+                self._predict_pair(index, other)
+
+    def _predict_pair(self, first: int, second: int) -> None:
+        """
+        Predict the next hit of the two balls, before one of them stops.
+        When both roll, the relative position is quadratic in time, so its squared norm is a quartic.
+        """
+        start = max(self.times[first], self.times[second])
+        p1, v1 = self._motion(first, start)
+        p2, v2 = self._motion(second, start)
+        s1, s2 = hypot(*v1), hypot(*v2)
+        if s1 == 0 and s2 == 0:
+            return
+        a = self.deceleration
+        travel = (s1 * s1 + s2 * s2) / (2 * a) if a > 0 else inf
+        C = p2 - p1
+        contact = 2 * Ball.radius
+        if hypot(*C) - contact > travel:  # Too far to meet before stopping
+            return
+        if C @ C < contact * contact and C @ (v2 - v1) < 0:  # Already touching and getting closer
+            self._push(start, "ball", first, second)
+            return
+        if s1 == 0 or s2 == 0:
+            # One ball is at rest, the other rolls on a straight line: solved in the distance rolled
+            position, velocity, speed = (p2, v2, s2) if s1 == 0 else (p1, v1, s1)
+            offset = position - (p1 if s1 == 0 else p2)
+            unit = velocity / speed
+            along = _smallest_root(1., 2 * unit @ offset, offset @ offset - contact * contact, _EPSILON,
+                                   speed * speed / (2 * a) if a > 0 else inf)
+            if along < inf and unit @ (offset + unit * along) < 0:
+                dt = along / speed if a == 0 else (speed - sqrt(max(speed * speed - 2 * a * along, 0.))) / a
+                self._push(start + dt, "ball", first, second)
+            return
+
+        # Both balls roll, until the first one stops
+        horizon = min(s / a if a > 0 else inf for s in (s1, s2))
+        if horizon < inf:
+            # The balls stay in the boxes of the segments they roll before the horizon
+            ends = [p + v * horizon - 0.5 * a * horizon * horizon * v / s for p, v, s in ((p1, v1, s1), (p2, v2, s2))]
+            low1, high1 = np.minimum(p1, ends[0]), np.maximum(p1, ends[0])
+            low2, high2 = np.minimum(p2, ends[1]), np.maximum(p2, ends[1])
+            if ((low1 - contact > high2) | (low2 - contact > high1)).any():
+                return
+        A = 0.5 * a * ((v1 / s1 if s1 > 0 else 0.) - (v2 / s2 if s2 > 0 else 0.))
+        B = v2 - v1
+        coefficients = [A @ A, 2 * A @ B, B @ B + 2 * A @ C, 2 * B @ C, C @ C - contact * contact]
+        best = inf
+        for root in np.roots(np.trim_zeros(coefficients, "f") or [1.]):
+            if abs(root.imag) > 1e-7 * max(1., abs(root.real)):
+                continue
+            dt = root.real
+            for _ in range(2):  # Newton steps to polish the root
+                value = np.polyval(coefficients, dt)
+                slope = np.polyval(np.polyder(coefficients), dt)
+                if slope == 0:
+                    break
+                dt -= value / slope
+            if not _EPSILON < dt <= horizon or dt >= best:
+                continue
+            relative = C + B * dt + A * dt * dt
+            if relative @ (B + 2 * A * dt) < 0:  # The balls are getting closer
+                best = dt
+        if best < inf:
+            self._push(start + best, "ball", first, second)
+
+    def _start(self) -> None:
+        if self._started:
+            return
+        self._started = True
+        for index in range(len(self)):
+            if self.pocketed[index] < 0 and hypot(*self.velocities[:, index]) > 0:
+                self._predict(index)
+
+    def step(self, max_time: float = inf) -> Event:
+        """
+        Jump to the next event and handle it. Return it, or None if every ball is at rest
+        or if the next event is after the given time.
+        """
+        self._start()
+        while self._heap:
+            time, _, kind, index, other, version, other_version = self._heap[0]
+            if version != self._versions[index] or (kind == "ball" and other_version != self._versions[other]):
+                heappop(self._heap)
+                continue  # One of the balls changed since the event was predicted
+            if time > max_time:
+                return None
+            heappop(self._heap)
+            self.time = time
+            self._rebase(index, time)
+            if kind == "stop":
+                self.velocities[:, index] = 0.
+                self._changed(index)
+            elif kind == "cushion":
+                axis = other // 2
+                self.velocities[axis, index] *= -self.CUSHION_RESTITUTION
+                self.positions[axis, index] = self.cushions[other]
+                self._changed(index)
+            elif kind == "pocket":
+                self.pocketed[index] = other
+                self.velocities[:, index] = 0.
+                self._changed(index)
+            else:
+                self._rebase(other, time)
+                normal = self.positions[:, other] - self.positions[:, index]
+                normal /= hypot(*normal)
+                exchange = 0.5 * (1 + self.BALL_RESTITUTION) * ((self.velocities[:, index]
+                                                                - self.velocities[:, other]) @ normal)
+                self.velocities[:, index] -= exchange * normal
+                self.velocities[:, other] += exchange * normal
+                self._changed(index, other)
+            event = Event(time, kind, index, other)
+            self.events.append(event)
+            return event
+        return None
+
+    def run(self, max_time: float = inf, max_events: int = 10000) -> list[Event]:
+        """
+        Handle the events until every ball is at rest, the given time or the given number of events.
+        Return the events handled.
+        """
+        events = []
+        while len(events) < max_events:
+            event = self.step(max_time)
+            if event is None:
+                if max_time < inf:
+                    self.time = max(self.time, max_time)
+                break
+            events.append(event)
+        return events
+
+    def is_moving(self) -> bool:
+        """
+        Return True if a ball on the table is still moving.
+        """
+        return bool(((np.hypot(*self.get_velocities()) > 0) & (self.pocketed < 0)).any())
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __repr__(self) -> str:
+        return "EventSimulator({n} balls, t={self.time:.3f}s, {e} events)".format(
+            self=self, n=len(self), e=len(self.events))
+
+
+def simulate_shot(ball_store: BallStore, hole_store: HoleStore, aim_x: float, aim_y: float,
+                  speed: float, max_events: int = 10000) -> EventSimulator:
+    """
+    Simulate the white ball sent toward the given point at the given speed (in cm/s), until every ball stops.
+    Return the simulation, whose events tell which balls were hit and pocketed.
+    """
+    simulator = EventSimulator.from_stores(ball_store, hole_store)
+    white = simulator.get_index(ball_store.get_white_ball().id)
+    direction = np.array([aim_x, aim_y], dtype=float) - simulator.positions[:, white]
+    direction /= np.linalg.norm(direction)
+    simulator.set_velocity(white, *(speed * direction))
+    simulator.run(max_events=max_events)
+    return simulator
+
+
+class BatchSimulator:
+    """
+    A time-stepped simulator of B tables at once, with the physics of EventSimulator.
+
+    The state arrays have a leading batch dimension: positions and velocities are of shape (B, 2, N),
+    following the BallStore convention for each table. Tables with fewer balls are padded with absent balls.
+    Each step moves every rolling ball of every table with one vectorized NumPy pass, then handles
+    the cushions (open in a pocket mouth for a ball rolling into the pocket, as in EventSimulator), the pockets
+    and the hits between balls closer than two radii. A ball leaving the table through a pocket mouth is counted
+    in the nearest pocket.
+    """
+
+    def __init__(self, positions: np.ndarray, holes: np.ndarray, present: np.ndarray = None,
+                 ids: np.ndarray = None, cue: np.ndarray = None) -> None:
+        """
+        Create a simulation of B tables of N balls at rest.
+
+        :param positions: The positions of the balls, shape (B, 2, N)
+        :param holes: The positions of the holes, shared by all the tables, shape (2, H)
+        :param present: Whether each ball is on its table, shape (B, N) (default: all)
+        :param ids: The ids of the balls, shape (B, N) (default: their indices)
+        :param cue: The index of the white ball of each table, shape (B,) (default: none)
+        """
+        self.positions = np.array(positions, dtype=float)
+        batch, _, n = self.positions.shape
+        self.velocities = np.zeros_like(self.positions)
+        self.holes = np.array(holes, dtype=float).reshape(2, -1)
+        self.present = np.ones((batch, n), dtype=bool) if present is None else np.array(present, dtype=bool)
+        self.ids = np.broadcast_to(np.arange(n), (batch, n)).copy() if ids is None else np.array(ids, dtype=np.int64)
+        self.cue = np.full(batch, -1, dtype=np.intp) if cue is None else np.array(cue, dtype=np.intp)
+        self.pocketed = np.full((batch, n), -1, dtype=np.intp)  # The hole of each pocketed ball, -1 if on the table
+        self.first_contact = np.full(batch, -1, dtype=np.intp)  # The first ball hit by the white ball of each table
+        self._next_check = np.zeros((batch, n))  # The time before which a rolling ball cannot touch another one
+        self.deceleration = EventSimulator.FRICTION * EventSimulator.GRAVITY
+        self.cushions = get_cushions()
+        self.time = 0.
+
+    @classmethod
+    def from_layouts(cls, layouts: list) -> "BatchSimulator":
+        """
+        Create a simulation of the given Layouts, which must share the same holes.
+        """
+        n = max(len(layout) for layout in layouts)
+        positions = np.zeros((len(layouts), 2, n))
+        present = np.zeros((len(layouts), n), dtype=bool)
+        ids = np.full((len(layouts), n), -1, dtype=np.int64)
+        for table, layout in enumerate(layouts):
+            positions[table, :, :len(layout)] = layout.positions
+            present[table, :len(layout)] = True
+            ids[table, :len(layout)] = layout.ids
+        cue = [layout.get_white_index() if len(layout.get_indices("white")) else -1 for layout in layouts]
+        return cls(positions, layouts[0].hole_positions, present, ids, cue)
+
+    @classmethod
+    def from_stores(cls, ball_store: BallStore, hole_store: HoleStore, batch: int = 1) -> "BatchSimulator":
+        """
+        Create a simulation of the given number of copies of the balls of the store.
+        """
+        white = ball_store.get_white_ball()
+        cue = [ball.id for ball in ball_store.get_all()].index(white.id)
+        positions = np.repeat(np.asarray(ball_store.get_positions(), dtype=float).reshape(1, 2, -1), batch, axis=0)
+        ids = np.repeat(np.asarray(ball_store.get_ids(), dtype=np.int64).reshape(1, -1), batch, axis=0)
+        return cls(positions, hole_store.get_positions(), ids=ids, cue=np.full(batch, cue))
+
+    def strike(self, velocities: np.ndarray) -> None:
+        """
+        Give the white ball of each table the given velocity, of shape (2, B) (or (2,) for all the tables).
+        """
+        velocities = np.broadcast_to(np.asarray(velocities, dtype=float).reshape(2, -1), (2, len(self)))
+        tables = np.flatnonzero(self.cue >= 0)
+        self.velocities[tables, :, self.cue[tables]] = velocities[:, tables].T
+
+    def get_active(self) -> np.ndarray:
+        """
+        Return whether each ball is on its table, shape (B, N).
+        """
+        return self.present & (self.pocketed < 0)
+
+    def get_moving(self) -> np.ndarray:
+        """
+        Return whether each ball is rolling, shape (B, N).
+        """
+        return self.get_active() & ((self.velocities[:, 0] != 0) | (self.velocities[:, 1] != 0))
+
+    def step(self, dt: float) -> None:
+        """
+        Advance every table by the given time.
+        Only the rolling balls are gathered and computed, squared distances avoiding most square roots.
+        """
+        self.time += dt
+        xs, ys = self.positions[:, 0], self.positions[:, 1]  # Views of shape (B, N)
+        vxs, vys = self.velocities[:, 0], self.velocities[:, 1]
+        tables, balls = np.nonzero(self.get_active() & ((vxs != 0) | (vys != 0)))
+        if not len(tables):
+            return
+        x, y, vx, vy = xs[tables, balls], ys[tables, balls], vxs[tables, balls], vys[tables, balls]
+
+        # Roll: the speed decreases by the deceleration, and the ball stops within the step if it reaches 0
+        speed = np.sqrt(vx * vx + vy * vy)
+        duration = np.minimum(dt, speed / self.deceleration) if self.deceleration > 0 else dt
+        ratio = (speed * duration - 0.5 * self.deceleration * duration * duration) / speed
+        x += vx * ratio
+        y += vy * ratio
+        ratio = np.maximum(speed - self.deceleration * dt, 0.) / speed
+        vx *= ratio
+        vy *= ratio
+
+        # Cushions, open where the ball crosses them in a pocket mouth on its way into the pocket
+        for line, cushion in enumerate(self.cushions):
+            position, velocity = (x, vx) if line < 2 else (y, vy)
+            beyond = np.flatnonzero((position < cushion) if line % 2 == 0 else (position > cushion))
+            back = (position[beyond] - cushion) / velocity[beyond]
+            through = self._is_falling(x[beyond] - vx[beyond] * back, y[beyond] - vy[beyond] * back,
+                                       x[beyond], y[beyond], vx[beyond], vy[beyond])
+            beyond = beyond[~through]
+            position[beyond] = 2 * cushion - position[beyond]
+            velocity[beyond] *= -EventSimulator.CUSHION_RESTITUTION
+        dx, dy = x[:, None] - self.holes[0], y[:, None] - self.holes[1]  # (M, H)
+        squares = dx * dx + dy * dy
+        nearest = squares.argmin(axis=1)
+        closest = squares[np.arange(len(tables)), nearest]
+        width, height = self.cushions[1] + Ball.radius, self.cushions[3] + Ball.radius
+        fallen = (closest < EventSimulator.POCKET_RADIUS ** 2) | (x < 0) | (x > width) | (y < 0) | (y > height)
+        vx[fallen] = 0.
+        vy[fallen] = 0.
+        xs[tables, balls], ys[tables, balls], vxs[tables, balls], vys[tables, balls] = x, y, vx, vy
+        self.pocketed[tables[fallen], balls[fallen]] = nearest[fallen]
+        check = ~fallen & (self._next_check[tables, balls] <= self.time)
+        self._collide(tables[check], balls[check])
+
+    def _is_falling(self, cross_x: np.ndarray, cross_y: np.ndarray, x: np.ndarray, y: np.ndarray,
+                    vx: np.ndarray, vy: np.ndarray) -> np.ndarray:
+        """
+        Return whether each ball crossing a cushion line at the given points goes through it, as in
+        EventSimulator._predict: the crossing point is in a pocket mouth and the ball, rolling on from
+        its position with its velocity, reaches a pocket before it stops.
+        """
+        mouth = ((cross_x[:, None] - self.holes[0]) ** 2 + (cross_y[:, None] - self.holes[1]) ** 2
+                 < (EventSimulator.POCKET_RADIUS + Ball.radius) ** 2).any(axis=1)
+        speed = np.sqrt(vx * vx + vy * vy)
+        reach = speed * speed / (2 * self.deceleration) if self.deceleration > 0 else np.inf
+        ux, uy = vx / np.maximum(speed, _EPSILON), vy / np.maximum(speed, _EPSILON)
+        dx, dy = x[:, None] - self.holes[0], y[:, None] - self.holes[1]  # (M, H)
+        along = ux[:, None] * dx + uy[:, None] * dy
+        inside = dx * dx + dy * dy - EventSimulator.POCKET_RADIUS ** 2
+        discriminant = along * along - inside
+        entry = -along - np.sqrt(np.maximum(discriminant, 0.))  # The distance rolled to the pocket circle
+        pocket = (inside < 0) | ((discriminant >= 0) & (entry >= 0) & (entry <= np.reshape(reach, (-1, 1))))
+        return mouth & pocket.any(axis=1)
+
+    def _collide(self, tables: np.ndarray, balls: np.ndarray) -> None:
+        """
+        Handle the hits of the given rolling balls with the other balls of their tables.
+
+        The gap between a ball and its nearest neighbor cannot close faster than twice the square root
+        of the sum of the squared speeds of the table, which never increases. The ball is therefore
+        not checked again before that time.
+        """
+        if not len(tables):
+            return
+        xs, ys = self.positions[:, 0], self.positions[:, 1]
+        vxs, vys = self.velocities[:, 0], self.velocities[:, 1]
+        dx = xs[tables] - xs[tables, balls][:, None]  # (M, N), from the rolling ball to the others
+        dy = ys[tables] - ys[tables, balls][:, None]
+        squares = dx * dx + dy * dy
+        indices = np.arange(self.pocketed.shape[1])[None, :]
+        squares[(indices == balls[:, None]) | ~self.get_active()[tables]] = np.inf
+        gaps = np.sqrt(squares.min(axis=1)) - 2 * Ball.radius
+        speeds = np.sqrt((vxs[tables] ** 2 + vys[tables] ** 2).sum(axis=1))
+        delays = np.maximum(gaps, 0.) / (2 * np.maximum(speeds, _EPSILON))
+        self._next_check[tables, balls] = self.time + np.where(gaps > 0., delays, 0.)
+
+        checked = np.zeros(self.pocketed.shape, dtype=bool)
+        checked[tables, balls] = True
+        touching = squares < (2 * Ball.radius) ** 2
+        touching &= ~checked[tables] | (balls[:, None] < indices)  # A pair of checked balls is handled once
+        pairs, hit = np.nonzero(touching)
+        table, ball = tables[pairs], balls[pairs]
+        if not len(pairs):
+            return
+        nx, ny = dx[pairs, hit], dy[pairs, hit]
+        distance = np.sqrt(nx * nx + ny * ny)
+        nx, ny = nx / distance, ny / distance
+        approach = (vxs[table, ball] - vxs[table, hit]) * nx + (vys[table, ball] - vys[table, hit]) * ny
+        keep = approach > 0  # The balls are getting closer
+        table, ball, hit = table[keep], ball[keep], hit[keep]
+        impulse = 0.5 * (1 + EventSimulator.BALL_RESTITUTION) * approach[keep]
+        for velocities, normal in ((vxs, nx[keep]), (vys, ny[keep])):
+            np.add.at(velocities, (table, ball), -impulse * normal)
+            np.add.at(velocities, (table, hit), impulse * normal)
+
+        # The first ball hit by the white ball of each table
+        for first, second in ((ball, hit), (hit, ball)):
+            cue = (first == self.cue[table]) & (self.first_contact[table] < 0)
+            self.first_contact[table[cue]] = second[cue]
+
+    def run(self, dt: float = 1e-3, max_time: float = 20.) -> None:
+        """
+        Advance the tables until every ball is at rest or the given time.
+        """
+        while self.time < max_time and self.get_moving().any():
+            self.step(min(dt, max_time - self.time))
+
+    def get_pocketed_ids(self, table: int) -> list[int]:
+        """
+        Return the ids of the balls pocketed on the given table.
+        """
+        return self.ids[table, self.pocketed[table] >= 0].tolist()
+
+    def __len__(self) -> int:
+        return self.positions.shape[0]
+
+    def __repr__(self) -> str:
+        return "BatchSimulator({b} tables of {n} balls, t={self.time:.3f}s)".format(
+            self=self, b=len(self), n=self.positions.shape[2])
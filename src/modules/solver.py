@@ -0,0 +1,180 @@
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+import numpy as np
+from modules.geometry import OcclusionSweep
+from modules.layout import Layout
+from modules.shots import (
+    ShotTable, get_bank_shots, get_combination_shots, get_direct_shots, get_kick_shots, get_shots,
+)
+
+
+def solve(layout: Layout, holes: np.ndarray = None, banks: bool = True, kicks: bool = True,
+          max_cushions: int = 1, max_travel: float = None) -> ShotTable:
+    """
+    Return every candidate shot of the layout into the given holes, as enumerate_shots.
+    The cushion points are kept out of every hole of the layout, not only the given ones.
+
+    :param layout: The layout
+    :param holes: The indices of the holes in the layout (default: all)
+    """
+    return get_shots(*layout.get_arguments(holes), banks=banks, kicks=kicks,
+                     max_cushions=max_cushions, max_travel=max_travel, pockets=layout.hole_positions)
+
+
+class ParallelSolver:
+    """
+    Solve layouts on a pool of processes.
+
+    The work is split per pocket for one layout (solve) and per layout for many layouts (solve_all).
+    Only Layout arrays and ShotTable columns go through the pool, never Ball objects.
+    Results are merged in the order of the pockets (or of the layouts) and ranked with a stable sort,
+    so they do not depend on the number of workers or on the order in which the tasks end.
+
+    Use it as a context manager, or call close, to stop the processes.
+    """
+
+    def __init__(self, max_workers: int = None, **options) -> None:
+        """
+        Create a solver using at most the given number of processes (default: one per core).
+        With max_workers = 0, everything is solved in this process.
+
+        :param options: The options of solve (banks, kicks, max_cushions, max_travel)
+        """
+        self.max_workers = max_workers
+        self.options = options
+        self.executor = None
+
+    def _get_executor(self) -> Executor:
+        """
+        Return the pool of processes, started on first use.
+        """
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.max_workers)
+        return self.executor
+
+    def solve(self, layout: Layout) -> ShotTable:
+        """
+        Return the feasible shots of the layout from the easiest, solving each pocket in its own task.
+        """
+        if self.max_workers == 0:
+            tables = [solve(layout, [hole], **self.options) for hole in range(layout.n_holes)]
+        else:
+            futures = [self._get_executor().submit(solve, layout, [hole], **self.options)
+                       for hole in range(layout.n_holes)]
+            tables = [future.result() for future in futures]
+        return ShotTable.concatenate(tables).get_ranked()
+
+    def solve_all(self, layouts: list[Layout], chunksize: int = 1) -> list[ShotTable]:
+        """
+        Return the feasible shots of each layout from the easiest, solving each layout in its own task.
+
+        :param chunksize: The number of layouts sent to a process at once
+        """
+        function = partial(solve, **self.options)
+        if self.max_workers == 0:
+            tables = map(function, layouts)
+        else:
+            tables = self._get_executor().map(function, layouts, chunksize=chunksize)
+        return [table.get_ranked() for table in tables]
+
+    def close(self) -> None:
+        """
+        Stop the processes of the pool.
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self) -> "ParallelSolver":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return "ParallelSolver({self.max_workers} workers, {self.options})".format(self=self)
+
+
+class AnytimeSolver:
+    """
+    Solve a layout within a deadline, from the cheapest kinds of shots to the most expensive ones.
+
+    The search runs in stages: direct shots, combination shots, kick shots, then bank shots with
+    one more cushion at each stage (iterative deepening up to max_cushions). After each stage the best
+    shots so far are known. Each stage has a size (the number of shots it tries for one ball and one hole);
+    a stage is not started if the time already spent plus its size times the largest time per unit of the
+    stages done would pass the deadline. The deadline is therefore best effort: the direct stage always runs,
+    and a later stage can still pass the deadline when it is slower per unit than the stages before it.
+    """
+
+    def __init__(self, deadline: float = 0.03, max_cushions: int = 3, combinations: bool = True,
+                 kicks: bool = True, max_travel: float = None) -> None:
+        """
+        :param deadline: The time budget of a solve, in seconds
+        :param max_cushions: The maximum number of cushions of bank shots
+        :param combinations: Whether to search combination shots
+        :param kicks: Whether to search kick shots
+        :param max_travel: The maximum travel of bank shots (see get_bank_shots)
+        """
+        self.deadline = deadline
+        self.max_cushions = max_cushions
+        self.combinations = combinations
+        self.kicks = kicks
+        self.max_travel = max_travel
+
+    def get_stages(self, layout: Layout) -> list[tuple[str, partial, int]]:
+        """
+        Return the names, the functions and the sizes of the stages of the search of the layout, in order.
+        """
+        arguments = layout.get_arguments()
+        cue_sweep = OcclusionSweep(arguments[0], arguments[5], arguments[6], arguments[7])
+        stages = [("direct", partial(get_direct_shots, *arguments, cue_sweep=cue_sweep), 1)]
+        if self.combinations:
+            stages.append(("combination", partial(get_combination_shots, *arguments, cue_sweep=cue_sweep),
+                           max(len(arguments[2]) - 1, 1)))
+        if self.kicks:
+            stages.append(("kick", partial(get_kick_shots, *arguments, cue_sweep=cue_sweep), 4))
+        for cushions in range(1, self.max_cushions + 1):
+            stages.append(("bank {}".format(cushions), partial(
+                get_bank_shots, *arguments, max_cushions=cushions, min_cushions=cushions,
+                max_travel=self.max_travel, cue_sweep=cue_sweep), 4 * cushions))
+        return stages
+
+    def solve(self, layout: Layout, deadline: float = None) -> tuple[ShotTable, dict]:
+        """
+        Return the feasible shots found before the deadline from the easiest, and a report of the search:
+        - stages: The names of the stages done
+        - skipped: The names of the stages not done
+        - depth: The number of stages done
+        - cushions: The largest number of cushions of the bank shots searched
+        - elapsed: The time spent, in seconds
+        - complete: Whether every stage was done
+
+        :param deadline: The time budget, in seconds (default: the one of the solver)
+        """
+        start = time.perf_counter()
+        deadline = self.deadline if deadline is None else deadline
+        stages = self.get_stages(layout)
+        tables, done, unit = [], [], 0.
+        for name, function, size in stages:
+            elapsed = time.perf_counter() - start
+            if done and elapsed + unit * size > deadline:
+                break
+            tables.append(function())
+            done.append(name)
+            unit = max(unit, (time.perf_counter() - start - elapsed) / size)
+
+        banks = [name for name in done if name.startswith("bank")]
+        report = {
+            "stages": done,
+            "skipped": [name for name, _, _ in stages[len(done):]],
+            "depth": len(done),
+            "cushions": int(banks[-1].split()[1]) if banks else 0,
+            "elapsed": time.perf_counter() - start,
+            "complete": len(done) == len(stages),
+        }
+        return ShotTable.concatenate(tables).get_ranked(), report
+
+    def __repr__(self) -> str:
+        return "AnytimeSolver({self.deadline}s, {self.max_cushions} cushions)".format(self=self)
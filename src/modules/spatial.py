@@ -0,0 +1,247 @@
+from heapq import heappush, heappushpop
+from math import floor, hypot
+import numpy as np
+
+
+def get_id_mask(ids) -> int:
+    """
+    Return the bitmask with the bits of the given ids set.
+    """
+    mask = 0
+    for id in ids:
+        mask |= 1 << int(id)
+    return mask
+
+
+def is_in_id_mask(ids: np.ndarray, mask: int) -> np.ndarray:
+    """
+    Return a boolean array telling which of the given ids have their bit set in the mask.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    result = np.zeros(ids.shape, dtype=bool)
+    if not mask:
+        return result
+    raw = np.frombuffer(mask.to_bytes((mask.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+    bits = np.unpackbits(raw, bitorder="little").astype(bool)
+    inside = (ids >= 0) & (ids < len(bits))
+    result[inside] = bits[ids[inside]]
+    return result
+
+
+def match_positions(old: np.ndarray, new: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Match the old positions to the new ones, closest pairs first, each position being matched at most once.
+    Positions are given as arrays of the form [[x1, x2, ...], [y1, y2, ...]].
+    Return the indices of the matched old positions and of their new positions.
+    """
+    old = np.asarray(old, dtype=float).reshape(2, -1)
+    new = np.asarray(new, dtype=float).reshape(2, -1)
+    n, m = old.shape[1], new.shape[1]
+    distances = np.hypot(old[0][:, None] - new[0][None, :], old[1][:, None] - new[1][None, :])
+    used_old, used_new = np.zeros(n, dtype=bool), np.zeros(m, dtype=bool)
+    matched_old, matched_new = [], []
+    for flat in np.argsort(distances, axis=None, kind="stable").tolist():
+        if len(matched_old) == min(n, m):
+            break
+        i, j = divmod(flat, m)
+        if not used_old[i] and not used_new[j]:
+            used_old[i] = used_new[j] = True
+            matched_old.append(i)
+            matched_new.append(j)
+    return np.array(matched_old, dtype=np.intp), np.array(matched_new, dtype=np.intp)
+
+
+class SpatialGrid:
+    """
+    A uniform grid over the table, mapping each cell to the items whose position falls in it.
+    Items must have an id and x and y attributes (balls, holes).
+    Positions outside the table are clamped to the border cells.
+    """
+
+    def __init__(self, cell_size: float, dimension: tuple[float, float]) -> None:
+        """
+        Create an empty grid of square cells of the given size covering a table of the given dimension.
+        """
+        if cell_size <= 0:
+            raise ValueError("The cell size must be positive.")
+        self.cell_size = cell_size
+        self.shape = (max(1, int(dimension[0] // cell_size) + 1), max(1, int(dimension[1] // cell_size) + 1))
+        self.cells = {}  # The items of each non-empty cell
+        self.where = {}  # The cell of each item id
+
+    def get_cell(self, x: float, y: float) -> tuple[int, int]:
+        """
+        Return the cell containing the given position.
+        """
+        i = min(max(floor(x / self.cell_size), 0), self.shape[0] - 1)
+        j = min(max(floor(y / self.cell_size), 0), self.shape[1] - 1)
+        return i, j
+
+    def insert(self, item, x: float = None, y: float = None) -> None:
+        """
+        Add the item at the given position (default: the position of the item).
+        """
+        cell = self.get_cell(item.x if x is None else x, item.y if y is None else y)
+        self.cells.setdefault(cell, []).append(item)
+        self.where[item.id] = cell
+
+    def remove(self, item) -> None:
+        """
+        Remove the item from the grid.
+        """
+        cell = self.where.pop(item.id)
+        items = self.cells[cell]
+        items.remove(item)
+        if not items:
+            del self.cells[cell]
+
+    def move(self, item, x: float = None, y: float = None) -> None:
+        """
+        Move the item to the given position (default: the current position of the item).
+        """
+        cell = self.get_cell(item.x if x is None else x, item.y if y is None else y)
+        if self.where.get(item.id) != cell:
+            self.remove(item)
+            self.cells.setdefault(cell, []).append(item)
+            self.where[item.id] = cell
+
+    def query(self, x: float, y: float, radius: float) -> list:
+        """
+        Return the items of the cells overlapping the square of the given half size around the position.
+        The result is a superset of the items closer than the radius.
+        """
+        i_min, j_min = self.get_cell(x - radius, y - radius)
+        i_max, j_max = self.get_cell(x + radius, y + radius)
+        items = []
+        for i in range(i_min, i_max + 1):
+            for j in range(j_min, j_max + 1):
+                items.extend(self.cells.get((i, j), ()))
+        return items
+
+    def query_radius(self, x: float, y: float, radius: float) -> list:
+        """
+        Return the items closer than the radius to the given position.
+        """
+        return [item for item in self.query(x, y, radius) if hypot(item.x - x, item.y - y) < radius]
+
+    def nearest(self, x: float, y: float, accept=None, order=None):
+        """
+        Return the item nearest to the given position, searching the cells ring by ring.
+
+        :param accept: A function telling if an item can be returned (default: any item)
+        :param order: A function giving the rank of an item, the lowest rank wins on a tie
+        :return: The nearest accepted item, or None if there is none
+        """
+        ci, cj = self.get_cell(x, y)
+        best, best_distance = None, float("inf")
+        for ring in range(max(self.shape)):
+            # Every item of this ring is at least (ring - 1) cells away from the position
+            if best is not None and best_distance <= (ring - 1) * self.cell_size:
+                break
+            for i in range(ci - ring, ci + ring + 1):
+                for j in range(cj - ring, cj + ring + 1):
+                    if max(abs(i - ci), abs(j - cj)) != ring:
+                        continue
+                    for item in self.cells.get((i, j), ()):
+                        if accept is not None and not accept(item):
+                            continue
+                        distance = hypot(item.x - x, item.y - y)
+                        if distance < best_distance or (
+                            distance == best_distance and order is not None and order(item) < order(best)
+                        ):
+                            best, best_distance = item, distance
+        return best
+
+    def clear(self) -> None:
+        """
+        Remove every item from the grid.
+        """
+        self.cells = {}
+        self.where = {}
+
+    def __contains__(self, item) -> bool:
+        return item.id in self.where
+
+    def __len__(self) -> int:
+        return len(self.where)
+
+    def __repr__(self) -> str:
+        return "SpatialGrid({self.cell_size}, {self.shape}, {n} items)".format(self=self, n=len(self))
+
+
+class KDTree:
+    """
+    A static 2D tree over a set of positions, answering k nearest neighbor queries.
+    Leaves hold small buckets of points whose distances are computed with NumPy.
+    The tree is not updated: build a new one when the positions change.
+    """
+    LEAF_SIZE = 8  # The maximum number of points in a leaf
+
+    def __init__(self, positions: np.ndarray) -> None:
+        """
+        Build the tree over positions of the form [[x1, x2, ...], [y1, y2, ...]].
+        """
+        self.positions = np.array(positions, dtype=float).reshape(2, -1)
+        self.order = np.arange(self.positions.shape[1])  # Each node covers a contiguous range of this order
+        self.nodes = []  # (start, end, axis, split, left, right), left is -1 for a leaf
+        if len(self.order):
+            self._build(0, len(self.order))
+
+    def _build(self, start: int, end: int) -> int:
+        """
+        Build the node covering order[start:end] and return its index.
+        """
+        index = len(self.nodes)
+        self.nodes.append(None)
+        if end - start <= KDTree.LEAF_SIZE:
+            self.nodes[index] = (start, end, 0, 0., -1, -1)
+            return index
+
+        points = self.positions[:, self.order[start:end]]
+        axis = int(np.argmax(points.max(axis=1) - points.min(axis=1)))  # Split the widest axis
+        self.order[start:end] = self.order[start:end][np.argsort(points[axis], kind="stable")]
+        middle = (start + end) // 2
+        split = self.positions[axis, self.order[middle]]
+        left = self._build(start, middle)
+        right = self._build(middle, end)
+        self.nodes[index] = (start, end, axis, split, left, right)
+        return index
+
+    def query(self, x: float, y: float, k: int = 1, allowed: np.ndarray = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return the indices and distances of the k points nearest to (x, y), nearest first.
+        Ties are broken by index.
+
+        :param allowed: A boolean array telling which points can be returned (default: all)
+        """
+        heap = []  # Max-heap of the best candidates as (-distance, -index)
+        if k > 0 and self.nodes:
+            self._query(0, x, y, k, allowed, heap)
+        best = sorted((-d, -i) for d, i in heap)
+        return (np.array([i for _, i in best], dtype=np.intp),
+                np.array([d for d, _ in best], dtype=float))
+
+    def _query(self, node: int, x: float, y: float, k: int, allowed: np.ndarray, heap: list) -> None:
+        start, end, axis, split, left, right = self.nodes[node]
+        if left == -1:
+            indices = self.order[start:end]
+            if allowed is not None:
+                indices = indices[allowed[indices]]
+            distances = np.hypot(self.positions[0, indices] - x, self.positions[1, indices] - y)
+            for distance, index in zip(distances.tolist(), indices.tolist()):
+                candidate = (-distance, -index)
+                if len(heap) < k:
+                    heappush(heap, candidate)
+                elif candidate > heap[0]:
+                    heappushpop(heap, candidate)
+            return
+
+        difference = (x, y)[axis] - split
+        near, far = (left, right) if difference < 0 else (right, left)
+        self._query(near, x, y, k, allowed, heap)
+        # The far side is at least |difference| away, it can only hold better (or tied) points if closer than the worst
+        if len(heap) < k or abs(difference) <= -heap[0][0]:
+            self._query(far, x, y, k, allowed, heap)
+
+    def __len__(self) -> int:
+        return len(self.order)
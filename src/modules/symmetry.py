@@ -0,0 +1,94 @@
+from typing import Callable
+import numpy as np
+from modules.cache import LayoutKey
+from modules.elements import Table
+from modules.layout import Layout
+from modules.shots import ShotTable
+from modules.solver import solve
+
+SYMMETRIES = ((False, False), (True, False), (False, True), (True, True))  # (mirror the x axis, mirror the y axis)
+POSITION_COLUMNS = (("cue_x", "cue_y"), ("ball_x", "ball_y"), ("hole_x", "hole_y"), ("aim_x", "aim_y"))
+
+
+def mirror_positions(positions: np.ndarray, symmetry: tuple[bool, bool]) -> np.ndarray:
+    """
+    Return the positions, of shape (2, n), mirrored across the middle lines of the table.
+    Every symmetry is its own inverse.
+    """
+    positions = np.array(positions, dtype=float)
+    for axis, mirrored in enumerate(symmetry):
+        if mirrored:
+            positions[axis] = Table.TABLE_DIMENSION[axis] - positions[axis]
+    return positions
+
+
+def mirror_layout(layout: Layout, symmetry: tuple[bool, bool]) -> Layout:
+    """
+    Return the mirrored layout. The balls and holes keep their ids.
+    """
+    return Layout(mirror_positions(layout.positions, symmetry), layout.colors, layout.ids, layout.players,
+                  mirror_positions(layout.hole_positions, symmetry), layout.hole_ids)
+
+
+def mirror_shots(table: ShotTable, symmetry: tuple[bool, bool]) -> ShotTable:
+    """
+    Return the shots with their positions and cushion points mirrored. Ids, angles and distances do not change.
+    """
+    columns = dict(table.columns)
+    for names in POSITION_COLUMNS:
+        if names[0] in columns:
+            columns[names[0]], columns[names[1]] = mirror_positions(np.stack([columns[name] for name in names]), symmetry)
+    if "cushion_points" in columns:
+        points = columns["cushion_points"]
+        columns["cushion_points"] = mirror_positions(points.reshape(-1, 2).T, symmetry).T.reshape(points.shape)
+    return ShotTable(columns)
+
+
+def get_symmetries(layout: Layout, tolerance: float = 0.5) -> list[tuple[bool, bool]]:
+    """
+    Return the symmetries mapping the holes of the layout onto themselves (all of them for the holes of HoleStore).
+    """
+    holes = layout.hole_positions
+    symmetries = []
+    for symmetry in SYMMETRIES:
+        mirrored = mirror_positions(holes, symmetry)
+        distances = np.hypot(mirrored[0][:, None] - holes[0][None, :], mirrored[1][:, None] - holes[1][None, :])
+        if (distances.min(axis=1, initial=np.inf) <= tolerance).all():
+            symmetries.append(symmetry)
+    return symmetries
+
+
+class Canonicalizer:
+    """
+    Map layouts to a canonical orientation of the table, solve them there and map the shots back.
+
+    The four orientations of a layout (mirrored or not across each middle line) get the same canonical
+    layout: the one with the smallest LayoutKey among the orientations allowed by the holes. A solver
+    behind the canonicalizer, for instance SolveCache.solve, therefore sees one layout for the four.
+    """
+
+    def __init__(self, tolerance: float = 0.5, solver: Callable[[Layout], ShotTable] = None) -> None:
+        """
+        :param tolerance: The quantization step of the keys choosing the orientation, in centimeters
+        :param solver: The function returning the ranked shots of a layout (default: solver.solve, ranked)
+        """
+        self.tolerance = tolerance
+        self.solver = solver if solver is not None else (lambda layout: solve(layout).get_ranked())
+
+    def get_canonical(self, layout: Layout) -> tuple[Layout, tuple[bool, bool]]:
+        """
+        Return the canonical layout and the symmetry mapping the layout to it (and back).
+        """
+        layouts = {symmetry: mirror_layout(layout, symmetry) for symmetry in get_symmetries(layout, self.tolerance)}
+        symmetry = min(layouts, key=lambda symmetry: LayoutKey(layouts[symmetry], self.tolerance).digest)
+        return layouts[symmetry], symmetry
+
+    def solve(self, layout: Layout) -> ShotTable:
+        """
+        Return the ranked shots of the layout, solved in the canonical orientation.
+        """
+        canonical, symmetry = self.get_canonical(layout)
+        return mirror_shots(self.solver(canonical), symmetry)
+
+    def __repr__(self) -> str:
+        return "Canonicalizer(tolerance {self.tolerance})".format(self=self)
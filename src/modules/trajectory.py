@@ -1,5 +1,7 @@
 from modules.elements import *
 from modules.utils import Vector2D
+from modules.geometry import blocked_matrix, endpoint_id
+from modules.visibility import VisibilityGraph
 
 class Trajectory:
     """A class to represent a trajectory between two points"""
@@ -63,15 +65,7 @@ class Trajectory:
     @classmethod
     def check_for_obstacle(cls, trajectory: "Trajectory", obstacles: BallStore) -> bool:
         """Return True if the trajectory is blocked by an obstacle"""
-        for obstacle in obstacles.get_all():
-            if obstacle == trajectory.get_departure() or obstacle == trajectory.get_arrival():
-                continue
-            if obstacle.is_in_trajectory(
-                trajectory.get_departure().get_position(),
-                trajectory.get_arrival().get_position(),
-            ):
-                return True
-        return False
+        return bool(TrajectoryStore.get_blocked_matrix([trajectory], obstacles).any())
     
     @classmethod
     def from_vector(cls,
@@ -183,11 +177,31 @@ class TrajectoryStore:
                 return True
         return False
     
-    def is_possible(self, ball_store: BallStore) -> tuple[bool, list[Trajectory]]:
-        """Return True if the trajectory store is possible and which trajectories are blocked"""
+    @classmethod
+    def get_blocked_matrix(cls, trajectories: list[Trajectory], ball_store: BallStore) -> np.ndarray:
+        """Return the matrix telling which balls of the store (columns) block which trajectories (rows)
+
+        The ends of a trajectory never block it.
+        """
+        starts = np.array([[t.departure.x for t in trajectories], [t.departure.y for t in trajectories]])
+        ends = np.array([[t.arrival.x for t in trajectories], [t.arrival.y for t in trajectories]])
+        ignore_ids = [[endpoint_id(t.departure), endpoint_id(t.arrival)] for t in trajectories]
+        return blocked_matrix(starts, ends, ball_store.get_positions(), ball_store.get_ids(), ignore_ids)
+
+    def is_possible(self, ball_store: BallStore, graph: VisibilityGraph = None) -> tuple[bool, list[Trajectory]]:
+        """Return True if the trajectory store is possible and which trajectories are blocked
+
+        If the visibility graph of the layout is given, the blocked trajectories are read from it.
+        """
         trajectories = self.get_all()
+        if not trajectories:
+            return True, []
+        if graph is None:
+            blocked = TrajectoryStore.get_blocked_matrix(trajectories, ball_store).any(axis=1)
+        else:
+            blocked = [not graph.is_clear(trajectory.departure, trajectory.arrival) for trajectory in trajectories]
         for i in range(len(trajectories)):
-            if trajectories[i].is_blocked(ball_store):
+            if blocked[i]:
                 return False, [trajectories[i]]
             if i != len(trajectories) - 1:
                 if (trajectories[i].get_angle(trajectories[i + 1]) > 90 or
@@ -195,19 +209,23 @@ class TrajectoryStore:
                     return False, [trajectories[i], trajectories[i + 1]]
         return True, []
 
-    def touch_an_opponent_ball(self) -> bool:
-        """Return True if the trajectory store touch an opponent ball"""
+    def touch_an_opponent_ball(self, ball_store: BallStore = None) -> bool:
+        """Return True if the trajectory store touch an opponent ball (the white ball of the store is not one)"""
+        white_balls = ball_store.get_all("white") if ball_store is not None else []
         for trajectory in self.get_all():
             for ball in trajectory.get_balls():
-                if not ball.is_player:
+                if not ball.is_player and ball not in white_balls:
                     return True
         return False
     
     def touch_black_ball(self, ball_store: BallStore) -> bool:
         """Return True if the trajectory store touch a black ball"""
+        if not ball_store.get_all("black"):
+            return False
+        black_ball = ball_store.get_black_ball()
         for trajectory in self.get_all():
             for ball in trajectory.get_balls():
-                if ball_store.get_black_ball() == ball:
+                if black_ball == ball:
                     return True
         return False
 
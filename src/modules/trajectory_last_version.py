@@ -1,5 +1,7 @@
 from modules.elements import Ball, BallStore, Hole, HoleStore, Table
-from numpy import arccos, array, degrees, dot
+from modules.geometry import blocked_matrix
+from modules.visibility import VisibilityGraph
+from numpy import arccos, array, degrees, dot, logical_or
 from numpy.linalg import norm
 
 _DIFICULTIES_LEVEL = {
@@ -14,24 +16,30 @@ def check_intersection(ball:Ball, x: int, y: int, ball_store: BallStore):
     """
     Check if the ball is on the trajectory.
     """
-    if x < 0 or x > Table.TABLE_DIMENSION[0] or y < 0 or y > Table.TABLE_DIMENSION[1]:
-        return True
-    
-    for other in ball_store.get_all():
-        diameter = (ball.radius + other.radius)
-        if other != ball:
-            '''distance = ball.distance_to_position(x, y)
-            distance_obs_p1 = ball.distance_to(other)
-            distance_obs_p2 = norm(array([x, y]) - other.get_position())
+    return bool(check_intersections([ball], array([[x], [y]]), ball_store)[0, 0])
 
-            if ((distance_obs_p1 + distance_obs_p2) <= distance or
-                distance_obs_p1 <= diameter or distance_obs_p2 <= diameter
-            ):
-                return True
-        '''
-            if other.is_in_trajectory(ball.get_position().tolist(), (x, y)):
-                return True
-    return False
+
+def check_intersections(balls: list[Ball], positions: array, ball_store: BallStore) -> array:
+    """
+    Check, for every ball and every position, if the way from the ball to the position is blocked
+    by another ball of the store or leaves the table.
+    Positions are given as an array of the form [[x1, x2, ...], [y1, y2, ...]].
+    Return a boolean array of shape (number of balls, number of positions).
+    """
+    positions = array(positions, dtype=float).reshape(2, -1)
+    n, m = len(balls), positions.shape[1]
+    starts = Ball.get_positions(balls).reshape(2, n, 1).repeat(m, axis=2).reshape(2, -1)
+    ends = positions.reshape(2, 1, m).repeat(n, axis=1).reshape(2, -1)
+    ignore_ids = array([ball.id for ball in balls]).repeat(m)
+
+    blocked = blocked_matrix(starts, ends, ball_store.get_positions(), ball_store.get_ids(), ignore_ids)
+    blocked = blocked.any(axis=1).reshape(n, m)
+
+    outside = logical_or.reduce((
+        positions[0] < 0, positions[0] > Table.TABLE_DIMENSION[0],
+        positions[1] < 0, positions[1] > Table.TABLE_DIMENSION[1],
+    ))
+    return blocked | outside[None, :]
 
 
 def check_angle(white_ball: Ball, ball: Ball, hole: Hole) -> bool:
@@ -189,14 +197,21 @@ class TrajectoryStore:
         """
         self.trajectories = {}
     
-    def add_trajectories(self, ball_store: BallStore, holes: HoleStore, tags: list = []) -> None:
+    def add_trajectories(self, ball_store: BallStore, holes: HoleStore, tags: list = [],
+                         graph: VisibilityGraph = None) -> None:
         """
         Add all balls in the given BallStore to this store.
+        If the visibility graph of the layout is given, the blocked trajectories are read from it.
         """
         white_ball = ball_store.get_white_ball()
-        for ball in ball_store.get_all(ball_store.player_color):
-            for hole in holes.get_all():
-                if Trajectory.is_possible(white_ball, ball, hole, ball_store):
+        balls = ball_store.get_all(ball_store.player_color)
+        if graph is None:
+            blocked = check_intersections(balls, holes.get_positions(), ball_store)
+        else:
+            blocked = ~graph.get_clear(balls, holes.get_all())
+        for i, ball in enumerate(balls):
+            for j, hole in enumerate(holes.get_all()):
+                if not blocked[i, j] and check_angle(white_ball, ball, hole):
                     self.add_trajectory(ball, hole, tags)
 
     
@@ -223,14 +238,35 @@ class TrajectoryStore:
         """
         del self.trajectories[ball.id]
     
-    def update_trajectories(self, ball_store: BallStore, holes: HoleStore, tags: list = []) -> None:
+    def update_trajectories(self, ball_store: BallStore, holes: HoleStore, tags: list = [],
+                            graph: VisibilityGraph = None) -> None:
         """
         Update all trajectories.
+        If the visibility graph of the previous layout is given, it is updated with the balls that moved.
+        The trajectories of the balls that did not move are then kept while nothing blocks them,
+        unless the white ball moved.
         """
-        for i in self.get_ids():
-            self.remove_trajectory(i)
-        
-        self.add_trajectories(ball_store, holes, tags)
+        if graph is None:
+            for i in self.get_ids():
+                self.remove_trajectory(i)
+
+            self.add_trajectories(ball_store, holes, tags)
+            return
+
+        moved = set(graph.ids[graph.update(ball_store)].tolist())
+        white_ball = ball_store.get_white_ball()
+        balls = ball_store.get_all(ball_store.player_color)
+        clear = graph.get_clear(balls, holes.get_all())
+        previous, self.trajectories = self.trajectories, {}
+        for i, ball in enumerate(balls):
+            for j, hole in enumerate(holes.get_all()):
+                if not clear[i, j]:
+                    continue
+                trajectory = previous.get(ball.id, {}).get(hole.id)
+                if trajectory is not None and ball.id not in moved and white_ball.id not in moved:
+                    self.trajectories.setdefault(ball.id, {})[hole.id] = trajectory
+                elif check_angle(white_ball, ball, hole):
+                    self.add_trajectory(ball, hole, tags)
     
     def get_trajectories(self, ball: Ball) -> list[Trajectory]:
         """
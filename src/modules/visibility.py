@@ -0,0 +1,163 @@
+import numpy as np
+from modules.elements import Ball, BallStore, Hole, HoleStore
+from modules.geometry import blocked_matrix
+
+
+class VisibilityGraph:
+    """
+    The lines of sight between all the balls and holes of a layout, computed once in a vectorized pass.
+
+    Nodes are the balls of the BallStore (in get_all order) followed by the holes. For every pair of nodes,
+    the graph stores whether a ball can roll from one to the other without touching another ball,
+    their distance and the unit vector from one to the other. Two holes never see each other.
+    When a few balls move between two frames, update the graph instead of building a new one.
+    """
+
+    def __init__(self, ball_store: BallStore, holes: HoleStore|list[Hole]) -> None:
+        """
+        Build the graph of the balls of the store and the given holes.
+        """
+        holes = holes.get_all() if isinstance(holes, HoleStore) else list(holes)
+        balls = ball_store.get_all()
+        self.n_balls, self.n_holes = len(balls), len(holes)
+        self.ids = np.r_[np.asarray(ball_store.get_ids(), dtype=np.int64), np.full(len(holes), -1)]
+        self.ball_index = {ball.id: i for i, ball in enumerate(balls)}
+        self.hole_index = {hole.id: self.n_balls + i for i, hole in enumerate(holes)}
+
+        self.positions = np.hstack((np.asarray(ball_store.get_positions(), dtype=float).reshape(2, -1),
+                                    Hole.get_positions(holes).reshape(2, -1)))
+        vectors = self.positions[:, None, :] - self.positions[:, :, None]  # vectors[:, i, j] goes from i to j
+        self.distances = np.hypot(*vectors)
+        self.directions = vectors / np.where(self.distances > 0, self.distances, 1.)
+        self.clear = np.zeros((len(self), len(self)), dtype=bool)
+        self._pairs = np.triu_indices(len(self), k=1)
+        self._update_pairs(*self._pairs, ball_store)
+
+    def _update_pairs(self, first: np.ndarray, second: np.ndarray, ball_store: BallStore) -> None:
+        """
+        Compute the line of sight of the given pairs of nodes against the balls of the store.
+        """
+        pairs = first < self.n_balls  # At least one ball, as second > first
+        first, second = first[pairs], second[pairs]
+        if not len(first):
+            return
+        blocked = blocked_matrix(
+            self.positions[:, first], self.positions[:, second],
+            ball_store.get_positions(), ball_store.get_ids(),
+            np.stack((self.ids[first], self.ids[second]), axis=1),
+        ).any(axis=1)
+        self.clear[first, second] = ~blocked
+        self.clear[second, first] = ~blocked
+
+    def update(self, ball_store: BallStore) -> np.ndarray:
+        """
+        Update the graph after some balls of the store moved, were added or were removed.
+        Balls are followed by their IDs (see BallStore.update_positions). Only the pairs of nodes
+        involving a changed ball, or whose way a changed ball crosses before or after the change,
+        are computed again. Return the nodes of the moved and added balls.
+        """
+        ids = np.asarray(ball_store.get_ids(), dtype=np.int64)
+        positions = np.asarray(ball_store.get_positions(), dtype=float).reshape(2, -1)
+        previous = np.array([self.ball_index.get(id, -1) for id in ids.tolist()], dtype=np.intp)
+        kept = previous >= 0
+        changed = ~kept
+        changed[kept] = (self.positions[:, previous[kept]] != positions[:, kept]).any(axis=0)
+        removed = np.setdiff1d(np.arange(self.n_balls), previous[kept])
+        # The positions left or reached by a ball, whose neighborhood must be checked again
+        points = np.hstack((self.positions[:, previous[kept & changed]], self.positions[:, removed],
+                            positions[:, changed]))
+
+        if not changed.any() and not len(removed):
+            return np.flatnonzero(changed)
+        stable = np.r_[~changed, np.ones(self.n_holes, dtype=bool)]
+        if len(ids) != self.n_balls or not np.array_equal(ids, self.ids[:self.n_balls]):
+            self._move_nodes(ids, np.r_[previous, np.arange(self.n_balls, len(self))], stable)
+        self.positions[:, :self.n_balls] = positions
+
+        # Distances and directions of the changed balls
+        dirty = np.flatnonzero(~stable)
+        vectors = self.positions[:, None, :] - self.positions[:, dirty, None]  # vectors[:, a, j] goes from dirty[a] to j
+        lengths = np.hypot(*vectors)
+        self.distances[dirty] = lengths
+        self.distances[:, dirty] = lengths.T
+        units = vectors / np.where(lengths > 0, lengths, 1.)
+        self.directions[:, dirty] = units
+        self.directions[:, :, dirty] = -units.transpose(0, 2, 1)
+
+        # Lines of sight of the changed balls and of the ways crossed by a change
+        first, second = self._pairs
+        touched = ~stable[first] | ~stable[second]
+        crossed = ~touched & (first < self.n_balls)
+        if points.shape[1] and crossed.any():
+            crossed[crossed] = blocked_matrix(self.positions[:, first[crossed]], self.positions[:, second[crossed]],
+                                              points).any(axis=1)
+            touched |= crossed
+        self._update_pairs(first[touched], second[touched], ball_store)
+        return dirty[dirty < self.n_balls]
+
+    def _move_nodes(self, ids: np.ndarray, previous: np.ndarray, stable: np.ndarray) -> None:
+        """
+        Move the nodes to the given ball IDs, keeping the pairs of the stable nodes.
+
+        :param previous: The previous node of each new node (balls then holes), -1 for a new ball
+        :param stable: Whether each new node kept its pairs
+        """
+        nodes, sources = np.flatnonzero(stable), previous[stable]
+        size = len(ids) + self.n_holes
+        clear, distances = np.zeros((size, size), dtype=bool), np.zeros((size, size))
+        directions = np.zeros((2, size, size))
+        clear[np.ix_(nodes, nodes)] = self.clear[np.ix_(sources, sources)]
+        distances[np.ix_(nodes, nodes)] = self.distances[np.ix_(sources, sources)]
+        directions[:, nodes[:, None], nodes[None, :]] = self.directions[:, sources[:, None], sources[None, :]]
+
+        self.positions = np.hstack((np.zeros((2, len(ids))), self.positions[:, self.n_balls:]))
+        self.ids = np.r_[ids, np.full(self.n_holes, -1)]
+        self.ball_index = {id: i for i, id in enumerate(ids.tolist())}
+        self.hole_index = {id: len(ids) + i - self.n_balls for id, i in self.hole_index.items()}
+        self.n_balls = len(ids)
+        self.clear, self.distances, self.directions = clear, distances, directions
+        self._pairs = np.triu_indices(size, k=1)
+
+    def get_index(self, element: Ball|Hole) -> int:
+        """
+        Return the node of the given ball or hole.
+        """
+        if isinstance(element, Ball):
+            return self.ball_index[element.id]
+        return self.hole_index[element.id]
+
+    def get_indices(self, elements: list[Ball|Hole]) -> np.ndarray:
+        """
+        Return the nodes of the given balls and holes.
+        """
+        return np.array([self.get_index(element) for element in elements], dtype=np.intp)
+
+    def is_clear(self, departure: Ball|Hole, arrival: Ball|Hole) -> bool:
+        """
+        Return True if nothing blocks the way between the two elements.
+        """
+        return bool(self.clear[self.get_index(departure), self.get_index(arrival)])
+
+    def get_clear(self, departures: list[Ball|Hole], arrivals: list[Ball|Hole]) -> np.ndarray:
+        """
+        Return the matrix telling if nothing blocks the way from each departure to each arrival.
+        """
+        return self.clear[np.ix_(self.get_indices(departures), self.get_indices(arrivals))]
+
+    def get_distance(self, departure: Ball|Hole, arrival: Ball|Hole) -> float:
+        """
+        Return the distance between the two elements.
+        """
+        return float(self.distances[self.get_index(departure), self.get_index(arrival)])
+
+    def get_direction(self, departure: Ball|Hole, arrival: Ball|Hole) -> np.ndarray:
+        """
+        Return the unit vector from the departure to the arrival.
+        """
+        return self.directions[:, self.get_index(departure), self.get_index(arrival)]
+
+    def __len__(self) -> int:
+        return self.n_balls + self.n_holes
+
+    def __repr__(self) -> str:
+        return "VisibilityGraph({self.n_balls} balls, {self.n_holes} holes)".format(self=self)
@@ -30,6 +30,9 @@ for count, hole in enumerate(hole_store.get_all()):
         continue
     trajectories = SelectTrajectory()
     trajectories.select_trajectories_by_bounce(ball_store, hole_store, hole)
+    if not trajectories.trajectories:
+        print(hole, "can't be reached", '\n')
+        continue
 
     table = Table()
     table.draw_table()
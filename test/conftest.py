@@ -0,0 +1,20 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from modules.batch import get_layout  # noqa: E402
+from modules.elements import HoleStore  # noqa: E402
+
+
+@pytest.fixture
+def balls() -> dict[str, list]:
+    """The positions of the balls of the test layout, by color (red plays, yellow is the opponent)."""
+    return {"white": [[50, 40]], "red": [[95, 47], [140, 30]], "yellow": [[120, 70]], "black": [[30, 80]]}
+
+
+@pytest.fixture
+def layout(balls):
+    """The test layout, numbered as get_layout numbers the layouts of a batch."""
+    return get_layout(balls, HoleStore())
@@ -0,0 +1,53 @@
+import json
+import numpy as np
+import pytest
+from modules.batch import read_layouts, run_batch
+from modules.elements import BALL_COLORS
+from modules.select_trajectory import SelectTrajectory
+
+
+def test_batch_record_matches_interactive_path(tmp_path, balls, layout):
+    input_path, output_path = tmp_path / "layouts.jsonl", tmp_path / "shots.jsonl"
+    input_path.write_text(json.dumps(dict(balls, id="layout")) + "\n")
+    assert run_batch(str(input_path), str(output_path), banks=False, kicks=False) == 1
+    record = json.loads(output_path.read_text())
+    assert record["id"] == "layout"
+
+    # The interactive path of src/test.py, on the stores of the same layout (ids follow the order of the layout)
+    ball_store, hole_store = layout.to_stores()
+    stored_balls, stored_holes = ball_store.get_all(), hole_store.get_all()
+    compared = 0
+    for hole in stored_holes:
+        selection = SelectTrajectory()
+        selection.select_trajectories_by_bounce(ball_store, hole_store, hole)
+        for trajectory_store in selection.trajectories.get(1, []):
+            ball = trajectory_store.get_all()[-1].departure
+            shots = [shot for shot in record["shots"] if shot["kind"] == "direct"
+                     and shot["ball_id"] == stored_balls.index(ball) and shot["hole_id"] == stored_holes.index(hole)]
+            if shots:
+                assert np.isclose(shots[0]["difficulty"], SelectTrajectory.get_difficulty(trajectory_store, ball_store))
+                compared += 1
+    assert compared > 0
+
+
+def test_json_array_reads_as_json_lines(tmp_path, balls):
+    records = [dict(balls, id="first"), dict(balls, player="yellow", opponent="red")]
+    (tmp_path / "layouts.json").write_text(json.dumps(records))
+    (tmp_path / "layouts.jsonl").write_text("".join(json.dumps(record) + "\n" for record in records))
+    layouts = list(read_layouts(str(tmp_path / "layouts.json")))
+    expected = list(read_layouts(str(tmp_path / "layouts.jsonl")))
+    assert [key for key, _ in layouts] == [key for key, _ in expected] == ["first", "1"]
+    for (_, layout), (_, other) in zip(layouts, expected):
+        assert np.array_equal(layout.positions, other.positions) and np.array_equal(layout.players, other.players)
+
+
+def test_npz_players_must_be_a_player_color(tmp_path, balls):
+    colors = [BALL_COLORS.index(color) for color in balls for _ in balls[color]]
+    positions = np.array([point for color in balls for point in balls[color]], dtype=float).T
+    path = tmp_path / "layouts.npz"
+    players = [BALL_COLORS.index("yellow"), BALL_COLORS.index("white")]
+    np.savez(path, positions=np.stack((positions, positions)), colors=np.array([colors, colors]), players=players)
+    layouts = read_layouts(str(path))
+    assert next(layouts)[1].players.sum() == len(balls["yellow"])
+    with pytest.raises(ValueError, match="Row 1 "):
+        next(layouts)
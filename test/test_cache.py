@@ -0,0 +1,78 @@
+import numpy as np
+from modules.cache import LayoutKey, SolveCache
+from modules.layout import Layout
+from modules.shots import ShotTable
+from modules.solver import solve
+
+
+def get_moved(layout: Layout, dx: float) -> Layout:
+    """The layout with every ball moved by dx along x."""
+    return Layout(layout.positions + [[dx], [0]], layout.colors, layout.ids, layout.players,
+                  layout.hole_positions, layout.hole_ids)
+
+
+def get_rows(table: ShotTable) -> list[tuple]:
+    """The rows of the table as sortable tuples of their ids and difficulty."""
+    return sorted(zip(table["kind"].tolist(), table["ball_id"].tolist(), table["first_id"].tolist(),
+                      table["hole_id"].tolist(), np.round(table["difficulty"], 6).tolist()))
+
+
+def get_sized_solver(sizes: dict, calls: list):
+    """A solver returning a table of sizes[x of the white ball] rows, recording the layouts it solves."""
+    def solver(layout: Layout) -> ShotTable:
+        calls.append(layout)
+        n = sizes[float(layout.positions[0, layout.get_white_index()])]
+        return ShotTable({"ball_id": np.full(n, layout.ids[0]), "difficulty": np.arange(n, dtype=float)})
+    return solver
+
+
+def test_reordered_layout_hits_with_its_own_ids(layout):
+    cache = SolveCache()
+    cache.solve(layout)
+    order = np.random.default_rng(0).permutation(len(layout))[::-1]
+    holes = np.arange(len(layout.hole_ids))[::-1]
+    other = Layout(layout.positions[:, order], layout.colors[order], layout.ids[order] + 100, layout.players[order],
+                   layout.hole_positions[:, holes], layout.hole_ids[holes] + 10)
+    assert LayoutKey(other) == LayoutKey(layout)
+    table = cache.solve(other)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert len(table) and get_rows(table) == get_rows(solve(other).get_ranked())
+    assert set(table["ball_id"].tolist()) <= set(other.ids.tolist())
+    assert set(table["hole_id"].tolist()) <= set(other.hole_ids.tolist())
+
+
+def test_key_tolerance(layout):
+    assert LayoutKey(get_moved(layout, 0.1)) == LayoutKey(layout)
+    assert LayoutKey(get_moved(layout, 1.)) != LayoutKey(layout)
+
+
+def test_least_recently_used_eviction(layout):
+    layouts = [get_moved(layout, dx) for dx in range(3)]
+    calls = []
+    cache = SolveCache(max_entries=2, solver=get_sized_solver({50. + dx: 1 for dx in range(3)}, calls))
+    cache.solve(layouts[0])
+    cache.solve(layouts[1])
+    cache.solve(layouts[0])  # The first layout becomes the most recently used
+    cache.solve(layouts[2])  # Evicts the second layout
+    assert layouts[0] in cache and layouts[1] not in cache and layouts[2] in cache
+    assert (len(cache), cache.evictions, len(calls)) == (2, 1, 3)
+    cache.solve(layouts[1])
+    assert layouts[0] not in cache and len(calls) == 4
+
+
+def test_rows_accounting(layout):
+    layouts = [get_moved(layout, dx) for dx in range(4)]
+    calls = []
+    cache = SolveCache(max_rows=10, solver=get_sized_solver({50.: 4, 51.: 5, 52.: 3, 53.: 12}, calls))
+    cache.solve(layouts[0])
+    cache.solve(layouts[1])
+    assert cache.rows == 9 and len(cache) == 2
+    cache.solve(layouts[2])  # 12 rows: evicts the first layout
+    assert cache.rows == 8 and layouts[0] not in cache
+    cache.put(layouts[1], ShotTable({"ball_id": layout.ids[:1], "difficulty": np.zeros(1)}))  # Replaces 5 rows by 1
+    assert cache.rows == 4 and len(cache) == 2
+    cache.solve(layouts[3])  # Larger than max_rows alone: kept as the only layout
+    assert cache.rows == 12 and len(cache) == 1
+    assert cache.rows == sum(len(table) for table in cache.entries.values())
+    cache.clear()
+    assert cache.get_stats()["rows"] == 0 and cache.get_stats()["misses"] == 4
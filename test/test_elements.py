@@ -0,0 +1,70 @@
+import numpy as np
+from modules.elements import BALL_COLORS, ArrayBallStore, Ball, BallStore
+
+
+def get_positions(ball_store: BallStore, color: str = None) -> list[tuple[float, float]]:
+    """The positions of the balls of the store, in store order."""
+    return [(float(ball.x), float(ball.y)) for ball in ball_store.get_all(color)]
+
+
+def check_store(array_store: ArrayBallStore, ball_store: BallStore) -> None:
+    """Check that the arrays of the array store hold the same balls as the ball store, block by block."""
+    assert get_positions(array_store) == get_positions(ball_store)
+    assert array_store.get_colors() == ball_store.get_colors()
+    assert np.array_equal(array_store.get_ids(), [ball.id for ball in array_store.get_all()])
+    for color in BALL_COLORS:
+        balls = array_store.get_all(color)
+        assert get_positions(array_store, color) == get_positions(ball_store, color)
+        assert np.array_equal(array_store.get_positions(color), np.reshape(get_positions(ball_store, color), (-1, 2)).T)
+        assert np.array_equal(array_store.get_ids(color), [ball.id for ball in balls])
+        assert [ball._slot for ball in balls] == list(range(*array_store._bounds(color)))
+        assert array_store.count(color) == len(balls)
+
+
+def test_add_and_remove_across_color_blocks():
+    random = np.random.default_rng(0)
+    array_store, ball_store = ArrayBallStore(capacity=2), BallStore()
+    for _ in range(200):
+        color = BALL_COLORS[random.integers(len(BALL_COLORS))]
+        balls = array_store.get_all(color)
+        if balls and random.random() < 0.4:
+            index = int(random.integers(len(balls)))
+            if random.random() < 0.5:
+                array_store.remove_ball(balls[index], color)
+            else:
+                array_store.remove_ball_by_id(balls[index].id, color)
+            ball_store.remove_ball(ball_store.get_all(color)[index], color)
+        else:
+            size = random.integers(1, 4)
+            xs, ys = random.uniform(0, 190, size).tolist(), random.uniform(0, 95, size).tolist()
+            array_store.add_balls(xs, ys, color)
+            ball_store.add_balls(xs, ys, color)
+        check_store(array_store, ball_store)
+
+
+def test_ball_view_writes_go_into_the_arrays():
+    array_store = ArrayBallStore()
+    array_store.add_balls([10, 20], [30, 40], "red")
+    array_store.add_balls([50], [60], "yellow")
+    array_store.add_ball(70, 80, "white")
+    red, yellow = array_store.get_all("red")[1], array_store.get_all("yellow")[0]
+
+    red.x, red.y = 25., 45.
+    yellow.update_position(55, 65)
+    red.player = True
+    assert np.array_equal(array_store.get_positions(), [[10, 25, 55, 70], [30, 45, 65, 80]])
+    assert np.array_equal(array_store.get_player_mask(), [False, True, False, False])
+    assert array_store.find_ball(25, 45) is red
+
+    # Adding a ball before a block moves its balls to other slots, with their values
+    array_store.add_ball(15, 35, "red")
+    yellow.x = 58.
+    assert np.array_equal(array_store.get_positions("yellow"), [[58], [65]])
+    assert array_store.player_color == "red"
+
+    # A removed ball keeps its values and no longer writes into the arrays
+    array_store.remove_ball(red, "red")
+    red.x = 99.
+    assert (red.x, red.y, red.player) == (99., 45., True)
+    assert 99. not in array_store.get_positions()[0] and len(array_store) == 4
+    assert isinstance(red, Ball)
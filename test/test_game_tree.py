@@ -0,0 +1,36 @@
+import numpy as np
+from modules.game_tree import GameTree
+from modules.shots import get_direct_shots
+
+
+def test_search_direct_shots_only(layout):
+    tree = GameTree(width=2, samples=2, seed=0, banks=False, kicks=False)
+    table = tree.search(layout)
+    assert len(table)
+    assert np.isfinite(table["value"][0])
+    assert table["value"][0] >= table["difficulty"][0]
+
+
+def test_search_given_direct_candidates(layout):
+    candidates = get_direct_shots(*layout.get_arguments()).get_ranked()
+    table = GameTree(width=2, samples=2, seed=0).search(layout, candidates)
+    assert len(table) == min(2, len(candidates))
+    values = table["value"][~np.isnan(table["value"])]
+    assert len(values) and (np.diff(values) >= 0).all()
+
+
+def test_transposition_table_is_reused(layout):
+    tree = GameTree(width=1, samples=2, seed=0, banks=False, kicks=False)
+    tree.search(layout)
+    misses = tree.misses
+    tree.random = np.random.default_rng(0)
+    tree.search(layout)
+    assert tree.misses == misses
+    assert tree.hits > 0
+
+
+def test_swap_players(layout):
+    swapped = layout.swap_players()
+    assert (layout.player_color, layout.opponent_color) == ("red", "yellow")
+    assert (swapped.player_color, swapped.opponent_color) == ("yellow", "red")
+    assert (swapped.swap_players().players == layout.players).all()
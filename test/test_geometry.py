@@ -0,0 +1,66 @@
+import numpy as np
+from modules.elements import Ball, Hole, Table
+from modules.geometry import OcclusionSweep, blocked_matrix, get_angular_margins
+
+
+def get_points(random: np.random.Generator, n: int) -> np.ndarray:
+    """n random positions of balls on the table, shape (2, n)."""
+    return random.uniform(2 * Ball.radius, np.asarray(Table.TABLE_DIMENSION) - 2 * Ball.radius, (n, 2)).T
+
+
+def test_sweep_matches_blocked_matrix():
+    random = np.random.default_rng(0)
+    clearance = 2 * Ball.radius
+    for _ in range(100):
+        origin = get_points(random, 1)[:, 0]
+        # Random balls, balls behind the origin (around the wrap at -pi and pi) and balls closer than the clearance
+        behind = origin[:, None] + np.stack((-random.uniform(15., 60., 3), random.uniform(-8., 8., 3)))
+        close = origin[:, None] + random.uniform(-clearance, clearance, (2, 2)) / np.sqrt(2)
+        obstacles = np.hstack((get_points(random, 8), behind, close))[:, :random.integers(4, 14)]
+        ids = np.arange(obstacles.shape[1] + 1)
+        obstacles, origin_id = np.c_[obstacles, origin], ids[-1]
+        sweep = OcclusionSweep(origin, obstacles, ids, origin_id)
+
+        # Every ball as a target, then points on the table and behind the origin, which are no ball
+        targets = np.hstack((obstacles[:, :-1], get_points(random, 20), origin[:, None] + [[-70.], [0.]]))
+        target_ids = np.r_[ids[:-1], np.full(targets.shape[1] - len(ids) + 1, -1)]
+        ignore_ids = np.stack((np.full(len(target_ids), origin_id), target_ids), axis=1)
+        starts = np.repeat(origin[:, None], targets.shape[1], axis=1)
+        expected = ~blocked_matrix(starts, targets, obstacles, ids, ignore_ids).any(axis=1)
+        assert np.array_equal(sweep.is_clear(targets, target_ids), expected)
+
+
+def test_sweep_depths_are_safe():
+    random = np.random.default_rng(1)
+    origin, obstacles = np.array([95., 47.5]), get_points(random, 10)
+    sweep = OcclusionSweep(origin, obstacles)
+    angles = np.linspace(-np.pi, np.pi, 721)
+    depths = np.minimum(sweep.get_depths(angles), 500.)
+    ends = origin[:, None] + (depths - 2 * Ball.radius - 1e-6) * np.stack((np.cos(angles), np.sin(angles)))
+    free = depths > 2 * Ball.radius
+    starts = np.repeat(origin[:, None], free.sum(), axis=1)
+    assert not blocked_matrix(starts, ends[:, free], obstacles).any()
+
+
+def test_margins_of_a_straight_in_shot():
+    # White ball (id 0) -> ball (id 1) -> middle hole, on the line x = 95, and a ball (id 2) far from the paths
+    cue, ball, hole = np.array([95., 80.]), np.array([95., 40.]), np.array([95., 0.])
+    obstacles, ids = np.array([cue, ball, [20., 20.]]).T, np.arange(3)
+    low, high = get_angular_margins(cue, ball[None], hole, obstacles, ids, [1], 0)
+
+    # The ball reaches the mouth of the hole within asin(Hole.radius / L), mapped to the white ball through the ghost ball
+    mouth = np.arcsin(Hole.radius / 40.)
+    offsets = []
+    for angle in (-np.pi / 2 - mouth, -np.pi / 2 + mouth):
+        ghost = ball - 2 * Ball.radius * np.array([np.cos(angle), np.sin(angle)])
+        offsets.append(np.arctan2(*(ghost - cue)[::-1]) + np.pi / 2)
+    assert np.allclose([low[0], high[0]], sorted(offsets))
+    assert np.isclose(-low[0], high[0]) and high[0] > 0
+
+
+def test_margins_of_blocked_chains():
+    cue, ball, hole = np.array([95., 80.]), np.array([95., 40.]), np.array([95., 0.])
+    for blocker in ([95., 20.], [95., 60.]):  # Between the ball and the hole, between the white ball and the ball
+        obstacles, ids = np.array([cue, ball, blocker]).T, np.arange(3)
+        low, high = get_angular_margins(cue, ball[None], hole, obstacles, ids, [1], 0)
+        assert low[0] == high[0] == 0
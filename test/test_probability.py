@@ -0,0 +1,32 @@
+import numpy as np
+from modules.probability import SuccessEstimator, get_aims, get_wilson_interval
+from modules.shots import get_direct_shots
+from modules.solver import solve
+
+
+def test_aims_of_direct_shots(layout):
+    table = get_direct_shots(*layout.get_arguments())
+    aims = get_aims(table)
+    expected = np.arctan2(table["aim_y"] - table["cue_y"], table["aim_x"] - table["cue_x"])
+    assert np.allclose(aims, expected)
+
+
+def test_aims_of_kick_shots_go_to_the_cushion(layout):
+    table = solve(layout).get_kind("kick")
+    aims = get_aims(table)
+    points = table["cushion_points"][:, 0]
+    assert np.allclose(aims, np.arctan2(points[:, 1] - table["cue_y"], points[:, 0] - table["cue_x"]))
+
+
+def test_estimate_direct_only_table(layout):
+    table = get_direct_shots(*layout.get_arguments()).get_ranked()
+    estimator = SuccessEstimator(layout, batch=8, max_samples=8, seed=0)
+    estimated = estimator.estimate(table.take(np.arange(min(2, len(table)))))
+    assert len(estimated) == min(2, len(table))
+    assert ((estimated["probability"] >= 0) & (estimated["probability"] <= 1)).all()
+    assert (estimated["samples"] == 8).all()
+
+
+def test_wilson_interval_stays_in_bounds():
+    low, high = get_wilson_interval(np.array([0, 5, 10]), np.array([10, 10, 10]))
+    assert (low >= 0).all() and (high <= 1).all() and (low <= high).all()
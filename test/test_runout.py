@@ -0,0 +1,53 @@
+from itertools import permutations
+import numpy as np
+from modules.batch import get_layout
+from modules.elements import HoleStore
+from modules.runout import RunoutPlanner
+from modules.shots import get_direct_shots
+
+BALLS = {"white": [[60, 45]], "red": [[30, 20], [160, 25], [95, 70]], "yellow": [[130, 50]], "black": [[95, 30]]}
+
+
+def get_shot_difficulty(layout, cue, ball, on_table):
+    """The easiest feasible direct shot on the ball, the white ball at cue and the given balls on the table."""
+    white = layout.get_white_index()
+    obstacles = np.c_[np.reshape(cue, (2, 1)), layout.positions[:, on_table]]
+    table = get_direct_shots(cue, layout.positions[:, [ball]], layout.ids[[ball]], layout.hole_positions,
+                             layout.hole_ids, obstacles, np.r_[layout.ids[white], layout.ids[on_table]],
+                             int(layout.ids[white]))
+    return min(table["difficulty"][table["feasible"]], default=np.inf)
+
+
+def get_best_order(layout):
+    """The easiest order clearing every ball of the player then the black ball, by brute force."""
+    white, black = layout.get_white_index(), int(layout.get_indices("black")[0])
+    players = np.flatnonzero(layout.players).tolist()
+    others = [i for i in range(len(layout)) if i not in players and i not in (white, black)]
+    best = (np.inf, None)
+    for order in permutations(players):
+        order, cue, total, left = list(order) + [black], layout.positions[:, white], 0., players + [black]
+        for ball in order:
+            total += get_shot_difficulty(layout, cue, ball, left + others)
+            left = [i for i in left if i != ball]
+            cue = layout.positions[:, ball]
+        best = min(best, (total, order), key=lambda item: item[0])
+    return best
+
+
+def test_runout_matches_brute_force():
+    layout = get_layout(BALLS, HoleStore())
+    total, order = get_best_order(layout)
+    assert np.isfinite(total)
+    planned, planned_total, shots = RunoutPlanner(layout).solve()
+    assert planned == [int(layout.ids[ball]) for ball in order]
+    assert np.isclose(planned_total, total)
+    assert np.isclose(shots["difficulty"].sum(), total)
+    assert planned[-1] == int(layout.ids[layout.get_indices("black")[0]])
+
+
+def test_runout_without_shot():
+    layout = get_layout({"white": [[60, 45]], "red": [[60, 45.5]], "black": [[95, 30]]}, HoleStore())
+    planner = RunoutPlanner(layout)
+    order, total, shots = planner.solve()
+    assert len(order) == len(shots)
+    assert planner.get_cost((1 << len(planner.balls)) - 1)[0] == 2 - len(order)
@@ -0,0 +1,35 @@
+import numpy as np
+from modules.safety import OpponentEvaluator, SafetySearch
+from modules.solver import solve
+
+
+def get_easiest(layout):
+    ranked = solve(layout).get_ranked()
+    return float(ranked["difficulty"][0]) if len(ranked) else np.inf
+
+
+def test_evaluate_matches_solve(layout):
+    layouts = [layout, layout.swap_players(), layout]
+    values = OpponentEvaluator().evaluate(layouts)
+    assert np.allclose(values, [get_easiest(layout) for layout in layouts])
+
+
+def test_evaluate_with_eviction(layout):
+    evaluator = OpponentEvaluator(max_entries=1)
+    evaluator.evaluate([layout])
+    values = evaluator.evaluate([layout, layout.swap_players()])
+    assert np.allclose(values, [get_easiest(layout), get_easiest(layout.swap_players())])
+    assert len(evaluator) == 1
+    assert (evaluator.hits, evaluator.misses) == (1, 2)
+
+
+def test_evaluate_counts_duplicates_as_hits(layout):
+    evaluator = OpponentEvaluator()
+    evaluator.evaluate([layout, layout, layout])
+    assert (evaluator.hits, evaluator.misses) == (2, 1)
+
+
+def test_search_ranks_by_opponent_difficulty(layout):
+    table = SafetySearch(cut_angles=(-30., 0., 30.), rolls=(10.,)).search(layout)
+    assert len(table) and table["feasible"].all()
+    assert np.array_equal(table["opponent_difficulty"], np.sort(table["opponent_difficulty"])[::-1])
@@ -0,0 +1,99 @@
+from itertools import permutations
+import numpy as np
+from modules.elements import ArrayBallStore, Ball, HoleStore, Table
+from modules.select_trajectory import SelectTrajectory, get_difficulties, get_top_k
+from modules.trajectory import Trajectory, TrajectoryStore
+from modules.visibility import VisibilityGraph
+
+
+def get_random_store(random: np.random.Generator, n_balls: int = 8) -> ArrayBallStore:
+    """A store of n_balls balls (white, black, then red and yellow) at random positions, red playing."""
+    low, high = 2 * Ball.radius, np.asarray(Table.TABLE_DIMENSION) - 2 * Ball.radius
+    xs, ys = random.uniform(low, high, (n_balls, 2)).T
+    ball_store = ArrayBallStore()
+    ball_store.add_balls(xs[:1], ys[:1], "white")
+    ball_store.add_balls(xs[1:2], ys[1:2], "black")
+    ball_store.add_balls(xs[2::2], ys[2::2], "red")
+    ball_store.add_balls(xs[3::2], ys[3::2], "yellow")
+    ball_store.set_players("red", "yellow")
+    return ball_store
+
+
+def test_candidates_come_in_non_decreasing_difficulty():
+    random, candidates = np.random.default_rng(0), 0
+    for _ in range(10):
+        ball_store = get_random_store(random)
+        difficulties = [difficulty for _, difficulty in
+                        SelectTrajectory.iter_candidates(ball_store, HoleStore().get_all(), max_bounce=3)]
+        assert np.all(np.diff(difficulties) >= -1e-9)
+        candidates += len(difficulties)
+    assert candidates
+
+
+def test_first_candidate_is_the_best_combination():
+    random = np.random.default_rng(1)
+    for _ in range(10):
+        ball_store, holes = get_random_store(random), HoleStore().get_all()
+        best = min(SelectTrajectory.search_combinations(ball_store, hole, max_bounce=3)[1] for hole in holes)
+        first = next(SelectTrajectory.iter_candidates(ball_store, holes, max_bounce=3), (None, np.inf))
+        assert np.isclose(first[1], best) or first[1] == best == np.inf
+        if first[0] is not None:
+            assert np.isclose(SelectTrajectory.get_difficulty(first[0], ball_store), first[1])
+
+
+def get_best_chain(ball_store: ArrayBallStore, hole, max_bounce: int) -> float:
+    """The smallest difficulty of every chain of at most max_bounce balls into the hole, by brute force."""
+    white, graph = ball_store.get_white_ball(), VisibilityGraph(ball_store, [hole])
+    balls = [ball for ball in ball_store.get_all() if ball != white]
+    best = np.inf
+    for size in range(1, max_bounce + 1):
+        for chain in permutations(balls, size):  # From the ball hit by the white ball to the ball in the hole
+            elements = [white, *chain, hole]
+            if not (chain[0].is_player and chain[-1].is_player):
+                continue
+            if not all(graph.is_clear(a, b) for a, b in zip(elements, elements[1:])):
+                continue
+            directions = [graph.get_direction(a, b) for a, b in zip(elements, elements[1:])]
+            if any(first @ second <= np.cos(np.radians(SelectTrajectory.MAX_ANGLE))
+                   for first, second in zip(directions, directions[1:])):
+                continue
+            trajectory_store = TrajectoryStore()
+            trajectory_store.add_trajectories_by_instance([Trajectory(a, b) for a, b in zip(elements, elements[1:])])
+            best = min(best, SelectTrajectory.get_difficulty(trajectory_store, ball_store))
+    return best
+
+
+def test_search_combinations_matches_brute_force():
+    random, found = np.random.default_rng(2), 0
+    for _ in range(10):
+        ball_store = get_random_store(random, 6)
+        for hole in HoleStore().get_all():
+            trajectory_store, difficulty = SelectTrajectory.search_combinations(ball_store, hole, max_bounce=3)
+            expected = get_best_chain(ball_store, hole, 3)
+            assert np.isclose(difficulty, expected) or difficulty == expected == np.inf
+            if trajectory_store is not None:
+                assert np.isclose(SelectTrajectory.get_difficulty(trajectory_store, ball_store), difficulty)
+                found += trajectory_store.get_number_of_bounces() > 1
+    assert found
+
+
+def test_top_k_matches_a_stable_sort():
+    random = np.random.default_rng(3)
+    for _ in range(50):
+        difficulties = random.integers(0, 10, random.integers(0, 30)).astype(float)  # Many ties
+        k = int(random.integers(0, 35))
+        assert np.array_equal(get_top_k(difficulties, k), np.argsort(difficulties, kind="stable")[:k])
+        assert np.array_equal(get_top_k(difficulties, k, hardest=True), np.argsort(-difficulties, kind="stable")[:k])
+    assert np.array_equal(get_top_k([3., 1., 2.]), [1, 2, 0])
+
+
+def test_columns_match_get_difficulty():
+    random, checked = np.random.default_rng(4), 0
+    for _ in range(10):
+        ball_store = get_random_store(random)
+        trajectory_stores = [store for store, _ in SelectTrajectory.iter_candidates(ball_store, HoleStore().get_all(), 3)]
+        difficulties = get_difficulties(**SelectTrajectory.get_columns(trajectory_stores, ball_store))
+        expected = [SelectTrajectory.get_difficulty(store, ball_store) for store in trajectory_stores]
+        assert np.allclose(difficulties, expected)
+        checked += len(trajectory_stores)
+    assert checked
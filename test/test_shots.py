@@ -0,0 +1,100 @@
+import numpy as np
+from modules.elements import ArrayBallStore, Ball, HoleStore, Table
+from modules.geometry import fold_points, get_cushions, get_lattice_cells, get_lattice_images, mirror_points
+from modules.select_trajectory import DIFICULTIES, SelectTrajectory
+from modules.shots import enumerate_direct_shots, get_bank_shots, get_kick_shots
+
+
+def get_stores() -> tuple[ArrayBallStore, HoleStore]:
+    ball_store = ArrayBallStore()
+    ball_store.add_balls([40, 120], [30, 60], "red")
+    ball_store.add_balls([150], [20], "yellow")
+    ball_store.add_balls([90], [50], "white")
+    ball_store.add_balls([100], [80], "black")
+    ball_store.set_players("red", "yellow")
+    return ball_store, HoleStore()
+
+
+def test_direct_shot_difficulty_matches_select_trajectory():
+    ball_store, hole_store = get_stores()
+    table = enumerate_direct_shots(ball_store, hole_store)
+    assert len(table)
+    for index in range(len(table)):
+        trajectory_store = table.get_trajectory_store(index, ball_store, hole_store)
+        selection = SelectTrajectory()
+        selection.add_trajectory(trajectory_store, trajectory_store.get_number_of_bounces())
+        _, scores = selection.get_scores(ball_store)
+        assert np.isclose(table["difficulty"][index], SelectTrajectory.get_difficulty(trajectory_store, ball_store))
+        assert np.isclose(table["difficulty"][index], scores[0])
+
+
+def test_difficulty_counts_angles_in_degrees():
+    ball_store, hole_store = get_stores()
+    table = enumerate_direct_shots(ball_store, hole_store)
+    trajectory_store = table.get_trajectory_store(0, ball_store, hole_store)
+    angle = np.degrees(trajectory_store.get_total_angle())
+    expected = (trajectory_store.get_total_distance() * DIFICULTIES['ONE CENTIMETER'] + angle * DIFICULTIES['ONE DEGREE']
+                + DIFICULTIES['BOUNCE'])
+    assert np.isclose(SelectTrajectory.get_difficulty(trajectory_store, ball_store), expected)
+
+
+def get_bottom_point(start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """Where the path from start to end, mirrored across the bottom cushion line, touches that line."""
+    cushion = Ball.radius
+    image = np.array([end[0], 2 * cushion - end[1]])
+    t = (start[1] - cushion) / (start[1] - image[1])
+    return start + t * (image - start)
+
+
+def test_one_cushion_bank_on_an_empty_table():
+    cue, ball = np.array([50., 70.]), np.array([60., 40.])
+    holes = HoleStore().get_all()
+    hole = [hole for hole in holes if (hole.x, hole.y) == (95, 95)][0]  # The top middle hole
+    obstacles, ids = np.stack((cue, ball), axis=1), np.array([0, 1])
+    table = get_bank_shots(cue, ball[:, None], ids[1:], [[hole.x], [hole.y]], [hole.id], obstacles, ids, 0,
+                           pockets=[[h.x for h in holes], [h.y for h in holes]])
+    target = np.array([hole.x, Table.TABLE_DIMENSION[1] - Ball.radius])  # The hole center, inside the cushions
+    row = np.flatnonzero(np.isclose(table["cushion_points"][:, 0, 1], Ball.radius))
+    assert len(row) == 1 and table["feasible"][row[0]]
+    assert np.allclose(table["cushion_points"][row[0], 0], get_bottom_point(ball, target))
+
+
+def test_kick_on_an_empty_table():
+    cue, ball, hole = np.array([60., 30.]), np.array([120., 40.]), np.array([190., 95.])
+    obstacles, ids = np.stack((cue, ball), axis=1), np.array([0, 1])
+    table = get_kick_shots(cue, ball[:, None], ids[1:], hole[:, None], [3], obstacles, ids, 0)
+    ghost = ball - 2 * Ball.radius * (hole - ball) / np.hypot(*(hole - ball))
+    row = np.flatnonzero(np.isclose(table["cushion_points"][:, 0, 1], Ball.radius))
+    assert len(row) == 1 and table["feasible"][row[0]]
+    assert np.allclose(table["cushion_points"][row[0], 0], get_bottom_point(cue, ghost))
+    assert np.allclose([table["aim_x"][row[0]], table["aim_y"][row[0]]], ghost)
+
+
+def test_lattice_images_fold_back():
+    points = np.array([[20., 95., 150.], [10., 47.5, 80.]])
+    cells = get_lattice_cells(3)
+    assert np.allclose([get_lattice_images(points, cell) for cell in cells[:4]], mirror_points(points))
+    for cell in cells:
+        assert np.allclose(fold_points(get_lattice_images(points, cell)), points)
+
+
+def test_two_cushion_banks_reflect_on_the_cushions():
+    cue, ball = np.array([40., 60.]), np.array([70., 40.])
+    holes = HoleStore().get_all()
+    positions, hole_ids = [[h.x for h in holes], [h.y for h in holes]], [h.id for h in holes]
+    obstacles, ids = np.stack((cue, ball), axis=1), np.array([0, 1])
+    table = get_bank_shots(cue, ball[:, None], ids[1:], positions, hole_ids, obstacles, ids, 0,
+                           max_cushions=2, min_cushions=2)
+    table = table.get_feasible()
+    assert len(table) and (table["cushions"] == 2).all()
+    cushions = get_cushions()
+    for index in range(len(table)):
+        target = np.clip([table["hole_x"][index], table["hole_y"][index]], cushions[[0, 2]], cushions[[1, 3]])
+        points = [ball, *table["cushion_points"][index], target]
+        for before, point, after in zip(points, points[1:], points[2:]):
+            axis = int(np.argmin([np.abs(cushions[:2] - point[0]).min(), np.abs(cushions[2:] - point[1]).min()]))
+            assert np.isclose(np.abs(cushions[2 * axis:2 * axis + 2] - point[axis]).min(), 0)
+            incoming = (point - before) / np.hypot(*(point - before))
+            outgoing = (after - point) / np.hypot(*(after - point))
+            incoming[axis] = -incoming[axis]  # The cushion flips the component across its line
+            assert np.allclose(incoming, outgoing)
@@ -0,0 +1,114 @@
+import numpy as np
+from modules.elements import Ball, HoleStore, Table
+from modules.simulation import BatchSimulator, EventSimulator
+
+
+def get_holes() -> np.ndarray:
+    return np.asarray(HoleStore().get_positions(), dtype=float).reshape(2, -1)
+
+
+def test_batch_matches_event_on_single_ball_shots():
+    holes, random, n = get_holes(), np.random.default_rng(0), 100
+    starts = random.uniform(2 * Ball.radius, np.asarray(Table.TABLE_DIMENSION) - 2 * Ball.radius, (n, 2))
+    angles, speeds = random.uniform(0., 2 * np.pi, n), random.uniform(50., 150., n)
+    velocities = np.stack((speeds * np.cos(angles), speeds * np.sin(angles)))
+    batch = BatchSimulator(starts[:, :, None], holes, cue=np.zeros(n, dtype=np.intp))
+    batch.strike(velocities)
+    batch.run(dt=1e-3)
+    for table in range(n):
+        simulator = EventSimulator(starts[table][:, None], holes, velocities=velocities[:, table:table + 1])
+        simulator.run()
+        assert batch.pocketed[table, 0] == simulator.pocketed[0]
+        if simulator.pocketed[0] < 0:
+            assert np.hypot(*(batch.positions[table, :, 0] - simulator.get_positions()[:, 0])) < 1.
+
+
+def test_batch_matches_event_on_head_on_shot():
+    holes = get_holes()
+    positions = np.array([[64., 40.], [40., 25.]])  # The white ball, then a ball between it and the corner pocket
+    velocity = 250. * positions[:, 1] / np.hypot(*positions[:, 1])
+    batch = BatchSimulator(positions[None], holes, cue=np.zeros(1, dtype=np.intp))
+    batch.strike(-velocity)
+    batch.run(dt=1e-3)
+    simulator = EventSimulator(positions, holes, velocities=np.c_[-velocity, [0., 0.]])
+    simulator.run()
+    assert batch.first_contact[0] == 1
+    assert simulator.pocketed[1] == batch.pocketed[0, 1] == 0
+    assert (simulator.pocketed >= 0).tolist() == (batch.pocketed[0] >= 0).tolist()
+
+
+def roll(start: list, velocity: list, *others: list) -> EventSimulator:
+    """The event simulator of a ball rolling from start with the velocity, and balls at rest at the others."""
+    positions = np.array([start, *others], dtype=float).T
+    velocities = np.zeros_like(positions)
+    velocities[:, 0] = velocity
+    return EventSimulator(positions, get_holes(), velocities=velocities)
+
+
+def get_time(speed: float, distance: float, deceleration: float) -> float:
+    """The time a ball rolling at the speed takes to roll the distance."""
+    return (speed - np.sqrt(speed * speed - 2 * deceleration * distance)) / deceleration
+
+
+def test_event_stop():
+    simulator = roll([95., 47.5], [12., 16.])
+    events = simulator.run()
+    deceleration = EventSimulator.FRICTION * EventSimulator.GRAVITY
+    assert [event.kind for event in events] == ["stop"]
+    assert np.isclose(events[0].time, 20. / deceleration)
+    assert np.allclose(simulator.get_positions()[:, 0], [95. + 0.6 * 400. / (2 * deceleration),
+                                                        47.5 + 0.8 * 400. / (2 * deceleration)])
+    assert not simulator.is_moving()
+
+
+def test_event_cushion():
+    simulator = roll([95., 47.5], [150., 0.])
+    event = simulator.step()
+    deceleration = EventSimulator.FRICTION * EventSimulator.GRAVITY
+    distance = Table.TABLE_DIMENSION[0] - Ball.radius - 95.
+    assert (event.kind, event.other) == ("cushion", 1)
+    assert np.isclose(event.time, get_time(150., distance, deceleration))
+    speed = np.sqrt(150. ** 2 - 2 * deceleration * distance)
+    assert np.allclose(simulator.get_velocities()[:, 0], [-EventSimulator.CUSHION_RESTITUTION * speed, 0.])
+
+
+def test_event_head_on_hit():
+    simulator = roll([50., 47.5], [100., 0.], [100., 47.5])
+    event = simulator.step()
+    deceleration = EventSimulator.FRICTION * EventSimulator.GRAVITY
+    distance = 50. - 2 * Ball.radius
+    assert (event.kind, event.ball, event.other) == ("ball", 0, 1)
+    assert np.isclose(event.time, get_time(100., distance, deceleration))
+    speed = np.sqrt(100. ** 2 - 2 * deceleration * distance)
+    restitution = EventSimulator.BALL_RESTITUTION
+    assert np.allclose(simulator.get_velocities(), [[0.5 * (1 - restitution) * speed, 0.5 * (1 + restitution) * speed],
+                                                    [0., 0.]])
+
+
+def test_event_corner_pocket():
+    simulator = roll([40., 40.], [-100. / np.sqrt(2), -100. / np.sqrt(2)])
+    events = simulator.run()
+    deceleration = EventSimulator.FRICTION * EventSimulator.GRAVITY
+    assert [(event.kind, event.other) for event in events] == [("pocket", 0)]
+    assert np.isclose(events[0].time, get_time(100., 40. * np.sqrt(2) - EventSimulator.POCKET_RADIUS, deceleration))
+    assert simulator.pocketed.tolist() == [0]
+    assert np.isclose(np.hypot(*simulator.get_positions()[:, 0]), EventSimulator.POCKET_RADIUS)
+
+
+def test_event_stale_predictions_are_dropped():
+    simulator = roll([50., 47.5], [100., 0.], [100., 47.5])
+    hit = simulator.step()
+    speed = simulator.get_velocities()[0, 0]
+    deceleration = EventSimulator.FRICTION * EventSimulator.GRAVITY
+    events = simulator.run()
+    assert [event.time for event in events] == sorted(event.time for event in events)
+    # The white ball stops after the hit, not at the time predicted when it was struck
+    assert (events[0].kind, events[0].ball) == ("stop", 0)
+    assert np.isclose(events[0].time, hit.time + speed / deceleration)
+    assert not any(np.isclose(event.time, 100. / deceleration) for event in events)
+
+
+def test_event_cushion_open_in_mouth():
+    simulator = roll([60., 8.], [-120., 0.])  # Crosses the left cushion line 9.8 cm from the corner, then falls
+    events = simulator.run()
+    assert [(event.kind, event.other) for event in events] == [("pocket", 0)]
@@ -0,0 +1,39 @@
+import numpy as np
+from modules.batch import get_layout
+from modules.elements import Ball, HoleStore, Table
+from modules.solver import ParallelSolver, solve
+
+
+def get_random_layout(random: np.random.Generator, n_balls: int = 8):
+    """A layout of n_balls balls (white, black, then red and yellow) at random positions on the table."""
+    low, high = 2 * Ball.radius, np.asarray(Table.TABLE_DIMENSION) - 2 * Ball.radius
+    points = random.uniform(low, high, (n_balls, 2)).tolist()
+    colored = points[2:]
+    return get_layout({"white": points[:1], "black": points[1:2], "red": colored[::2], "yellow": colored[1::2]},
+                      HoleStore())
+
+
+def get_rows(table) -> list[tuple]:
+    """The rows of the table as sortable tuples of their shot and difficulty."""
+    points = np.round(np.nan_to_num(table["cushion_points"], nan=-1.), 6)
+    return sorted((int(table["kind"][i]), int(table["ball_id"][i]), int(table["first_id"][i]), int(table["hole_id"][i]),
+                   tuple(points[i].ravel().tolist()), round(float(table["difficulty"][i]), 6)) for i in range(len(table)))
+
+
+def test_parallel_solve_matches_solve():
+    random, banks = np.random.default_rng(0), 0
+    for _ in range(50):
+        layout = get_random_layout(random)
+        expected = solve(layout).get_ranked()
+        table = ParallelSolver(0).solve(layout)
+        assert get_rows(table) == get_rows(expected)
+        assert np.array_equal(table["difficulty"], expected["difficulty"])
+        banks += int((table["kind"] == 1).sum())
+    assert banks
+
+
+def test_solve_all_matches_solve():
+    random = np.random.default_rng(1)
+    layouts = [get_random_layout(random) for _ in range(5)]
+    for layout, table in zip(layouts, ParallelSolver(0, banks=False).solve_all(layouts)):
+        assert get_rows(table) == get_rows(solve(layout, banks=False).get_ranked())
@@ -0,0 +1,86 @@
+import numpy as np
+from modules.elements import ArrayBallStore, Ball, BallStore, Table
+from modules.spatial import KDTree, SpatialGrid, get_id_mask
+
+
+class Item:
+    """A point with an id, as the grid stores them."""
+
+    def __init__(self, id: int, x: float, y: float) -> None:
+        self.id, self.x, self.y = id, x, y
+
+
+def test_grid_queries_match_brute_force():
+    random = np.random.default_rng(0)
+    grid = SpatialGrid(2 * Ball.radius, Table.TABLE_DIMENSION)
+    items = [Item(id, *random.uniform(0, Table.TABLE_DIMENSION)) for id in range(60)]
+    for item in items:
+        grid.insert(item)
+    for item in items[::3]:  # Move some items, some of them off the table (clamped to the border cells)
+        item.x, item.y = random.uniform(-10, 200), random.uniform(-10, 105)
+        grid.move(item)
+    for item in items[1::7]:
+        grid.remove(item)
+    kept = [item for item in items if item in grid]
+    assert len(grid) == len(kept)
+
+    for x, y in random.uniform(-5, 195, (100, 2)):
+        distances = np.array([np.hypot(item.x - x, item.y - y) for item in kept])
+        radius = random.uniform(1, 40)
+        expected = {kept[i].id for i in np.flatnonzero(distances < radius)}
+        assert {item.id for item in grid.query_radius(x, y, radius)} == expected
+        assert grid.nearest(x, y, order=lambda item: item.id) is kept[int(np.argmin(distances))]
+        even = np.where([item.id % 2 == 0 for item in kept], distances, np.inf)
+        assert grid.nearest(x, y, accept=lambda item: item.id % 2 == 0) is kept[int(np.argmin(even))]
+
+
+def test_store_grid_matches_arrays():
+    random = np.random.default_rng(1)
+    reds, yellows = random.uniform(0, Table.TABLE_DIMENSION, (2, 6, 2))
+    stores = ArrayBallStore(), ArrayBallStore(use_grid=True)
+    for ball_store in stores:
+        ball_store.add_balls(*reds.T, "red")
+        ball_store.add_balls(*yellows.T, "yellow")
+    for _ in range(20):
+        positions = random.uniform(0, Table.TABLE_DIMENSION, (random.integers(3, 9), 2)).T
+        for ball_store in stores:
+            ball_store.update_positions(*positions, "red")
+        x, y = random.uniform(0, Table.TABLE_DIMENSION)
+        for color in ("red", "yellow", None):
+            plain, grid = (store.get_nearest_ball(x, y, store.get_all("red")[:2], color) for store in stores)
+            assert (plain.x, plain.y) == (grid.x, grid.y)
+            plain, grid = (ball_store.get_balls_in_radius(x, y, 50., color) for ball_store in stores)
+            assert [(ball.x, ball.y) for ball in plain] == [(ball.x, ball.y) for ball in grid]
+
+
+def test_tree_query_matches_brute_force():
+    random = np.random.default_rng(2)
+    positions = random.integers(0, 20, (2, 100)).astype(float)  # Integer positions: many ties
+    tree = KDTree(positions)
+    for x, y in random.integers(0, 20, (50, 2)).astype(float):
+        allowed = random.random(100) < 0.7
+        distances = np.where(allowed, np.hypot(positions[0] - x, positions[1] - y), np.inf)
+        expected = np.argsort(distances, kind="stable")[:10]
+        indices, found = tree.query(x, y, 10, allowed)
+        assert np.array_equal(indices, expected) and np.allclose(found, distances[expected])
+
+
+def test_k_nearest_of_both_stores_agree():
+    random = np.random.default_rng(3)
+    stores = BallStore(), ArrayBallStore()
+    for color in ("red", "yellow", "white", "black"):
+        xs, ys = random.integers(0, 10, (2, 3 if color in ("red", "yellow") else 1)) * 10.  # Ties on a coarse grid
+        for ball_store in stores:
+            ball_store.add_balls(xs.tolist(), ys.tolist(), color)
+    for _ in range(50):
+        x, y = random.integers(0, 10, 2) * 10.
+        k, color = int(random.integers(1, 9)), [None, "red", "yellow"][random.integers(3)]
+        skipped = random.random(8) < 0.3
+        results = []
+        for ball_store in stores:
+            exclude = get_id_mask(ball.id for ball, skip in zip(ball_store.get_all(), skipped) if skip)
+            results.append([(ball.x, ball.y) for ball in ball_store.k_nearest(x, y, k, exclude, color)])
+        assert results[0] == results[1]
+        colors = stores[0].get_colors()
+        left = sum(1 for skip, ball_color in zip(skipped, colors) if not skip and color in (None, ball_color))
+        assert len(results[0]) == min(k, left)
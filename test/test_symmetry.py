@@ -0,0 +1,39 @@
+import numpy as np
+from modules.batch import get_layout
+from modules.cache import LayoutKey
+from modules.elements import Ball, HoleStore, Table
+from modules.solver import solve
+from modules.symmetry import SYMMETRIES, Canonicalizer, mirror_layout
+
+
+def get_random_layout(random: np.random.Generator, n_balls: int = 7):
+    """A layout of n_balls balls (white, black, then red and yellow) at random positions on the table."""
+    low, high = 2 * Ball.radius, np.asarray(Table.TABLE_DIMENSION) - 2 * Ball.radius
+    points = random.uniform(low, high, (n_balls, 2)).tolist()
+    return get_layout({"white": points[:1], "black": points[1:2], "red": points[2::2], "yellow": points[3::2]},
+                      HoleStore())
+
+
+def get_rows(table) -> list[tuple]:
+    """The rows of the table as sortable tuples of their shot, cushion points and difficulty."""
+    points = np.round(np.nan_to_num(table["cushion_points"], nan=-1.), 6)
+    return sorted((int(table["kind"][i]), int(table["ball_id"][i]), int(table["first_id"][i]), int(table["hole_id"][i]),
+                   tuple(points[i].ravel().tolist()), round(float(table["difficulty"][i]), 6)) for i in range(len(table)))
+
+
+def test_mirrored_layouts_share_their_canonical_key():
+    random, canonicalizer = np.random.default_rng(0), Canonicalizer()
+    for _ in range(20):
+        layout = get_random_layout(random)
+        keys = {LayoutKey(canonicalizer.get_canonical(mirror_layout(layout, symmetry))[0]) for symmetry in SYMMETRIES}
+        assert len(keys) == 1
+
+
+def test_canonical_solve_matches_solve():
+    random, canonicalizer, shots = np.random.default_rng(1), Canonicalizer(), 0
+    for _ in range(20):
+        layout = get_random_layout(random)
+        table = canonicalizer.solve(layout)
+        assert get_rows(table) == get_rows(solve(layout).get_ranked())
+        shots += len(table)
+    assert shots
@@ -0,0 +1,81 @@
+import numpy as np
+from modules.elements import ArrayBallStore, Ball, BallStore, HoleStore, Table
+from modules.visibility import VisibilityGraph
+
+
+def get_points(random: np.random.Generator, n: int) -> np.ndarray:
+    """n random positions of balls on the table, shape (2, n)."""
+    return random.uniform(2 * Ball.radius, np.asarray(Table.TABLE_DIMENSION) - 2 * Ball.radius, (n, 2)).T
+
+
+def assert_same_graph(graph: VisibilityGraph, expected: VisibilityGraph) -> None:
+    assert graph.ball_index == expected.ball_index
+    assert graph.hole_index == expected.hole_index
+    assert np.array_equal(graph.ids, expected.ids)
+    assert np.array_equal(graph.clear, expected.clear)
+    assert np.allclose(graph.distances, expected.distances)
+    assert np.allclose(graph.directions, expected.directions)
+
+
+
+def is_clear(start: np.ndarray, end: np.ndarray, others: np.ndarray) -> bool:
+    """Whether a ball rolls from start to end without coming within two radii of the other balls, one by one."""
+    direction = end - start
+    for center in others.T:
+        t = np.clip((center - start) @ direction / max(direction @ direction, 1e-12), 0, 1)
+        if np.hypot(*(start + t * direction - center)) < 2 * Ball.radius:
+            return False
+    return True
+
+
+def test_graph_matches_pairwise_checks():
+    random, hole_store = np.random.default_rng(1), HoleStore()
+    ball_store = ArrayBallStore()
+    for color, n in (("red", 6), ("yellow", 6), ("white", 1), ("black", 1)):
+        ball_store.add_balls(*get_points(random, n), color)
+    graph = VisibilityGraph(ball_store, hole_store)
+    balls, holes = ball_store.get_all(), hole_store.get_all()
+    positions = np.array([[element.x, element.y] for element in balls + holes], dtype=float).T
+    assert len(graph) == len(balls) + len(holes)
+    for i, first in enumerate(balls + holes):
+        for j, second in enumerate(balls + holes):
+            start, end = positions[:, i], positions[:, j]
+            others = np.delete(positions[:, :len(balls)], [k for k in (i, j) if k < len(balls)], axis=1)
+            expected = i != j and (i < len(balls) or j < len(balls)) and is_clear(start, end, others)
+            assert graph.is_clear(first, second) == expected
+            assert np.isclose(graph.get_distance(first, second), np.hypot(*(end - start)))
+            if i != j:
+                assert np.allclose(graph.get_direction(first, second), (end - start) / np.hypot(*(end - start)))
+    assert graph.clear.any() and not graph.clear.all()
+
+def check_updates(ball_store: BallStore) -> None:
+    random, hole_store = np.random.default_rng(0), HoleStore()
+    for color, n in (("red", 5), ("yellow", 5), ("white", 1), ("black", 1)):
+        ball_store.add_balls(*get_points(random, n), color)
+    graph = VisibilityGraph(ball_store, hole_store)
+    for frame in range(30):
+        balls = ball_store.get_all()
+        for ball in random.choice(balls, 2, replace=False):  # Moves
+            ball.update_position(*get_points(random, 1)[:, 0])
+        if frame % 3 == 1:  # Additions
+            ball_store.add_balls(*get_points(random, 1), random.choice(["red", "yellow"]))
+        if frame % 3 == 2:  # Removals
+            color = random.choice(["red", "yellow"])
+            ball_store.remove_ball(ball_store.get_all(color)[0], color)
+        if frame % 5 == 0:  # Frames tracked by id, some balls moving and one ball more
+            points = np.array(ball_store.get_positions("yellow"), dtype=float).reshape(2, -1)
+            points[:, 0] += 3.
+            points = np.c_[points, get_points(random, 1)]
+            ball_store.update_positions(points[0].tolist(), points[1].tolist(), "yellow")
+        moved = graph.update(ball_store)
+        assert_same_graph(graph, VisibilityGraph(ball_store, hole_store))
+        assert set(moved.tolist()) <= set(range(len(ball_store.get_all())))
+    assert not len(graph.update(ball_store))
+
+
+def test_update_matches_new_graph():
+    check_updates(ArrayBallStore())
+
+
+def test_update_matches_new_graph_on_ball_store():
+    check_updates(BallStore())